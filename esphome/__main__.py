@@ -1,5 +1,6 @@
 import argparse
 import functools
+import io
 import logging
 import os
 import re
@@ -7,9 +8,7 @@ import sys
 import time
 from datetime import datetime
 
-from esphome import const, writer, yaml_util
-import esphome.codegen as cg
-from esphome.config import iter_components, read_config, strip_default_ids
+from esphome import const, trace
 from esphome.const import (
     ALLOWED_NAME_CHARS,
     CONF_BAUD_RATE,
@@ -22,6 +21,7 @@ from esphome.const import (
     CONF_PORT,
     CONF_ESPHOME,
     CONF_PLATFORMIO_OPTIONS,
+    CONF_SPLIT_SETUP,
     CONF_SUBSTITUTIONS,
     PLATFORM_ESP32,
     PLATFORM_ESP8266,
@@ -31,13 +31,14 @@ from esphome.const import (
 from esphome.core import CORE, EsphomeError, coroutine
 from esphome.helpers import indent
 from esphome.util import (
+    print_bar,
     run_external_command,
     run_external_process,
     safe_print,
     list_yaml_files,
     get_serial_ports,
 )
-from esphome.log import color, setup_log, Fore
+from esphome.log import capture_process_output, color, setup_log, Fore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -154,6 +155,9 @@ def run_miniterm(config, port):
 
 
 def wrap_to_code(name, comp):
+    import esphome.codegen as cg
+    from esphome import yaml_util
+
     coro = coroutine(comp.to_code)
 
     @functools.wraps(comp.to_code)
@@ -169,6 +173,8 @@ def wrap_to_code(name, comp):
 
     if hasattr(coro, "priority"):
         wrapped.priority = coro.priority
+    # The generated setup code is grouped by domain with split_setup
+    wrapped.codegen_domain = name.split(".")[0]
     return wrapped
 
 
@@ -178,33 +184,64 @@ def write_cpp(config):
 
 
 def generate_cpp_contents(config):
+    from esphome import asset_cache
+    from esphome.codegen_cache import CodegenCache
+    from esphome.config import iter_components
+
     _LOGGER.info("Generating C++ source...")
 
-    for name, component, conf in iter_components(CORE.config):
-        if component.to_code is not None:
+    cache = CodegenCache.load()
+    try:
+        for name, component, conf in iter_components(CORE.config):
+            if component.to_code is None:
+                continue
+            if component.prepare_assets is not None and not cache.is_cached(
+                name, component.to_code, conf
+            ):
+                component.prepare_assets(conf)
             coro = wrap_to_code(name, component)
-            CORE.add_job(coro, conf)
+            CORE.add_job(cache.wrap(name, coro, conf), conf)
 
-    CORE.flush_tasks()
+        CORE.flush_tasks()
+    finally:
+        asset_cache.shutdown()
+    cache.save()
 
 
 def write_cpp_file():
+    from esphome import writer
+
     writer.write_platformio_project()
 
-    code_s = indent(CORE.cpp_main_section)
-    writer.write_cpp(code_s)
+    if CORE.config[CONF_ESPHOME][CONF_SPLIT_SETUP]:
+        declarations_s, code_s = writer.write_setup_shards()
+    else:
+        writer.remove_setup_shards()
+        declarations_s, code_s = "", CORE.cpp_main_section
+    writer.write_cpp(indent(code_s), declarations_s)
     return 0
 
 
 def compile_program(args, config):
-    from esphome import platformio_api
-
-    _LOGGER.info("Compiling app...")
-    rc = platformio_api.run_compile(config, CORE.verbose)
-    if rc != 0:
-        return rc
+    from esphome import build_cache, object_cache, ota_payload, platformio_api
+
+    fingerprint = build_cache.fingerprint()
+    restored = build_cache.restore_firmware(fingerprint)
+    if not restored:
+        _LOGGER.info("Compiling app...")
+        object_cache.start_compile()
+        rc = platformio_api.run_compile(config, CORE.verbose)
+        object_cache.finish_compile()
+        if rc != 0:
+            return rc
     idedata = platformio_api.get_idedata(config)
-    return 0 if idedata is not None else 1
+    if idedata is None:
+        return 1
+    if not restored:
+        # With the packages the compile installed
+        build_cache.store_firmware(build_cache.fingerprint(), idedata)
+    ota_payload.write_payload()
+    return 0
 
 
 def upload_using_esptool(config, port):
@@ -286,7 +323,8 @@ def upload_program(config, args, host):
 
         return 1  # Unknown target platform
 
-    from esphome import espota2
+    from esphome import espota2, ota_payload
+    from esphome.storage_json import StorageJSON, storage_path
 
     if CONF_OTA not in config:
         raise EsphomeError(
@@ -297,9 +335,13 @@ def upload_program(config, args, host):
     ota_conf = config[CONF_OTA]
     remote_port = ota_conf[CONF_PORT]
     password = ota_conf.get(CONF_PASSWORD, "")
+    filename = CORE.firmware_bin
     if getattr(args, "file", None) is not None:
-        return espota2.run_ota(host, remote_port, password, args.file)
-    return espota2.run_ota(host, remote_port, password, CORE.firmware_bin)
+        filename = args.file
+    compressed_payload = ota_payload.load_payload(
+        StorageJSON.load(storage_path()), filename
+    )
+    return espota2.run_ota(host, remote_port, password, filename, compressed_payload)
 
 
 def show_logs(config, args, port):
@@ -336,6 +378,9 @@ def command_wizard(args):
 
 
 def command_config(args, config):
+    from esphome import yaml_util
+    from esphome.config import strip_default_ids
+
     _LOGGER.info("Configuration is valid!")
     if not CORE.verbose:
         config = strip_default_ids(config)
@@ -438,6 +483,8 @@ def command_version(args):
 
 
 def command_clean(args, config):
+    from esphome import writer
+
     try:
         writer.clean_build()
     except OSError as err:
@@ -447,52 +494,67 @@ def command_clean(args, config):
     return 0
 
 
+def command_clean_assets(args, config):
+    from esphome import asset_cache
+
+    try:
+        asset_cache.clean_assets()
+    except OSError as err:
+        _LOGGER.error("Error deleting converted assets: %s", err)
+        return 1
+    _LOGGER.info("Done!")
+    return 0
+
+
+def command_cache(args):
+    from esphome import object_cache
+
+    config_dir = args.configuration
+    if not os.path.isdir(config_dir):
+        config_dir = os.path.dirname(os.path.abspath(config_dir))
+    directory = object_cache.directory_for(config_dir)
+    if args.action == "prune":
+        max_size = object_cache.max_size()
+        if args.max_size is not None:
+            try:
+                max_size = object_cache.parse_size(args.max_size)
+            except ValueError as err:
+                raise EsphomeError(f"--max-size: {err}") from err
+        removed, freed = object_cache.trim(directory, max_size)
+        safe_print(f"Removed {removed} objects ({object_cache.format_size(freed)})")
+        return 0
+
+    stats = object_cache.stats(directory)
+    limit = object_cache.format_size(object_cache.max_size())
+    lookups = stats.hits + stats.misses
+    hit_rate = f" ({100 * stats.hits / lookups:.0f}%)" if lookups else ""
+    safe_print(f"Object cache: {directory}")
+    safe_print(f"  Objects: {stats.objects}")
+    safe_print(f"  Size:    {object_cache.format_size(stats.size)} of {limit}")
+    safe_print(f"  Hits:    {stats.hits}{hit_rate}")
+    safe_print(f"  Misses:  {stats.misses}")
+    return 0
+
+
 def command_dashboard(args):
     from esphome.dashboard import dashboard
 
     return dashboard.start_web_server(args)
 
 
-def command_update_all(args):
-    import click
+def command_daemon(args):
+    from esphome import daemon
 
-    success = {}
-    files = list_yaml_files(args.configuration)
-    twidth = 60
-
-    def print_bar(middle_text):
-        middle_text = f" {middle_text} "
-        width = len(click.unstyle(middle_text))
-        half_line = "=" * ((twidth - width) // 2)
-        click.echo(f"{half_line}{middle_text}{half_line}")
-
-    for f in files:
-        print(f"Updating {color(Fore.CYAN, f)}")
-        print("-" * twidth)
-        print()
-        rc = run_external_process(
-            "esphome", "--dashboard", "run", f, "--no-logs", "--device", "OTA"
-        )
-        if rc == 0:
-            print_bar(f"[{color(Fore.BOLD_GREEN, 'SUCCESS')}] {f}")
-            success[f] = True
-        else:
-            print_bar(f"[{color(Fore.BOLD_RED, 'ERROR')}] {f}")
-            success[f] = False
+    return daemon.run_daemon(
+        args.socket, {"config": command_config, "compile": command_compile}
+    )
 
-        print()
-        print()
-        print()
 
-    print_bar(f"[{color(Fore.BOLD_WHITE, 'SUMMARY')}]")
-    failed = 0
-    for f in files:
-        if success[f]:
-            print(f"  - {f}: {color(Fore.GREEN, 'SUCCESS')}")
-        else:
-            print(f"  - {f}: {color(Fore.BOLD_RED, 'FAILED')}")
-            failed += 1
-    return failed
+def command_update_all(args):
+    from esphome import fleet
+
+    files = list_yaml_files(args.configuration)
+    return fleet.update_all(args, files, _run_config_job, _init_config_job)
 
 
 def command_idedata(args, config):
@@ -521,6 +583,8 @@ def command_rename(args, config):
                 )
             )
             return 1
+    from esphome import yaml_util
+
     # Load existing yaml file
     with open(CORE.config_path, mode="r+", encoding="utf-8") as raw_file:
         raw_contents = raw_file.read()
@@ -608,6 +672,8 @@ PRE_CONFIG_ACTIONS = {
     "dashboard": command_dashboard,
     "vscode": command_vscode,
     "update-all": command_update_all,
+    "daemon": command_daemon,
+    "cache": command_cache,
 }
 
 POST_CONFIG_ACTIONS = {
@@ -619,11 +685,158 @@ POST_CONFIG_ACTIONS = {
     "clean-mqtt": command_clean_mqtt,
     "mqtt-fingerprint": command_mqtt_fingerprint,
     "clean": command_clean,
+    "clean-assets": command_clean_assets,
     "idedata": command_idedata,
     "rename": command_rename,
 }
 
 
+def run_config(args, conf_path):
+    from esphome.config import (
+        load_validated_config,
+        read_config,
+        save_validated_config,
+    )
+
+    CORE.config_path = conf_path
+    CORE.dashboard = args.dashboard
+
+    # Set by `update-all`, where the stages after validating restore the configuration
+    validated = getattr(args, "validated_config", None)
+    config = None
+    if validated is not None and os.path.isfile(validated):
+        config = load_validated_config(validated)
+    if config is None:
+        with trace.span("read_config", "config", file=conf_path):
+            config = read_config(dict(args.substitution) if args.substitution else {})
+        if config is None:
+            return 2
+        CORE.config = config
+        if validated is not None:
+            save_validated_config(validated)
+    CORE.config = config
+
+    if args.command not in POST_CONFIG_ACTIONS:
+        safe_print(f"Unknown command {args.command}")
+
+    try:
+        with trace.span(args.command, "command", file=conf_path):
+            return POST_CONFIG_ACTIONS[args.command](args, config)
+    except EsphomeError as e:
+        _LOGGER.error(e, exc_info=args.verbose)
+        return 1
+
+
+def _init_config_job(verbose, quiet):
+    # Processes that were forked already inherit the log setup of the parent
+    if not logging.getLogger().handlers:
+        setup_log(verbose, quiet)
+
+
+def _run_config_job(args, conf_path):
+    output = io.StringIO()
+    # Also the output of PlatformIO and esptool, which run in subprocesses
+    with capture_process_output(output):
+        try:
+            rc = run_config(args, conf_path)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Unexpected error processing %s", conf_path)
+            rc = 1
+    CORE.reset()
+    return rc, output.getvalue()
+
+
+def run_configs_parallel(args, conf_paths, jobs):
+    """Run the command for every configuration in a pool of worker processes.
+
+    Each worker has its own CORE, the output of every configuration is printed
+    in one block once it is done.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(conf_paths)),
+        initializer=_init_config_job,
+        initargs=(args.verbose, args.quiet),
+    ) as executor:
+        futures = {
+            executor.submit(_run_config_job, args, conf_path): conf_path
+            for conf_path in conf_paths
+        }
+        for future in as_completed(futures):
+            conf_path = futures[future]
+            rc, output = future.result()
+            results[conf_path] = rc
+            print_bar(color(Fore.CYAN, conf_path))
+            safe_print(output.rstrip("\n"))
+            print()
+
+    print_bar(f"[{color(Fore.BOLD_WHITE, 'SUMMARY')}]")
+    for conf_path in conf_paths:
+        if results[conf_path] == 0:
+            safe_print(f"  - {conf_path}: {color(Fore.GREEN, 'SUCCESS')}")
+        else:
+            safe_print(f"  - {conf_path}: {color(Fore.BOLD_RED, 'FAILED')}")
+    return next((results[p] for p in conf_paths if results[p] != 0), 0)
+
+
+IMPORT_TIME_PROG = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \| (\s*)(\S+)$")
+
+
+def parse_import_times(lines):
+    """Parse the output of `python -X importtime`.
+
+    Returns a dict of module name to (self, cumulative, nesting level), times in us.
+    """
+    times = {}
+    for line in lines:
+        m = IMPORT_TIME_PROG.match(line.rstrip("\n"))
+        if m is None:
+            continue
+        self_us, cumulative_us, indent_s, name = m.groups()
+        times[name] = (int(self_us), int(cumulative_us), (len(indent_s) - 1) // 2)
+    return times
+
+
+def run_import_profile(argv, top=30):
+    """Run the command again with `python -X importtime` and report the results."""
+    import subprocess
+
+    cmd = [sys.executable, "-X", "importtime", "-m", "esphome"]
+    cmd += [arg for arg in argv[1:] if arg != "--import-profile"]
+    import_lines = []
+    with subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True) as proc:
+        for line in proc.stderr:
+            if line.startswith("import time:"):
+                import_lines.append(line)
+            else:
+                sys.stderr.write(line)
+    times = parse_import_times(import_lines)
+
+    total = sum(cumulative for _, cumulative, level in times.values() if level == 0)
+    safe_print()
+    safe_print(f"Imported {len(times)} modules in {total / 1000:.1f}ms")
+    safe_print(f"{'cumulative':>12} {'self':>10}  module")
+    by_cumulative = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us, _) in by_cumulative[:top]:
+        safe_print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+    return proc.returncode
+
+
+def _jobs(value):
+    """Argument type of --jobs, 0 is one job per CPU."""
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = -1
+    if jobs < 0:
+        raise argparse.ArgumentTypeError(
+            f"invalid number of jobs: {value!r} (use 0 for one per CPU)"
+        )
+    return jobs or os.cpu_count() or 1
+
+
 def parse_args(argv):
     options_parser = argparse.ArgumentParser(add_help=False)
     options_parser.add_argument(
@@ -635,6 +848,16 @@ def parse_args(argv):
     options_parser.add_argument(
         "--dashboard", help=argparse.SUPPRESS, action="store_true"
     )
+    options_parser.add_argument(
+        "--import-profile",
+        help="Report the time spent importing each module.",
+        action="store_true",
+    )
+    options_parser.add_argument(
+        "--trace",
+        help="Write a Chrome trace of where the time is spent to this file.",
+        metavar="FILE",
+    )
     options_parser.add_argument(
         "-s",
         "--substitution",
@@ -665,6 +888,18 @@ def parse_args(argv):
     parser_config.add_argument(
         "configuration", help="Your YAML configuration file(s).", nargs="+"
     )
+    parser_config.add_argument(
+        "-j",
+        "--jobs",
+        help="Process this many configurations in parallel (0 for one per CPU).",
+        type=_jobs,
+        default=1,
+    )
+    parser_config.add_argument(
+        "--no-daemon",
+        help="Do not use a running ESPHome daemon to validate the configuration.",
+        action="store_true",
+    )
 
     parser_compile = subparsers.add_parser(
         "compile", help="Read the configuration and compile a program."
@@ -672,6 +907,13 @@ def parse_args(argv):
     parser_compile.add_argument(
         "configuration", help="Your YAML configuration file(s).", nargs="+"
     )
+    parser_compile.add_argument(
+        "-j",
+        "--jobs",
+        help="Process this many configurations in parallel (0 for one per CPU).",
+        type=_jobs,
+        default=1,
+    )
     parser_compile.add_argument(
         "--only-generate",
         help="Only generate source code, do not compile.",
@@ -753,6 +995,41 @@ def parse_args(argv):
         "configuration", help="Your YAML configuration file(s).", nargs="+"
     )
 
+    parser_clean_assets = subparsers.add_parser(
+        "clean-assets",
+        help="Delete the cached conversions of fonts, images and animations.",
+    )
+    parser_clean_assets.add_argument(
+        "configuration", help="Your YAML configuration file(s).", nargs="+"
+    )
+
+    parser_cache = subparsers.add_parser(
+        "cache",
+        help="Show the statistics of the cache of compiled objects, or shrink it.",
+    )
+    cache_actions = parser_cache.add_subparsers(
+        help="Action to run on the cache.", dest="action", metavar="action"
+    )
+    cache_actions.required = True
+    parser_cache_stats = cache_actions.add_parser(
+        "stats", help="Show the size, hits and misses of the cache."
+    )
+    parser_cache_prune = cache_actions.add_parser(
+        "prune", help="Remove the least recently used objects."
+    )
+    parser_cache_prune.add_argument(
+        "--max-size",
+        help="Shrink the cache below this size, like 500M. 0 empties it. Defaults to "
+        "the size limit of the cache.",
+    )
+    for parser_action in (parser_cache_stats, parser_cache_prune):
+        parser_action.add_argument(
+            "configuration",
+            help="Your YAML configuration file directory, the current one by default.",
+            nargs="?",
+            default=".",
+        )
+
     parser_dashboard = subparsers.add_parser(
         "dashboard", help="Create a simple web server for a dashboard."
     )
@@ -797,10 +1074,35 @@ def parse_args(argv):
     parser_vscode.add_argument("configuration", help="Your YAML configuration file.")
     parser_vscode.add_argument("--ace", action="store_true")
 
+    parser_daemon = subparsers.add_parser(
+        "daemon",
+        help="Keep ESPHome loaded to validate configurations sent over a unix socket.",
+    )
+    parser_daemon.add_argument(
+        "--socket",
+        help="The unix socket to listen on. Defaults to $ESPHOME_DAEMON_SOCKET.",
+    )
+
     parser_update = subparsers.add_parser("update-all")
     parser_update.add_argument(
         "configuration", help="Your YAML configuration file directories.", nargs="+"
     )
+    parser_update.add_argument(
+        "--max-compile-jobs",
+        help="Compile this many configurations at the same time (0 for one per CPU).",
+        type=_jobs,
+        default=1,
+    )
+    parser_update.add_argument(
+        "--max-uploads",
+        help="Upload to this many devices at the same time (0 for one per CPU).",
+        type=_jobs,
+        default=4,
+    )
+    parser_update.add_argument(
+        "--summary-json",
+        help="Write the result for every device to this JSON file.",
+    )
 
     parser_idedata = subparsers.add_parser("idedata")
     parser_idedata.add_argument(
@@ -897,6 +1199,18 @@ def parse_args(argv):
 
 def run_esphome(argv):
     args = parse_args(argv)
+    if args.import_profile:
+        return run_import_profile(argv)
+    if args.trace:
+        trace.start_tracing()
+        try:
+            return _run_esphome(args)
+        finally:
+            trace.write_trace(args.trace)
+    return _run_esphome(args)
+
+
+def _run_esphome(args):
     CORE.dashboard = args.dashboard
 
     setup_log(
@@ -927,31 +1241,40 @@ def run_esphome(argv):
             _LOGGER.error(e, exc_info=args.verbose)
             return 1
 
+    conf_paths = []
     for conf_path in args.configuration:
         if any(os.path.basename(conf_path) == x for x in SECRETS_FILES):
             _LOGGER.warning("Skipping secrets file %s", conf_path)
             continue
+        conf_paths.append(conf_path)
 
-        CORE.config_path = conf_path
-        CORE.dashboard = args.dashboard
-
-        config = read_config(dict(args.substitution) if args.substitution else {})
-        if config is None:
-            return 2
-        CORE.config = config
+    jobs = getattr(args, "jobs", 1)
+    if jobs != 1 and len(conf_paths) > 1:
+        return run_configs_parallel(args, conf_paths, jobs)
 
-        if args.command not in POST_CONFIG_ACTIONS:
-            safe_print(f"Unknown command {args.command}")
+    daemon_client = None
+    if args.command == "config" and not args.no_daemon:
+        from esphome.daemon import DaemonClient
 
-        try:
-            rc = POST_CONFIG_ACTIONS[args.command](args, config)
-        except EsphomeError as e:
-            _LOGGER.error(e, exc_info=args.verbose)
-            return 1
-        if rc != 0:
-            return rc
+        daemon_client = DaemonClient.connect()
 
-        CORE.reset()
+    try:
+        for conf_path in conf_paths:
+            if daemon_client is not None:
+                rc = daemon_client.run(args, conf_path)
+                if rc is not None:
+                    if rc != 0:
+                        return rc
+                    continue
+
+            rc = run_config(args, conf_path)
+            if rc != 0:
+                return rc
+
+            CORE.reset()
+    finally:
+        if daemon_client is not None:
+            daemon_client.close()
     return 0
 
 
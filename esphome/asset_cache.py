@@ -0,0 +1,168 @@
+"""Cache of converted display assets.
+
+Fonts, images and animations are rasterized and packed with Pillow in their `to_code`.
+The result only depends on the source file, the conversion parameters and the ESPHome
+and Pillow versions, so it is stored in .esphome/assets under a hash of those. Unchanged assets
+are loaded from there without opening Pillow at all. When the cache grows over
+ASSET_CACHE_SIZE bytes the least recently used entries are removed.
+
+Components can start their conversions at the beginning of code generation with
+prefetch_asset, so that they run in parallel in a pool of worker processes.
+"""
+import concurrent.futures
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from esphome.const import ENV_NO_ASSET_CACHE, __version__
+from esphome.core import CORE, EsphomeError
+from esphome.helpers import file_hash, get_bool_env, write_file
+
+_LOGGER = logging.getLogger(__name__)
+
+ASSET_CACHE_VERSION = 2
+ASSET_CACHE_SIZE = 256 * 1024 * 1024
+
+T = TypeVar("T")
+
+_POOL: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_PENDING: dict[str, concurrent.futures.Future] = {}
+
+
+def cache_dir() -> Optional[Path]:
+    if CORE.config_path is None or get_bool_env(ENV_NO_ASSET_CACHE):
+        return None
+    return Path(CORE.relative_internal_path("assets"))
+
+
+def _asset_key(func: Callable, path: str, args: tuple) -> str:
+    import PIL
+
+    inputs = [
+        str(ASSET_CACHE_VERSION),
+        __version__,
+        PIL.__version__,
+        f"{func.__module__}.{func.__qualname__}",
+        file_hash(path),
+        repr(args),
+    ]
+    return hashlib.sha256("\0".join(inputs).encode()).hexdigest()
+
+
+def _evict(directory: Path, max_size: int) -> None:
+    entries = []
+    for entry in directory.glob("*.pickle"):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    # Oldest access first
+    for _, size, entry in sorted(entries):
+        if total <= max_size:
+            break
+        _LOGGER.debug("Evicting converted asset %s", entry.name)
+        try:
+            entry.unlink()
+        except OSError:
+            continue
+        total -= size
+
+
+def _workers() -> int:
+    return os.cpu_count() or 1
+
+
+def prefetch_asset(func: Callable, path: str, *args: Any) -> None:
+    """Start converting func(path, *args) in a worker process, unless it is cached.
+
+    The conversion runs while the code of other components is generated, the result
+    is collected by convert_asset with the same arguments.
+    """
+    global _POOL
+    if _workers() < 2:
+        return
+    try:
+        key = _asset_key(func, path, args)
+    except OSError:
+        return
+    directory = cache_dir()
+    if key in _PENDING or (
+        directory is not None and (directory / f"{key}.pickle").is_file()
+    ):
+        return
+    if _POOL is None:
+        _POOL = concurrent.futures.ProcessPoolExecutor(_workers())
+    _PENDING[key] = _POOL.submit(func, path, *args)
+
+
+def _convert(func: Callable[..., T], path: str, key: Optional[str], args: tuple) -> T:
+    future = _PENDING.pop(key, None)
+    if future is not None:
+        try:
+            return future.result()
+        except concurrent.futures.BrokenExecutor as err:
+            _LOGGER.debug("Converting %s again, the worker failed: %s", path, err)
+    return func(path, *args)
+
+
+def convert_asset(func: Callable[..., T], path: str, *args: Any) -> T:
+    """Return func(path, *args), loaded from the asset cache if possible.
+
+    func must be a module level function that only reads the file at path, and its
+    arguments and result must be picklable.
+    """
+    directory = cache_dir()
+    try:
+        key = _asset_key(func, path, args)
+    except OSError:
+        # Let the conversion report the missing file
+        key = None
+    if key is None or directory is None:
+        return _convert(func, path, key, args)
+
+    entry = directory / f"{key}.pickle"
+    try:
+        with open(entry, "rb") as f_handle:
+            result = pickle.load(f_handle)
+    except FileNotFoundError:
+        pass
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.debug("Ignoring unreadable converted asset %s: %s", entry, err)
+    else:
+        # The modification time orders the entries for eviction
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return result
+
+    result = _convert(func, path, key, args)
+    try:
+        write_file(entry, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    except EsphomeError as err:
+        _LOGGER.debug("Could not cache converted asset %s: %s", path, err)
+        return result
+    _evict(directory, ASSET_CACHE_SIZE)
+    return result
+
+
+def shutdown() -> None:
+    """Stop the worker processes, dropping conversions nobody collected."""
+    global _POOL
+    _PENDING.clear()
+    if _POOL is not None:
+        _POOL.shutdown(cancel_futures=True)
+        _POOL = None
+
+
+def clean_assets() -> None:
+    directory = cache_dir()
+    if directory is not None and directory.is_dir():
+        _LOGGER.info("Deleting %s", directory)
+        shutil.rmtree(directory)
@@ -0,0 +1,166 @@
+"""Skip compiles of firmware that was built from the same inputs before.
+
+The fingerprint of a build covers everything PlatformIO compiles: platformio.ini, the
+files in src, the other files esphome writes to the build directory, the ESPHome
+and PlatformIO versions and the installed PlatformIO platforms and packages, which
+platformio.ini may not pin to a version. After a successful compile it is stored in the StorageJSON
+of the configuration, together with the hash of firmware.bin. When the next compile
+has the same fingerprint and firmware.bin is unchanged, PlatformIO isn't run.
+
+With $ESPHOME_ARTIFACT_CACHE set to a directory, the firmware of every build is also
+kept there under its fingerprint. Devices with identical firmware, like ones built
+from the same package with `name_add_mac_suffix`, are then only compiled once.
+"""
+from contextlib import suppress
+import hashlib
+import logging
+import os
+from pathlib import Path
+import shutil
+from typing import Optional
+
+from esphome import const
+from esphome.const import ENV_ARTIFACT_CACHE
+from esphome.core import CORE, EsphomeError
+from esphome.helpers import file_hash, reflink_or_copy_file, walk_files
+from esphome.storage_json import StorageJSON, storage_path
+
+_LOGGER = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 2
+# Files in the build directory that PlatformIO uses besides src
+BUILD_INPUT_FILES = (
+    "platformio.ini",
+    "partitions.csv",
+    "post_build.py",
+    "version.txt",
+    "sdkconfig.{name}.esphomeinternal",
+)
+
+
+def _platformio_version() -> str:
+    try:
+        from platformio import __version__
+    except ImportError:
+        return "none"
+    return __version__
+
+
+def _platformio_core_dir() -> Path:
+    core_dir = os.environ.get("PLATFORMIO_CORE_DIR")
+    if core_dir:
+        return Path(core_dir)
+    return Path.home() / ".platformio"
+
+
+def _installed_packages():
+    """Yield the manifests of the installed platforms, frameworks and toolchains.
+
+    .piopm holds the resolved version, including the commit of packages installed
+    from git, and the manifest the version of the package itself.
+    """
+    core_dir = _platformio_core_dir()
+    for kind in ("platforms", "packages"):
+        for path in sorted(core_dir.glob(f"{kind}/*/*")):
+            if path.name in (".piopm", "platform.json", "package.json"):
+                yield path.relative_to(core_dir).as_posix(), path
+
+
+def fingerprint() -> str:
+    """Return the fingerprint of the inputs of the firmware in the build directory."""
+    hasher = hashlib.sha256()
+
+    def add(*values: str) -> None:
+        for value in values:
+            hasher.update(value.encode())
+            hasher.update(b"\0")
+
+    add(str(FINGERPRINT_VERSION), const.__version__, _platformio_version())
+    for name, path in _installed_packages():
+        with suppress(OSError):
+            add(name, file_hash(path))
+    for name in BUILD_INPUT_FILES:
+        path = CORE.relative_build_path(name.format(name=CORE.name))
+        if os.path.isfile(path):
+            add(name, file_hash(path))
+    src = CORE.relative_src_path()
+    for path in sorted(walk_files(src)):
+        add(Path(path).relative_to(src).as_posix(), file_hash(path))
+    return hasher.hexdigest()
+
+
+def artifact_dir(fingerprint_: str) -> Optional[Path]:
+    store = os.environ.get(ENV_ARTIFACT_CACHE)
+    if not store:
+        return None
+    return Path(store) / fingerprint_
+
+
+def _firmware_hash() -> Optional[str]:
+    try:
+        return file_hash(CORE.firmware_bin)
+    except OSError:
+        return None
+
+
+def _record(fingerprint_: str) -> None:
+    path = storage_path()
+    storage = StorageJSON.load(path)
+    if storage is None:
+        return
+    storage.firmware_fingerprint = fingerprint_
+    storage.firmware_sha256 = _firmware_hash()
+    storage.save(path)
+
+
+def restore_firmware(fingerprint_: str) -> bool:
+    """Provide the firmware built from fingerprint_ without compiling, if possible.
+
+    Returns True if firmware.bin in the build directory is the one built from it.
+    """
+    storage = StorageJSON.load(storage_path())
+    if (
+        storage is not None
+        and storage.firmware_fingerprint == fingerprint_
+        and storage.firmware_sha256 == _firmware_hash()
+    ):
+        _LOGGER.info("Sources unchanged since the last compile, using the firmware")
+        return True
+
+    directory = artifact_dir(fingerprint_)
+    if directory is None or not (directory / "firmware.bin").is_file():
+        return False
+    try:
+        for path in directory.iterdir():
+            target = CORE.relative_pioenvs_path(CORE.name, path.name)
+            reflink_or_copy_file(path, target)
+    except (OSError, EsphomeError) as err:
+        _LOGGER.warning("Could not use the firmware in %s: %s", directory, err)
+        return False
+    _LOGGER.info("Using the firmware from the artifact cache in %s", directory)
+    _record(fingerprint_)
+    return True
+
+
+def store_firmware(fingerprint_: str, idedata) -> None:
+    """Record that the firmware in the build directory was built from fingerprint_."""
+    _record(fingerprint_)
+    directory = artifact_dir(fingerprint_)
+    if directory is None or directory.is_dir():
+        return
+
+    env_dir = os.path.abspath(CORE.relative_pioenvs_path(CORE.name))
+    paths = [idedata.firmware_bin_path, idedata.firmware_elf_path]
+    paths += [image.path for image in idedata.extra_flash_images]
+    tmp_dir = directory.with_name(f".{directory.name}.{os.getpid()}")
+    try:
+        for path in paths:
+            # Build results only, not images of the framework like boot_app0.bin
+            if os.path.dirname(os.path.abspath(path)) == env_dir:
+                reflink_or_copy_file(path, tmp_dir / os.path.basename(path))
+        # Appears complete, another build of the same firmware may have won
+        os.rename(tmp_dir, directory)
+    except (OSError, EsphomeError) as err:
+        _LOGGER.debug("Could not store the firmware in %s: %s", directory, err)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,312 @@
+"""Cache of the code generated by each component.
+
+Code generation runs the `to_code` coroutine of every component in the configuration.
+What such a task adds to CORE (statements, defines, build flags, libraries,
+platformio options and variables) depends on its validated configuration, and on the
+configuration of the components it refers to by ID (like the parameters of a script
+it executes). So tasks are keyed by their configuration, the configuration declaring
+each ID they refer to and the ESPHome sources. While generating, every task's calls
+to CORE are recorded together with the points where it waits for a variable, and
+stored in .esphome/codegen_cache. The next generation replays tasks whose inputs did
+not change instead of running them. Replayed tasks wait at the same points, so all
+tasks are scheduled in the same order and the generated code is identical to a full
+generation.
+
+Tasks that modify CORE.data or add jobs of their own are not cached.
+"""
+import functools
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from esphome.const import ENV_NO_CODEGEN_CACHE, __version__
+from esphome.core import CORE, ID, EsphomeError, Lambda
+from esphome.coroutine import FakeAwaitable, WaitFor
+from esphome.helpers import get_bool_env, write_file
+from esphome.yaml_util import CachePickler, ESPHomeDataBase
+
+_LOGGER = logging.getLogger(__name__)
+
+CODEGEN_CACHE_VERSION = 1
+
+
+def _iter_values(obj: Any) -> Iterator[Any]:
+    if isinstance(obj, dict):
+        for value in obj.values():
+            yield from _iter_values(value)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from _iter_values(value)
+    else:
+        yield obj
+
+
+def _iter_declarations(obj: Any, parent: Any = None) -> Iterator[tuple[ID, Any]]:
+    """Yield the declared IDs in obj, with the configuration declaring them."""
+    if isinstance(obj, dict):
+        for value in obj.values():
+            yield from _iter_declarations(value, obj)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from _iter_declarations(value, parent)
+    elif isinstance(obj, ID) and obj.is_declaration:
+        yield obj, parent
+
+
+def _stable_repr(obj: Any) -> str:
+    """Like repr, but independent of the iteration order of sets and dicts.
+
+    The order of the keys in the validated configuration depends on the hash seed.
+    """
+    if isinstance(obj, (set, frozenset)):
+        return "{" + ", ".join(sorted(_stable_repr(value) for value in obj)) + "}"
+    if isinstance(obj, dict):
+        items = (f"{key!r}: {_stable_repr(value)}" for key, value in obj.items())
+        return "{" + ", ".join(sorted(items)) + "}"
+    if isinstance(obj, (list, tuple)):
+        return "[" + ", ".join(_stable_repr(value) for value in obj) + "]"
+    if (
+        isinstance(obj, Lambda)
+        and isinstance(obj, ESPHomeDataBase)
+        and obj.esp_range is not None
+    ):
+        # The #line directive of the generated lambda
+        return f"{obj!r}@{obj.esp_range.start_mark}+{obj.content_offset}"
+    return repr(obj)
+
+
+def _source_fingerprint() -> str:
+    """Hash the location and modification time of all loaded ESPHome modules."""
+    files = []
+    for name, module in list(sys.modules.items()):
+        file = getattr(module, "__file__", None)
+        if not name.startswith("esphome") or file is None:
+            continue
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        files.append(f"{file}\0{stat.st_mtime_ns}\0{stat.st_size}")
+    files.sort()
+    return hashlib.sha256("\n".join(files).encode()).hexdigest()
+
+
+def _data_snapshot() -> Optional[bytes]:
+    """Serialize CORE.data, to find tasks changing it (also in place)."""
+    with io.BytesIO() as buf:
+        try:
+            CachePickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(CORE.data)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+        return buf.getvalue()
+
+
+def _replay(events: list[tuple[str, tuple]]):
+    for method, args in events:
+        if method == "get_variable":
+            while args[0] not in CORE.variables:
+                yield WaitFor(args[0])
+        elif method == "yield":
+            yield
+        else:
+            getattr(CORE, method)(*args)
+
+
+class CodegenCache:
+    """The recorded code generation of each top level `to_code` task."""
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self.reused = 0
+        self.total = 0
+        # Pickled recordings by task key, replaced by the ones used in this run
+        self._stored: dict[str, bytes] = {}
+        self._used: dict[str, bytes] = {}
+        self._recorded: dict[str, list[tuple[str, tuple]]] = {}
+        self._environment = None
+        # The configurations declaring the IDs, described when first resolved
+        self._declarations: Optional[dict[str, Any]] = None
+        self._resolved: dict[str, str] = {}
+        # Snapshot of CORE.data after the given step of the event loop
+        self._data_step: Optional[int] = None
+        self._data: Optional[bytes] = None
+        if path is None or not path.is_file():
+            return
+        try:
+            with open(path, "rb") as f_handle:
+                data = pickle.load(f_handle)
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Ignoring unreadable code generation cache %s: %s", path, err)
+            return
+        if (
+            data.get("version") == CODEGEN_CACHE_VERSION
+            and data.get("esphome_version") == __version__
+        ):
+            self._stored = data["tasks"]
+
+    @classmethod
+    def load(cls) -> "CodegenCache":
+        path = None
+        if CORE.config_path is not None and not get_bool_env(ENV_NO_CODEGEN_CACHE):
+            path = Path(
+                CORE.relative_internal_path("codegen_cache", f"{CORE.name}.pickle")
+            )
+        return cls(path)
+
+    def _resolve(self, id_: ID) -> str:
+        """Describe the declaration of an ID and the configuration declaring it.
+
+        Tasks get the variable of an ID, and may read that configuration.
+        """
+        if self._declarations is None:
+            self._declarations = {
+                declared.id: (declared, conf)
+                for declared, conf in _iter_declarations(CORE.config)
+            }
+        resolved = self._resolved.get(id_.id)
+        if resolved is None:
+            declaration = self._declarations.get(id_.id)
+            if declaration is None:
+                resolved = repr(id_)
+            else:
+                resolved = f"{declaration[0]!r}\0{_stable_repr(declaration[1])}"
+            self._resolved[id_.id] = resolved
+        return resolved
+
+    def _task_key(self, name: str, coro: Callable, conf: Any) -> str:
+        if self._environment is None:
+            self._environment = "\0".join(
+                [
+                    _source_fingerprint(),
+                    str(CORE.name),
+                    _stable_repr(CORE.data),
+                    _stable_repr(CORE.loaded_integrations),
+                ]
+            )
+        inputs = [self._environment, name, f"{coro.__module__}.{coro.__qualname__}"]
+        inputs.append(_stable_repr(conf))
+        for value in _iter_values(conf):
+            if isinstance(value, ID) and not value.is_declaration:
+                inputs.append(self._resolve(value))
+            elif isinstance(value, str) and "\n" not in value:
+                # Files like images and fonts are read by the task itself
+                path = CORE.relative_config_path(value)
+                if os.path.isfile(path):
+                    stat = os.stat(path)
+                    inputs.append(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}")
+        return hashlib.sha256("\0".join(inputs).encode()).hexdigest()
+
+    def _load_events(self, key: str) -> Optional[list[tuple[str, tuple]]]:
+        data = self._stored.get(key)
+        if data is None:
+            return None
+        try:
+            events, needs = pickle.loads(data)
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Ignoring unreadable code generation cache entry: %s", err)
+            return None
+        # Variables not referenced in the configuration of the task
+        if any(self._resolve(id_) != declared for id_, declared in needs):
+            return None
+        self._used[key] = data
+        return events
+
+    def _data_before_step(self) -> Optional[bytes]:
+        # Unchanged if the previous step ended with a snapshot
+        if self._data_step is not None and self._data_step == CORE.event_loop.steps - 1:
+            return self._data
+        return _data_snapshot()
+
+    def _record(self, key: str, gen: Iterator[Any]):
+        events = []
+        cacheable = True
+        while True:
+            if cacheable:
+                data = self._data_before_step()
+            CORE.codegen_recorder = events
+            try:
+                value = next(gen)
+                finished = False
+            except StopIteration as err:
+                value = err.value
+                finished = True
+            finally:
+                CORE.codegen_recorder = None
+            if cacheable:
+                self._data = _data_snapshot()
+                self._data_step = CORE.event_loop.steps
+                cacheable = data is not None and self._data == data
+            if finished:
+                if cacheable and all(method != "add_job" for method, _ in events):
+                    self._recorded[key] = events
+                return value
+            if not isinstance(value, WaitFor):
+                events.append(("yield", ()))
+            yield value
+
+    def is_cached(self, name: str, coro: Callable, conf: Any) -> bool:
+        """Whether the task running coro(conf) can probably be replayed."""
+        return (
+            self.path is not None and self._task_key(name, coro, conf) in self._stored
+        )
+
+    def wrap(self, name: str, coro: Callable, conf: Any) -> Callable:
+        """Return a task running coro(conf), replayed from the cache if possible."""
+        if self.path is None:
+            return coro
+        self.total += 1
+        key = self._task_key(name, coro, conf)
+        events = self._load_events(key)
+        if events is not None:
+            self.reused += 1
+
+            async def task(conf):
+                await FakeAwaitable(_replay(events))
+
+        else:
+
+            async def task(conf):
+                return await FakeAwaitable(self._record(key, coro(conf).__await__()))
+
+        return functools.wraps(coro)(task)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        _LOGGER.debug(
+            "Reused the generated code of %s of %s components", self.reused, self.total
+        )
+        tasks = dict(self._used)
+        for key, events in self._recorded.items():
+            needs = [
+                (args[0], self._resolve(args[0]))
+                for method, args in events
+                if method == "get_variable"
+            ]
+            with io.BytesIO() as buf:
+                try:
+                    CachePickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(
+                        (events, needs)
+                    )
+                except (pickle.PicklingError, TypeError, AttributeError) as err:
+                    _LOGGER.debug("Could not cache generated code: %s", err)
+                    continue
+                tasks[key] = buf.getvalue()
+        if tasks == self._stored:
+            return
+        data = {
+            "version": CODEGEN_CACHE_VERSION,
+            "esphome_version": __version__,
+            "tasks": tasks,
+        }
+        try:
+            write_file(self.path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        except EsphomeError as err:
+            _LOGGER.debug(
+                "Could not write code generation cache %s: %s", self.path, err
+            )
@@ -0,0 +1,147 @@
+"""Index of component metadata, read without importing the components.
+
+Loading a configuration needs DEPENDENCIES, AUTO_LOAD, CONFLICTS_WITH, MULTI_CONF and
+IS_PLATFORM_COMPONENT of every component it references. These are plain literals in
+the component source, so they are read with `ast` and stored in
+.esphome/component_index.json next to the configuration. An entry is read again
+when its file changes. Components defining them dynamically are not indexed and are
+imported as before.
+"""
+import ast
+import copy
+import json
+import logging
+from pathlib import Path
+from typing import Any, Optional
+
+from esphome.const import __version__
+from esphome.core import EsphomeError
+from esphome.helpers import write_file
+
+_LOGGER = logging.getLogger(__name__)
+
+COMPONENT_INDEX_VERSION = 1
+
+# Module level variables read from the source, with the values used if not set
+METADATA_DEFAULTS = {
+    "DEPENDENCIES": [],
+    "CONFLICTS_WITH": [],
+    "AUTO_LOAD": [],
+    "CODEOWNERS": [],
+    "MULTI_CONF": False,
+    "IS_PLATFORM_COMPONENT": False,
+}
+# Module level names whose presence is indexed
+DEFINED_NAMES = ("CONFIG_SCHEMA",)
+
+
+def _bound_names(node: ast.AST) -> list[str]:
+    """Return the names a module level statement binds."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [(alias.asname or alias.name).split(".")[0] for alias in node.names]
+    targets = []
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        targets = [node.target]
+    names = []
+    for target in targets:
+        names += [n.id for n in ast.walk(target) if isinstance(n, ast.Name)]
+    return names
+
+
+def read_metadata(source: str) -> Optional[dict[str, Any]]:
+    """Read the component metadata from the source of a component module.
+
+    Returns None if the metadata can't be determined without running the module.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    tracked = set(METADATA_DEFAULTS) | set(DEFINED_NAMES)
+    metadata = copy.deepcopy(METADATA_DEFAULTS)
+    defined = set()
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and any(
+            alias.name == "*" for alias in node.names
+        ):
+            return None
+        names = _bound_names(node)
+        if not names:
+            # Compound statements, only fine if they don't set anything we track
+            for child in ast.walk(node):
+                if child is not node and tracked & set(_bound_names(child)):
+                    return None
+            continue
+        for name in names:
+            defined.add(name)
+            if name not in METADATA_DEFAULTS:
+                continue
+            if not isinstance(node, (ast.Assign, ast.AnnAssign)) or node.value is None:
+                return None
+            try:
+                metadata[name] = ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    for name in DEFINED_NAMES:
+        metadata[name] = name in defined
+    return metadata
+
+
+class ComponentIndex:
+    """Component metadata by module file, persisted in a JSON file."""
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self._modules: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        if path is None or not path.is_file():
+            return
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as err:
+            _LOGGER.debug("Ignoring component index %s: %s", path, err)
+            return
+        if (
+            data.get("version") == COMPONENT_INDEX_VERSION
+            and data.get("esphome_version") == __version__
+        ):
+            self._modules = data["modules"]
+
+    def get(self, file: Path) -> Optional[dict[str, Any]]:
+        """Return the metadata of a component module, None if it isn't indexable."""
+        stat = file.stat()
+        key = str(file)
+        entry = self._modules.get(key)
+        if (
+            entry is None
+            or entry["mtime_ns"] != stat.st_mtime_ns
+            or entry["size"] != stat.st_size
+        ):
+            entry = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "metadata": read_metadata(file.read_text(encoding="utf-8")),
+            }
+            self._modules[key] = entry
+            self._dirty = True
+        return entry["metadata"]
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        data = {
+            "version": COMPONENT_INDEX_VERSION,
+            "esphome_version": __version__,
+            "modules": self._modules,
+        }
+        try:
+            write_file(self.path, json.dumps(data, indent=2, sort_keys=True))
+        except EsphomeError as err:
+            _LOGGER.debug("Could not write component index %s: %s", self.path, err)
+            return
+        self._dirty = False
@@ -1,18 +1,23 @@
+import hashlib
 import logging
+import struct
 
-from esphome import core
+from esphome import asset_cache, core
 from esphome.components import display, font
 import esphome.components.image as espImage
+from esphome.components.image import convert
 import esphome.config_validation as cv
 import esphome.codegen as cg
 from esphome.const import CONF_FILE, CONF_ID, CONF_RAW_DATA_ID, CONF_RESIZE, CONF_TYPE
-from esphome.core import CORE, HexInt
+from esphome.core import CORE
 
 _LOGGER = logging.getLogger(__name__)
 
 DEPENDENCIES = ["display"]
 MULTI_CONF = True
 
+CONF_RAW_FRAME_INDEX_ID = "raw_frame_index_id"
+
 Animation_ = display.display_ns.class_("Animation", espImage.Image_)
 
 ANIMATION_SCHEMA = cv.Schema(
@@ -24,6 +29,7 @@ ANIMATION_SCHEMA = cv.Schema(
             espImage.IMAGE_TYPE, upper=True
         ),
         cv.GenerateID(CONF_RAW_DATA_ID): cv.declare_id(cg.uint8),
+        cv.GenerateID(CONF_RAW_FRAME_INDEX_ID): cv.declare_id(cg.uint8),
     }
 )
 
@@ -32,10 +38,11 @@ CONFIG_SCHEMA = cv.All(font.validate_pillow_installed, ANIMATION_SCHEMA)
 CODEOWNERS = ["@syndlex"]
 
 
-async def to_code(config):
+def convert_animation(path, image_type, resize):
+    """Return the pixel data of all frames, width, height and number of frames of
+    the animation file at path."""
     from PIL import Image
 
-    path = CORE.relative_config_path(config[CONF_FILE])
     try:
         image = Image.open(path)
     except Exception as e:
@@ -43,98 +50,80 @@ async def to_code(config):
 
     width, height = image.size
     frames = image.n_frames
-    if CONF_RESIZE in config:
-        new_width_max, new_height_max = config[CONF_RESIZE]
+    if resize is not None:
+        new_width_max, new_height_max = resize
         ratio = min(new_width_max / width, new_height_max / height)
         width, height = int(width * ratio), int(height * ratio)
-    else:
-        if width > 500 or height > 500:
-            _LOGGER.warning(
-                "The image you requested is very big. Please consider using"
-                " the resize parameter."
-            )
 
-    if config[CONF_TYPE] == "GRAYSCALE":
-        data = [0 for _ in range(height * width * frames)]
-        pos = 0
-        for frameIndex in range(frames):
-            image.seek(frameIndex)
+    # Frames are decoded and packed one at a time, straight into the array data.
+    # Repeated frames are stored once, frame_numbers holds the data of each frame.
+    size = convert.frame_size(width, height, image_type)
+    data = bytearray(size * frames)
+    frame_numbers = []
+    known_frames = {}
+    unique = 0
+    for frameIndex in range(frames):
+        image.seek(frameIndex)
+        if image_type == "GRAYSCALE":
             frame = image.convert("L", dither=Image.NONE)
-            if CONF_RESIZE in config:
-                frame = frame.resize([width, height])
-            pixels = list(frame.getdata())
-            if len(pixels) != height * width:
-                raise core.EsphomeError(
-                    f"Unexpected number of pixels in {path} frame {frameIndex}: ({len(pixels)} != {height*width})"
-                )
-            for pix in pixels:
-                data[pos] = pix
-                pos += 1
-
-    elif config[CONF_TYPE] == "RGB24":
-        data = [0 for _ in range(height * width * 3 * frames)]
-        pos = 0
-        for frameIndex in range(frames):
-            image.seek(frameIndex)
-            if CONF_RESIZE in config:
-                image.thumbnail(config[CONF_RESIZE])
+        elif image_type == "RGB24":
+            if resize is not None:
+                image.thumbnail(resize)
             frame = image.convert("RGB")
-            if CONF_RESIZE in config:
-                frame = frame.resize([width, height])
-            pixels = list(frame.getdata())
-            if len(pixels) != height * width:
-                raise core.EsphomeError(
-                    f"Unexpected number of pixels in {path} frame {frameIndex}: ({len(pixels)} != {height*width})"
-                )
-            for pix in pixels:
-                data[pos] = pix[0]
-                pos += 1
-                data[pos] = pix[1]
-                pos += 1
-                data[pos] = pix[2]
-                pos += 1
-
-    elif config[CONF_TYPE] == "RGB565":
-        data = [0 for _ in range(height * width * 2 * frames)]
-        pos = 0
-        for frameIndex in range(frames):
-            image.seek(frameIndex)
+        elif image_type == "RGB565":
             frame = image.convert("RGB")
-            if CONF_RESIZE in config:
-                frame = frame.resize([width, height])
-            pixels = list(frame.getdata())
-            if len(pixels) != height * width:
-                raise core.EsphomeError(
-                    f"Unexpected number of pixels in {path} frame {frameIndex}: ({len(pixels)} != {height*width})"
-                )
-            for pix in pixels:
-                R = pix[0] >> 3
-                G = pix[1] >> 2
-                B = pix[2] >> 3
-                rgb = (R << 11) | (G << 5) | B
-                data[pos] = rgb >> 8
-                pos += 1
-                data[pos] = rgb & 255
-                pos += 1
-
-    elif config[CONF_TYPE] == "BINARY":
-        width8 = ((width + 7) // 8) * 8
-        data = [0 for _ in range((height * width8 // 8) * frames)]
-        for frameIndex in range(frames):
-            image.seek(frameIndex)
+        elif image_type == "BINARY":
             frame = image.convert("1", dither=Image.NONE)
-            if CONF_RESIZE in config:
-                frame = frame.resize([width, height])
-            for y in range(height):
-                for x in range(width):
-                    if frame.getpixel((x, y)):
-                        continue
-                    pos = x + y * width8 + (height * width8 * frameIndex)
-                    data[pos // 8] |= 0x80 >> (pos % 8)
-
-    rhs = [HexInt(x) for x in data]
-    prog_arr = cg.progmem_array(config[CONF_RAW_DATA_ID], rhs)
-    cg.new_Pvariable(
+        elif image_type == "TRANSPARENT_BINARY":
+            frame = image.convert("RGBA")
+        if resize is not None:
+            frame = frame.resize([width, height])
+        if frame.size != (width, height):
+            raise core.EsphomeError(
+                f"Unexpected size of {path} frame {frameIndex}: {frame.size} != {(width, height)}"
+            )
+        packed = convert.pack_frame(frame, image_type)
+        del frame
+        digest = hashlib.sha256(packed).digest()
+        number = known_frames.get(digest)
+        if number is None or data[number * size : (number + 1) * size] != packed:
+            number = known_frames[digest] = unique
+            data[number * size : (number + 1) * size] = packed
+            unique += 1
+        frame_numbers.append(number)
+        del packed
+
+    if unique == frames:
+        return data, width, height, frames, None
+    del data[unique * size :]
+    return data, width, height, frames, struct.pack(f">{frames}H", *frame_numbers)
+
+
+def _conversion(config):
+    return (
+        convert_animation,
+        CORE.relative_config_path(config[CONF_FILE]),
+        str(config[CONF_TYPE]),
+        config.get(CONF_RESIZE),
+    )
+
+
+def prepare_assets(config):
+    asset_cache.prefetch_asset(*_conversion(config))
+
+
+async def to_code(config):
+    data, width, height, frames, frame_index = asset_cache.convert_asset(
+        *_conversion(config)
+    )
+    if CONF_RESIZE not in config and (width > 500 or height > 500):
+        _LOGGER.warning(
+            "The image you requested is very big. Please consider using"
+            " the resize parameter."
+        )
+
+    prog_arr = cg.progmem_array(config[CONF_RAW_DATA_ID], data)
+    var = cg.new_Pvariable(
         config[CONF_ID],
         prog_arr,
         width,
@@ -142,3 +131,6 @@ async def to_code(config):
         frames,
         espImage.IMAGE_TYPE[config[CONF_TYPE]],
     )
+    if frame_index is not None:
+        index_arr = cg.progmem_array(config[CONF_RAW_FRAME_INDEX_ID], frame_index)
+        cg.add(var.set_frame_index(index_arr))
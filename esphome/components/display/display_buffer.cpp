@@ -532,7 +532,7 @@ bool Animation::get_pixel(int x, int y) const {
   if (x < 0 || x >= this->width_ || y < 0 || y >= this->height_)
     return false;
   const uint32_t width_8 = ((this->width_ + 7u) / 8u) * 8u;
-  const uint32_t frame_index = this->height_ * width_8 * this->current_frame_;
+  const uint32_t frame_index = this->height_ * width_8 * this->get_frame_data_number_();
   if (frame_index >= (uint32_t)(this->width_ * this->height_ * this->animation_frame_count_))
     return false;
   const uint32_t pos = x + y * width_8 + frame_index;
@@ -541,7 +541,7 @@ bool Animation::get_pixel(int x, int y) const {
 Color Animation::get_color_pixel(int x, int y) const {
   if (x < 0 || x >= this->width_ || y < 0 || y >= this->height_)
     return Color::BLACK;
-  const uint32_t frame_index = this->width_ * this->height_ * this->current_frame_;
+  const uint32_t frame_index = this->width_ * this->height_ * this->get_frame_data_number_();
   if (frame_index >= (uint32_t)(this->width_ * this->height_ * this->animation_frame_count_))
     return Color::BLACK;
   const uint32_t pos = (x + y * this->width_ + frame_index) * 3;
@@ -553,7 +553,7 @@ Color Animation::get_color_pixel(int x, int y) const {
 Color Animation::get_rgb565_pixel(int x, int y) const {
   if (x < 0 || x >= this->width_ || y < 0 || y >= this->height_)
     return Color::BLACK;
-  const uint32_t frame_index = this->width_ * this->height_ * this->current_frame_;
+  const uint32_t frame_index = this->width_ * this->height_ * this->get_frame_data_number_();
   if (frame_index >= (uint32_t)(this->width_ * this->height_ * this->animation_frame_count_))
     return Color::BLACK;
   const uint32_t pos = (x + y * this->width_ + frame_index) * 2;
@@ -567,7 +567,7 @@ Color Animation::get_rgb565_pixel(int x, int y) const {
 Color Animation::get_grayscale_pixel(int x, int y) const {
   if (x < 0 || x >= this->width_ || y < 0 || y >= this->height_)
     return Color::BLACK;
-  const uint32_t frame_index = this->width_ * this->height_ * this->current_frame_;
+  const uint32_t frame_index = this->width_ * this->height_ * this->get_frame_data_number_();
   if (frame_index >= (uint32_t)(this->width_ * this->height_ * this->animation_frame_count_))
     return Color::BLACK;
   const uint32_t pos = (x + y * this->width_ + frame_index);
@@ -602,6 +602,13 @@ void Animation::set_frame(int frame) {
     }
   }
 }
+void Animation::set_frame_index(const uint8_t *frame_index) { this->frame_index_ = frame_index; }
+uint32_t Animation::get_frame_data_number_() const {
+  if (this->frame_index_ == nullptr)
+    return this->current_frame_;
+  const uint8_t *entry = this->frame_index_ + this->current_frame_ * 2;
+  return progmem_read_byte(entry) << 8 | progmem_read_byte(entry + 1);
+}
 
 DisplayPage::DisplayPage(display_writer_t writer) : writer_(std::move(writer)) {}
 void DisplayPage::show() { this->parent_->show_page(this); }
@@ -499,9 +499,19 @@ class Animation : public Image {
    */
   void set_frame(int frame);
 
+  /** Set the table of frames in the data, for animations with repeated frames.
+   *
+   * @param frame_index For each frame the big endian 16-bit number of its data in data_start.
+   */
+  void set_frame_index(const uint8_t *frame_index);
+
  protected:
+  /// The number of the data of the current frame in data_start.
+  uint32_t get_frame_data_number_() const;
+
   int current_frame_;
   int animation_frame_count_;
+  const uint8_t *frame_index_{nullptr};
 };
 
 template<typename... Ts> class DisplayPageShowAction : public Action<Ts...> {
@@ -6,7 +6,7 @@ import re
 
 import requests
 
-from esphome import core
+from esphome import asset_cache, core
 from esphome.components import display
 import esphome.config_validation as cv
 import esphome.codegen as cg
@@ -22,7 +22,7 @@ from esphome.const import (
     CONF_PATH,
     CONF_WEIGHT,
 )
-from esphome.core import CORE, HexInt
+from esphome.core import CORE
 
 
 DOMAIN = "font"
@@ -347,40 +347,68 @@ def load_ttf_font(path, size):
     return TrueTypeFontWrapper(font)
 
 
-async def to_code(config):
-    conf = config[CONF_FILE]
-    if conf[CONF_TYPE] == TYPE_LOCAL_BITMAP:
-        font = load_bitmap_font(CORE.relative_config_path(conf[CONF_PATH]))
-    elif conf[CONF_TYPE] == TYPE_LOCAL:
-        path = CORE.relative_config_path(conf[CONF_PATH])
-        font = load_ttf_font(path, config[CONF_SIZE])
-    elif conf[CONF_TYPE] == TYPE_GFONTS:
-        path = _compute_gfonts_local_path(conf)
-        font = load_ttf_font(path, config[CONF_SIZE])
+def rasterize_font(path, font_type, size, glyphs):
+    """Return the packed bitmaps of the glyphs, their data offset, offset_x,
+    offset_y, width and height and the ascent and descent of the font file at path."""
+    if font_type == TYPE_LOCAL_BITMAP:
+        font = load_bitmap_font(path)
     else:
-        raise core.EsphomeError(f"Could not load font: unknown type: {conf[CONF_TYPE]}")
+        font = load_ttf_font(path, size)
 
-    ascent, descent = font.getmetrics(config[CONF_GLYPHS])
+    ascent, descent = font.getmetrics(glyphs)
 
     glyph_args = {}
-    data = []
-    for glyph in config[CONF_GLYPHS]:
+    data = bytearray()
+    # Glyphs with identical bitmaps share their data
+    offsets = {}
+    for glyph in glyphs:
         mask = font.getmask(glyph, mode="1")
         offset_x, offset_y = font.getoffset(glyph)
         width, height = mask.size
         width8 = ((width + 7) // 8) * 8
-        glyph_data = [0] * (height * width8 // 8)
+        glyph_data = bytearray(height * width8 // 8)
         for y in range(height):
             for x in range(width):
                 if not mask.getpixel((x, y)):
                     continue
                 pos = x + y * width8
                 glyph_data[pos // 8] |= 0x80 >> (pos % 8)
-        glyph_args[glyph] = (len(data), offset_x, offset_y, width, height)
-        data += glyph_data
+        glyph_data = bytes(glyph_data)
+        offset = offsets.get(glyph_data)
+        if offset is None:
+            offset = offsets[glyph_data] = len(data)
+            data += glyph_data
+        glyph_args[glyph] = (offset, offset_x, offset_y, width, height)
+    return data, glyph_args, ascent, descent
+
+
+def _conversion(config):
+    conf = config[CONF_FILE]
+    if conf[CONF_TYPE] in (TYPE_LOCAL_BITMAP, TYPE_LOCAL):
+        path = CORE.relative_config_path(conf[CONF_PATH])
+    elif conf[CONF_TYPE] == TYPE_GFONTS:
+        path = _compute_gfonts_local_path(conf)
+    else:
+        raise core.EsphomeError(f"Could not load font: unknown type: {conf[CONF_TYPE]}")
+    return (
+        rasterize_font,
+        str(path),
+        str(conf[CONF_TYPE]),
+        int(config[CONF_SIZE]),
+        [str(glyph) for glyph in config[CONF_GLYPHS]],
+    )
+
+
+def prepare_assets(config):
+    # Bitmap fonts are converted to pillow fonts in the .esphome directory first
+    if config[CONF_FILE][CONF_TYPE] != TYPE_LOCAL_BITMAP:
+        asset_cache.prefetch_asset(*_conversion(config))
+
+
+async def to_code(config):
+    data, glyph_args, ascent, descent = asset_cache.convert_asset(*_conversion(config))
 
-    rhs = [HexInt(x) for x in data]
-    prog_arr = cg.progmem_array(config[CONF_RAW_DATA_ID], rhs)
+    prog_arr = cg.progmem_array(config[CONF_RAW_DATA_ID], data)
 
     glyph_initializer = []
     for glyph in config[CONF_GLYPHS]:
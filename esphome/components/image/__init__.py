@@ -1,7 +1,8 @@
 import logging
 
-from esphome import core
+from esphome import asset_cache, core
 from esphome.components import display, font
+from esphome.components.image import convert
 import esphome.config_validation as cv
 import esphome.codegen as cg
 from esphome.const import (
@@ -12,7 +13,7 @@ from esphome.const import (
     CONF_RESIZE,
     CONF_TYPE,
 )
-from esphome.core import CORE, HexInt
+from esphome.core import CORE
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,89 +47,58 @@ IMAGE_SCHEMA = cv.Schema(
 CONFIG_SCHEMA = cv.All(font.validate_pillow_installed, IMAGE_SCHEMA)
 
 
-async def to_code(config):
+def convert_image(path, image_type, resize, dither):
+    """Return the pixel data, width and height of the image file at path."""
     from PIL import Image
 
-    path = CORE.relative_config_path(config[CONF_FILE])
     try:
         image = Image.open(path)
     except Exception as e:
         raise core.EsphomeError(f"Could not load image file {path}: {e}")
 
+    if resize is not None:
+        image.thumbnail(resize)
     width, height = image.size
 
-    if CONF_RESIZE in config:
-        image.thumbnail(config[CONF_RESIZE])
-        width, height = image.size
-    else:
-        if width > 500 or height > 500:
-            _LOGGER.warning(
-                "The image you requested is very big. Please consider using"
-                " the resize parameter."
-            )
-
-    dither = Image.NONE if config[CONF_DITHER] == "NONE" else Image.FLOYDSTEINBERG
-    if config[CONF_TYPE] == "GRAYSCALE":
+    dither = Image.NONE if dither == "NONE" else Image.FLOYDSTEINBERG
+    if image_type == "GRAYSCALE":
         image = image.convert("L", dither=dither)
-        pixels = list(image.getdata())
-        data = [0 for _ in range(height * width)]
-        pos = 0
-        for pix in pixels:
-            data[pos] = pix
-            pos += 1
-
-    elif config[CONF_TYPE] == "RGB24":
-        image = image.convert("RGB")
-        pixels = list(image.getdata())
-        data = [0 for _ in range(height * width * 3)]
-        pos = 0
-        for pix in pixels:
-            data[pos] = pix[0]
-            pos += 1
-            data[pos] = pix[1]
-            pos += 1
-            data[pos] = pix[2]
-            pos += 1
-
-    elif config[CONF_TYPE] == "RGB565":
+    elif image_type in ("RGB24", "RGB565"):
         image = image.convert("RGB")
-        pixels = list(image.getdata())
-        data = [0 for _ in range(height * width * 3)]
-        pos = 0
-        for pix in pixels:
-            R = pix[0] >> 3
-            G = pix[1] >> 2
-            B = pix[2] >> 3
-            rgb = (R << 11) | (G << 5) | B
-            data[pos] = rgb >> 8
-            pos += 1
-            data[pos] = rgb & 255
-            pos += 1
-
-    elif config[CONF_TYPE] == "BINARY":
+    elif image_type == "BINARY":
         image = image.convert("1", dither=dither)
-        width8 = ((width + 7) // 8) * 8
-        data = [0 for _ in range(height * width8 // 8)]
-        for y in range(height):
-            for x in range(width):
-                if image.getpixel((x, y)):
-                    continue
-                pos = x + y * width8
-                data[pos // 8] |= 0x80 >> (pos % 8)
-
-    elif config[CONF_TYPE] == "TRANSPARENT_BINARY":
+    elif image_type == "TRANSPARENT_BINARY":
         image = image.convert("RGBA")
-        width8 = ((width + 7) // 8) * 8
-        data = [0 for _ in range(height * width8 // 8)]
-        for y in range(height):
-            for x in range(width):
-                if not image.getpixel((x, y))[3]:
-                    continue
-                pos = x + y * width8
-                data[pos // 8] |= 0x80 >> (pos % 8)
-
-    rhs = [HexInt(x) for x in data]
-    prog_arr = cg.progmem_array(config[CONF_RAW_DATA_ID], rhs)
+    data = convert.pack_frame(image, image_type)
+    if image_type == "RGB565":
+        # The array has always been allocated with 3 bytes per pixel
+        data += bytes(width * height)
+    return data, width, height
+
+
+def _conversion(config):
+    return (
+        convert_image,
+        CORE.relative_config_path(config[CONF_FILE]),
+        str(config[CONF_TYPE]),
+        config.get(CONF_RESIZE),
+        str(config[CONF_DITHER]),
+    )
+
+
+def prepare_assets(config):
+    asset_cache.prefetch_asset(*_conversion(config))
+
+
+async def to_code(config):
+    data, width, height = asset_cache.convert_asset(*_conversion(config))
+    if CONF_RESIZE not in config and (width > 500 or height > 500):
+        _LOGGER.warning(
+            "The image you requested is very big. Please consider using"
+            " the resize parameter."
+        )
+
+    prog_arr = cg.progmem_array(config[CONF_RAW_DATA_ID], data)
     cg.new_Pvariable(
         config[CONF_ID], prog_arr, width, height, IMAGE_TYPE[config[CONF_TYPE]]
     )
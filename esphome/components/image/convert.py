@@ -0,0 +1,94 @@
+"""Conversion of Pillow images to the pixel data of display::Image.
+
+Shared by image and animation. Frames are converted with NumPy if it is installed,
+otherwise with Pillow image operations, both give the same bytes.
+"""
+from esphome import core
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The mode a frame has to be converted to before packing it as the image type
+FRAME_MODES = {
+    "GRAYSCALE": "L",
+    "RGB24": "RGB",
+    "RGB565": "RGB",
+    "BINARY": "1",
+    "TRANSPARENT_BINARY": "RGBA",
+}
+
+
+def _rgb565_numpy(frame) -> bytes:
+    pixels = np.asarray(frame, dtype=np.uint16)
+    rgb = (
+        (pixels[:, :, 0] >> 3) << 11
+        | (pixels[:, :, 1] >> 2) << 5
+        | (pixels[:, :, 2] >> 3)
+    )
+    return rgb.astype(">u2").tobytes()
+
+
+def _rgb565_pillow(frame) -> bytes:
+    from PIL import Image, ImageChops
+
+    red, green, blue = frame.split()
+    # The bits of the two parts of each byte don't overlap, so adding them is an or
+    high = ImageChops.add(red.point(lambda v: v & 0xF8), green.point(lambda v: v >> 5))
+    low = ImageChops.add(
+        green.point(lambda v: (v << 3) & 0xE0), blue.point(lambda v: v >> 3)
+    )
+    return Image.merge("LA", (high, low)).tobytes()
+
+
+def _binary_numpy(frame) -> bytes:
+    # Set bits are black, rows are padded to whole bytes
+    return np.packbits(~np.asarray(frame, dtype=bool), axis=1).tobytes()
+
+
+def _binary_pillow(frame) -> bytes:
+    return frame.tobytes("raw", "1;I")
+
+
+def _transparent_binary_numpy(frame) -> bytes:
+    # Set bits are opaque, rows are padded to whole bytes
+    return np.packbits(np.asarray(frame)[:, :, 3] != 0, axis=1).tobytes()
+
+
+def _transparent_binary_pillow(frame) -> bytes:
+    alpha = frame.getchannel("A")
+    return alpha.point(lambda v: 255 if v else 0, "1").tobytes()
+
+
+def frame_size(width: int, height: int, image_type: str) -> int:
+    """Return the number of bytes pack_frame returns for a frame of the given size."""
+    if image_type in ("BINARY", "TRANSPARENT_BINARY"):
+        return (width + 7) // 8 * height
+    if image_type == "GRAYSCALE":
+        return width * height
+    if image_type == "RGB565":
+        return width * height * 2
+    return width * height * 3
+
+
+def pack_frame(frame, image_type: str, use_numpy: bool = True) -> bytes:
+    """Return the pixel data of a frame as the given image type.
+
+    The frame must have the mode of the image type in FRAME_MODES.
+    """
+    if frame.mode != FRAME_MODES[image_type]:
+        raise core.EsphomeError(
+            f"Can't convert {frame.mode} image to {image_type}, "
+            f"{FRAME_MODES[image_type]} is needed"
+        )
+    use_numpy = use_numpy and np is not None
+    if image_type in ("GRAYSCALE", "RGB24"):
+        return frame.tobytes()
+    if image_type == "RGB565":
+        return _rgb565_numpy(frame) if use_numpy else _rgb565_pillow(frame)
+    if image_type == "BINARY":
+        return _binary_numpy(frame) if use_numpy else _binary_pillow(frame)
+    if use_numpy:
+        return _transparent_binary_numpy(frame)
+    return _transparent_binary_pillow(frame)
@@ -1,8 +1,9 @@
+import functools
 import logging
 import re
 
 import esphome.config_validation as cv
-from esphome import core
+from esphome import core, trace
 from esphome.const import CONF_SUBSTITUTIONS
 from esphome.yaml_util import ESPHomeDataBase, make_data_base
 from esphome.config_helpers import merge_config
@@ -48,79 +49,140 @@ VARIABLE_PROG = re.compile(
 )
 
 
-def _expand_substitutions(substitutions, value, path, ignore_missing):
-    if "$" not in value:
-        return value
-
-    orig_value = value
+@functools.lru_cache(maxsize=4096)
+def _compile_template(value):
+    """Split a string into (literal, variable name, variable text) segments.
 
+    The text after the last variable is the literal of a last segment without
+    variable name.
+    """
+    segments = []
     i = 0
-    while True:
-        m = VARIABLE_PROG.search(value, i)
-        if not m:
-            # Nothing more to match. Done
-            break
-
-        i, j = m.span(0)
+    for m in VARIABLE_PROG.finditer(value):
         name = m.group(1)
         if name.startswith("{") and name.endswith("}"):
             name = name[1:-1]
-        if name not in substitutions:
-            if not ignore_missing:
+        segments.append((value[i : m.start()], name, m.group(0)))
+        i = m.end()
+    segments.append((value[i:], None, None))
+    return tuple(segments)
+
+
+class _Substituter:
+    """Expands substitutions in a configuration in a single traversal.
+
+    The substitutions themselves are resolved first, so that a substitution
+    can use other substitutions, regardless of the order they are declared in.
+    """
+
+    def __init__(self, substitutions, ignore_missing):
+        self.substitutions = substitutions
+        self.ignore_missing = ignore_missing
+        # The path of the item being substituted, only used for warnings
+        self.path = []
+        self._resolved = {}
+        self._resolving = set()
+
+    def resolve_all(self):
+        for name in self.substitutions:
+            self._resolve(name)
+        self.substitutions.update(self._resolved)
+
+    def _resolve(self, name):
+        if name in self._resolved:
+            return self._resolved[name]
+        self._resolving.add(name)
+        saved_path, self.path = self.path, [CONF_SUBSTITUTIONS, name]
+        value = self.expand(self.substitutions[name])
+        self.path = saved_path
+        self._resolving.discard(name)
+        self._resolved[name] = value
+        return value
+
+    def _lookup(self, orig_value, name, text):
+        if name in self._resolved:
+            return self._resolved[name]
+        if name not in self.substitutions:
+            if not self.ignore_missing:
                 _LOGGER.warning(
                     "Found '%s' (see %s) which looks like a substitution, but '%s' was "
                     "not declared",
                     orig_value,
-                    "->".join(str(x) for x in path),
+                    "->".join(str(x) for x in self.path),
                     name,
                 )
-            i = j
-            continue
-
-        sub = substitutions[name]
-        tail = value[j:]
-        value = value[:i] + sub
-        i = len(value)
-        value += tail
-
-    # orig_value can also already be a lambda with esp_range info, and only
-    # a plain string is sent in orig_value
-    if isinstance(orig_value, ESPHomeDataBase):
-        # even though string can get larger or smaller, the range should point
-        # to original document marks
-        return make_data_base(value, orig_value)
-
-    return value
-
-
-def _substitute_item(substitutions, item, path, ignore_missing):
-    if isinstance(item, list):
-        for i, it in enumerate(item):
-            sub = _substitute_item(substitutions, it, path + [i], ignore_missing)
-            if sub is not None:
-                item[i] = sub
-    elif isinstance(item, dict):
-        replace_keys = []
-        for k, v in item.items():
-            if path or k != CONF_SUBSTITUTIONS:
-                sub = _substitute_item(substitutions, k, path + [k], ignore_missing)
+            return text
+        if name in self._resolving:
+            _LOGGER.warning(
+                "Substitution '%s' refers to itself (see %s)",
+                name,
+                "->".join(str(x) for x in self.path),
+            )
+            return text
+        return self._resolve(name)
+
+    def expand(self, value):
+        if "$" not in value:
+            return value
+
+        segments = _compile_template(str(value))
+        if len(segments) == 1:
+            return value
+        parts = []
+        for literal, name, text in segments:
+            parts.append(literal)
+            if name is not None:
+                parts.append(self._lookup(value, name, text))
+        expanded = "".join(parts)
+
+        # value can also already be a lambda with esp_range info, and only
+        # a plain string is sent in value
+        if isinstance(value, ESPHomeDataBase):
+            # even though string can get larger or smaller, the range should point
+            # to original document marks
+            return make_data_base(expanded, value)
+
+        return expanded
+
+    def substitute(self, item):
+        """Substitute item in place, returns the new value if item itself changed."""
+        path = self.path
+        if isinstance(item, list):
+            path.append(None)
+            for i, it in enumerate(item):
+                path[-1] = i
+                sub = self.substitute(it)
+                if sub is not None:
+                    item[i] = sub
+            path.pop()
+        elif isinstance(item, dict):
+            replace_keys = []
+            # The top level substitutions are already resolved
+            top_level = not path
+            path.append(None)
+            for k, v in item.items():
+                path[-1] = k
+                if top_level and k == CONF_SUBSTITUTIONS:
+                    continue
+                sub = self.substitute(k)
                 if sub is not None:
                     replace_keys.append((k, sub))
-            sub = _substitute_item(substitutions, v, path + [k], ignore_missing)
-            if sub is not None:
-                item[k] = sub
-        for old, new in replace_keys:
-            item[new] = merge_config(item.get(old), item.get(new))
-            del item[old]
-    elif isinstance(item, str):
-        sub = _expand_substitutions(substitutions, item, path, ignore_missing)
-        if sub != item:
-            return sub
-    elif isinstance(item, core.Lambda):
-        sub = _expand_substitutions(substitutions, item.value, path, ignore_missing)
-        if sub != item:
-            item.value = sub
-    return None
+                sub = self.substitute(v)
+                if sub is not None:
+                    item[k] = sub
+            path.pop()
+            for old, new in replace_keys:
+                item[new] = merge_config(item.get(old), item.get(new))
+                del item[old]
+        elif isinstance(item, str):
+            sub = self.expand(item)
+            if sub != item:
+                return sub
+        elif isinstance(item, core.Lambda):
+            sub = self.expand(item.value)
+            if sub != item.value:
+                item.value = sub
+        return None
 
 
 def do_substitution_pass(config, command_line_substitutions, ignore_missing=False):
@@ -152,4 +214,7 @@ def do_substitution_pass(config, command_line_substitutions, ignore_missing=Fals
     config[CONF_SUBSTITUTIONS] = substitutions
     # Move substitutions to the first place to replace substitutions in them correctly
     config.move_to_end(CONF_SUBSTITUTIONS, False)
-    _substitute_item(substitutions, config, [], ignore_missing)
+    with trace.span("substitutions", "config"):
+        substituter = _Substituter(substitutions, ignore_missing)
+        substituter.resolve_all()
+        substituter.substitute(config)
@@ -1,7 +1,11 @@
 import abc
+import copy
 import functools
+import hashlib
 import heapq
+import io
 import logging
+import pickle
 import re
 
 from typing import Optional, Union
@@ -10,7 +14,7 @@ from contextlib import contextmanager
 
 import voluptuous as vol
 
-from esphome import core, yaml_util, loader
+from esphome import core, yaml_util, loader, trace
 import esphome.core.config as core_config
 from esphome.const import (
     CONF_ESPHOME,
@@ -21,7 +25,7 @@ from esphome.const import (
     TARGET_PLATFORMS,
 )
 from esphome.core import CORE, EsphomeError
-from esphome.helpers import indent
+from esphome.helpers import indent, write_file
 from esphome.util import safe_print, OrderedDict
 
 from esphome.loader import get_component, get_platform, ComponentManifest
@@ -96,6 +100,8 @@ class Config(OrderedDict, fv.FinalValidateConfig):
         self._validation_tasks: list[_ValidationStepTask] = []
         # ID to ensure stable order for keys with equal priority
         self._validation_tasks_id = 0
+        # Results of an earlier validation run that schema steps may reuse
+        self.schema_cache: Optional["SchemaValidationCache"] = None
 
     def add_error(self, error: vol.Invalid) -> None:
         if isinstance(error, vol.MultipleInvalid):
@@ -119,8 +125,13 @@ class Config(OrderedDict, fv.FinalValidateConfig):
 
     def run_validation_steps(self):
         while self._validation_tasks:
-            task = heapq.heappop(self._validation_tasks)
-            task.step.run(self)
+            step = heapq.heappop(self._validation_tasks).step
+            name = type(step).__name__
+            domain = getattr(step, "domain", None)
+            if domain is not None:
+                name = f"{name} {domain}"
+            with trace.span(name, "validation"):
+                step.run(self)
 
     @contextmanager
     def catch_error(self, path=None):
@@ -401,6 +412,13 @@ class MetadataValidationStep(ConfigValidationStep):
         self.comp = component
 
     def run(self, result: Config) -> None:
+        if not loader.import_component(self.comp):
+            if self.comp.is_platform:
+                message = f"Platform not found: '{self.domain}'"
+            else:
+                message = f"Component not found: {self.domain}"
+            result.add_str_error(message, self.path)
+            return
         if self.conf is None:
             result[self.domain] = self.conf = {}
 
@@ -428,7 +446,7 @@ class MetadataValidationStep(ConfigValidationStep):
 
         if (
             not self.comp.is_platform_component
-            and self.comp.config_schema is None
+            and not self.comp.has_config_schema
             and not isinstance(self.conf, core.AutoLoad)
         ):
             result.add_str_error(
@@ -473,13 +491,37 @@ class SchemaValidationStep(ConfigValidationStep):
     def __init__(
         self, domain: str, path: ConfigPath, conf: ConfigType, comp: ComponentManifest
     ):
+        self.domain = domain
         self.path = path
         self.conf = conf
         self.comp = comp
 
     def run(self, result: Config) -> None:
+        loader.import_components()
         if self.comp.config_schema is None:
             return
+        cache = result.schema_cache
+        if cache is not None:
+            key = (
+                tuple(self.path),
+                config_fingerprint(self.conf),
+                frozenset(CORE.loaded_integrations),
+            )
+            entry = cache.get(key)
+            if entry is not None:
+                success, validated, errors = entry
+                if success:
+                    result.set_by_path(self.path, copy_validated_config(validated))
+                for err in errors:
+                    result.add_error(err)
+                result.add_validation_step(
+                    FinalValidateValidationStep(self.path, self.comp)
+                )
+                return
+            num_errors = len(result.errors)
+
+        success = False
+        validated = None
         with result.catch_error(self.path):
             if self.comp.is_platform:
                 # Remove 'platform' key for validation
@@ -492,11 +534,16 @@ class SchemaValidationStep(ConfigValidationStep):
                     validated = OrderedDict(validated)
                 validated["platform"] = platform_val
                 validated.move_to_end("platform", last=False)
-                result.set_by_path(self.path, validated)
             else:
                 schema = cv.Schema(self.comp.config_schema)
                 validated = schema(self.conf)
-                result.set_by_path(self.path, validated)
+            result.set_by_path(self.path, validated)
+            success = True
+
+        if cache is not None:
+            # Store a copy, the ID pass modifies the IDs in the validated config
+            validated = copy_validated_config(validated)
+            cache.set(key, (success, validated, result.errors[num_errors:]))
 
         result.add_validation_step(FinalValidateValidationStep(self.path, self.comp))
 
@@ -517,6 +564,7 @@ class IDPassValidationStep(ConfigValidationStep):
         pass
 
     def run(self, result: Config) -> None:
+        from esphome.config_validation import RESERVED_IDS
         from esphome.cpp_generator import MockObjClass
         from esphome.cpp_types import Component
 
@@ -526,27 +574,44 @@ class IDPassValidationStep(ConfigValidationStep):
             # because the component that did not validate doesn't have any IDs set
             return
 
+        # Declared IDs by name, and by the names of their type and all its parents
+        declared_by_name: dict[str, tuple[core.ID, ConfigPath]] = {}
+        declared_by_type: Optional[dict[str, list[core.ID]]] = None
+
         searching_ids: list[tuple[core.ID, ConfigPath]] = []
         for id, path in iter_ids(result):
             if id.is_declaration:
                 if id.id is not None:
                     # Look for duplicate definitions
-                    match = next(
-                        (v for v in result.declare_ids if v[0].id == id.id), None
-                    )
+                    match = declared_by_name.get(id.id)
                     if match is not None:
                         opath = "->".join(str(v) for v in match[1])
                         result.add_str_error(
                             f"ID {id.id} redefined! Check {opath}", path
                         )
                         continue
+                    declared_by_name[id.id] = (id, path)
                 result.declare_ids.append((id, path))
             else:
                 searching_ids.append((id, path))
 
-        # Resolve default ids after manual IDs
-        for id, _ in result.declare_ids:
-            id.resolve([v[0].id for v in result.declare_ids])
+        # Resolve default ids after manual IDs, equivalent to
+        # id.resolve([v[0].id for v in result.declare_ids]) for every declared ID
+        used_ids = set(declared_by_name) | set(RESERVED_IDS) | CORE.loaded_integrations
+        # The first suffix that may still be free, per auto ID base name
+        next_suffix: dict[str, int] = {}
+        for id, path in result.declare_ids:
+            if id.id is None:
+                base = id.auto_id_base
+                tries = next_suffix.get(base, 1)
+                name = base if tries == 1 else f"{base}_{tries}"
+                while name in used_ids:
+                    tries += 1
+                    name = f"{base}_{tries}"
+                next_suffix[base] = tries
+                used_ids.add(name)
+                id.id = name
+                declared_by_name[name] = (id, path)
             if isinstance(id.type, MockObjClass) and id.type.inherits_from(Component):
                 CORE.component_ids.add(id.id)
 
@@ -554,9 +619,7 @@ class IDPassValidationStep(ConfigValidationStep):
         for id, path in searching_ids:
             if id.id is not None:
                 # manually declared
-                match = next(
-                    (v[0] for v in result.declare_ids if v[0].id == id.id), None
-                )
+                match = declared_by_name.get(id.id, (None,))[0]
                 if match is None or not match.is_manual:
                     # No declared ID with this name
                     import difflib
@@ -586,13 +649,14 @@ class IDPassValidationStep(ConfigValidationStep):
                     )
 
             if id.id is None and id.type is not None:
-                matches = []
-                for v in result.declare_ids:
-                    if v[0] is None or not isinstance(v[0].type, MockObjClass):
-                        continue
-                    inherits = v[0].type.inherits_from(id.type)
-                    if inherits:
-                        matches.append(v[0])
+                if declared_by_type is None:
+                    declared_by_type = {}
+                    for declared, _ in result.declare_ids:
+                        if not isinstance(declared.type, MockObjClass):
+                            continue
+                        for name in declared.type.inherited_names():
+                            declared_by_type.setdefault(name, []).append(declared)
+                matches = declared_by_type.get(str(id.type), [])
 
                 if len(matches) == 0:
                     result.add_str_error(
@@ -648,7 +712,106 @@ class FinalValidateValidationStep(ConfigValidationStep):
         fv.full_config.reset(token)
 
 
-def validate_config(config, command_line_substitutions) -> Config:
+@functools.lru_cache(maxsize=None)
+def _type_fingerprint(cls: type) -> bytes:
+    return ",".join(f"{c.__module__}.{c.__qualname__}" for c in cls.__mro__).encode()
+
+
+def _update_fingerprint(hasher, value) -> None:
+    hasher.update(_type_fingerprint(type(value)))
+    if isinstance(value, ESPHomeDataBase):
+        hasher.update(str(value.esp_range).encode())
+    if isinstance(value, dict):
+        hasher.update(b"{")
+        for key, val in value.items():
+            _update_fingerprint(hasher, key)
+            _update_fingerprint(hasher, val)
+        hasher.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b"[")
+        for val in value:
+            _update_fingerprint(hasher, val)
+        hasher.update(b"]")
+    elif isinstance(value, core.Lambda):
+        hasher.update(repr(value.value).encode())
+    else:
+        hasher.update(repr(value).encode())
+
+
+def config_fingerprint(config) -> str:
+    """Return a hash of a raw config fragment, including its document marks."""
+    hasher = hashlib.sha256()
+    _update_fingerprint(hasher, config)
+    return hasher.hexdigest()
+
+
+def copy_validated_config(config, memo=None):
+    """Copy the containers and IDs of a validated config, other values are shared."""
+    if memo is None:
+        memo = {}
+    if id(config) in memo:
+        return memo[id(config)]
+    if isinstance(config, core.ID):
+        ret = config.copy()
+    elif isinstance(config, dict):
+        ret = copy.copy(config)
+        ret.clear()
+        memo[id(config)] = ret
+        for key, value in config.items():
+            ret[copy_validated_config(key, memo)] = copy_validated_config(value, memo)
+    elif isinstance(config, list):
+        ret = copy.copy(config)
+        memo[id(config)] = ret
+        ret[:] = [copy_validated_config(value, memo) for value in config]
+    else:
+        return config
+    memo[id(config)] = ret
+    return ret
+
+
+class SchemaValidationCache:
+    """Keeps the results of SchemaValidationStep between validation runs.
+
+    This is used by long running validation loops (vscode/ace) that validate the same
+    configuration over and over with only small changes. The result of a schema
+    validation only depends on the config fragment (including its document marks, which
+    end up in the validated config), the core and target platform config and the set of
+    loaded integrations. If none of those changed, the validated fragment and its errors
+    are taken from the previous run. The ID pass and final validation always run.
+
+    Only the entries used in the last run are kept.
+    """
+
+    def __init__(self) -> None:
+        self._context: Optional[str] = None
+        self._entries = {}
+        self._new_entries = {}
+
+    def start(self, context: str) -> None:
+        if context != self._context:
+            self._entries = {}
+        self._context = context
+        self._new_entries = {}
+
+    def finish(self) -> None:
+        self._entries = self._new_entries
+        self._new_entries = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._new_entries[key] = entry
+        return entry
+
+    def set(self, key, entry) -> None:
+        self._new_entries[key] = entry
+
+
+def validate_config(
+    config,
+    command_line_substitutions,
+    schema_cache: Optional[SchemaValidationCache] = None,
+) -> Config:
     result = Config()
 
     loader.clear_component_meta_finders()
@@ -660,7 +823,8 @@ def validate_config(config, command_line_substitutions) -> Config:
 
         result.add_output_path([CONF_PACKAGES], CONF_PACKAGES)
         try:
-            config = do_packages_pass(config)
+            with trace.span("packages", "config"):
+                config = do_packages_pass(config)
         except vol.Invalid as err:
             result.update(config)
             result.add_error(err)
@@ -679,7 +843,6 @@ def validate_config(config, command_line_substitutions) -> Config:
         result.add_output_path([CONF_SUBSTITUTIONS], CONF_SUBSTITUTIONS)
         try:
             substitutions.do_substitution_pass(config, command_line_substitutions)
-            substitutions.do_substitution_pass(config, command_line_substitutions)
         except vol.Invalid as err:
             result.add_error(err)
             return result
@@ -740,12 +903,24 @@ def validate_config(config, command_line_substitutions) -> Config:
         # do not try to validate further as we don't know what the target is
         return result
 
+    if schema_cache is not None:
+        # The core and platform configs are always validated, they set up CORE
+        context = [CORE.config_path] + [
+            config.get(key)
+            for key in (CONF_ESPHOME, CONF_EXTERNAL_COMPONENTS, *TARGET_PLATFORMS)
+        ]
+        schema_cache.start(config_fingerprint(context))
+        result.schema_cache = schema_cache
+
     for domain, conf in config.items():
         result.add_validation_step(LoadValidationStep(domain, conf))
     result.add_validation_step(IDPassValidationStep())
 
     result.run_validation_steps()
 
+    if schema_cache is not None:
+        schema_cache.finish()
+
     return result
 
 
@@ -809,30 +984,91 @@ class InvalidYAMLError(EsphomeError):
         self.base_exc = base_exc
 
 
-def _load_config(command_line_substitutions):
-    try:
-        config = yaml_util.load_yaml(CORE.config_path)
-    except EsphomeError as e:
-        raise InvalidYAMLError(e) from e
+def _load_config(command_line_substitutions, schema_cache=None, raw_config=None):
+    config = raw_config
+    if config is None:
+        try:
+            config = yaml_util.load_yaml(CORE.config_path)
+        except EsphomeError as e:
+            raise InvalidYAMLError(e) from e
 
     try:
-        result = validate_config(config, command_line_substitutions)
+        result = validate_config(config, command_line_substitutions, schema_cache)
     except EsphomeError:
         raise
     except Exception:
         _LOGGER.error("Unexpected exception while reading configuration:")
         raise
+    finally:
+        loader.save_component_index()
 
     return result
 
 
-def load_config(command_line_substitutions):
+def load_config(command_line_substitutions, schema_cache=None, raw_config=None):
     try:
-        return _load_config(command_line_substitutions)
+        return _load_config(command_line_substitutions, schema_cache, raw_config)
     except vol.Invalid as err:
         raise EsphomeError(f"Error while parsing config: {err}") from err
 
 
+# The state of CORE read_config() sets up, besides the configuration path
+VALIDATED_CORE_STATE = (
+    "name",
+    "build_path",
+    "data",
+    "config",
+    "raw_config",
+    "loaded_integrations",
+    "component_ids",
+)
+
+
+def save_validated_config(path: str) -> bool:
+    """Store the configuration read by read_config() and the state of CORE.
+
+    Later steps in another process restore them with load_validated_config()
+    instead of reading the configuration again. Returns False if they can't be
+    stored.
+    """
+    state = {key: getattr(CORE, key, None) for key in VALIDATED_CORE_STATE}
+    with io.BytesIO() as buf:
+        try:
+            yaml_util.CachePickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+        except (pickle.PicklingError, TypeError, AttributeError) as err:
+            _LOGGER.debug("Could not store the validated configuration: %s", err)
+            return False
+        data = buf.getvalue()
+    try:
+        write_file(path, data)
+    except EsphomeError as err:
+        _LOGGER.debug("Could not store the validated configuration: %s", err)
+        return False
+    return True
+
+
+def load_validated_config(path: str) -> Optional[ConfigType]:
+    """Restore a configuration stored by save_validated_config() into CORE.
+
+    CORE.config_path has to be set. Returns None if it can't be read.
+    """
+    try:
+        with open(path, "rb") as f_handle:
+            state = pickle.load(f_handle)
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.debug("Could not read the validated configuration %s: %s", path, err)
+        return None
+    for key, value in state.items():
+        setattr(CORE, key, value)
+    loader.clear_component_meta_finders()
+    loader.install_custom_components_meta_finder()
+    if CONF_EXTERNAL_COMPONENTS in (CORE.raw_config or {}):
+        from esphome.components.external_components import do_external_components_pass
+
+        do_external_components_pass(CORE.raw_config)
+    return CORE.config
+
+
 def line_info(config, path, highlight=True):
     """Display line config source."""
     if not highlight:
@@ -971,10 +1207,14 @@ def strip_default_ids(config):
     return config
 
 
-def read_config(command_line_substitutions):
+def read_config(command_line_substitutions, raw_config=None):
+    """Read and validate the configuration at CORE.config_path.
+
+    raw_config is its YAML, if it was already loaded.
+    """
     _LOGGER.info("Reading configuration %s...", CORE.config_path)
     try:
-        res = load_config(command_line_substitutions)
+        res = load_config(command_line_substitutions, raw_config=raw_config)
     except EsphomeError as err:
         _LOGGER.error("Error while reading config: %s", err)
         return None
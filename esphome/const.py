@@ -654,6 +654,7 @@ CONF_SPEED_LEVEL_STATE_TOPIC = "speed_level_state_topic"
 CONF_SPEED_STATE_TOPIC = "speed_state_topic"
 CONF_SPI_ID = "spi_id"
 CONF_SPIKE_REJECTION = "spike_rejection"
+CONF_SPLIT_SETUP = "split_setup"
 CONF_SSID = "ssid"
 CONF_SSL_FINGERPRINTS = "ssl_fingerprints"
 CONF_STARTUP_DELAY = "startup_delay"
@@ -787,6 +788,14 @@ CONF_Y_GRID = "y_grid"
 CONF_ZERO = "zero"
 
 ENV_NOGITIGNORE = "ESPHOME_NOGITIGNORE"
+ENV_NO_YAML_CACHE = "ESPHOME_NO_YAML_CACHE"
+ENV_NO_COMPONENT_INDEX = "ESPHOME_NO_COMPONENT_INDEX"
+ENV_NO_CODEGEN_CACHE = "ESPHOME_NO_CODEGEN_CACHE"
+ENV_NO_ASSET_CACHE = "ESPHOME_NO_ASSET_CACHE"
+ENV_ARTIFACT_CACHE = "ESPHOME_ARTIFACT_CACHE"
+ENV_NO_OBJECT_CACHE = "ESPHOME_NO_OBJECT_CACHE"
+ENV_OBJECT_CACHE_SIZE = "ESPHOME_OBJECT_CACHE_SIZE"
+ENV_DAEMON_SOCKET = "ESPHOME_DAEMON_SOCKET"
 ENV_QUICKWIZARD = "ESPHOME_QUICKWIZARD"
 
 ICON_ACCELERATION = "mdi:axis-arrow"
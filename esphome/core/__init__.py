@@ -18,6 +18,7 @@ from esphome.const import (
 )
 from esphome.coroutine import FakeAwaitable as _FakeAwaitable
 from esphome.coroutine import FakeEventLoop as _FakeEventLoop
+from esphome.coroutine import WaitFor as _WaitFor
 
 # pylint: disable=unused-import
 from esphome.coroutine import coroutine, coroutine_with_priority  # noqa
@@ -54,6 +55,9 @@ class IPAddress:
     def __str__(self):
         return ".".join(str(x) for x in self.args)
 
+    def __repr__(self):
+        return f"IPAddress<{self}>"
+
 
 class MACAddress:
     def __init__(self, *parts):
@@ -64,6 +68,9 @@ class MACAddress:
     def __str__(self):
         return ":".join(f"{part:02X}" for part in self.parts)
 
+    def __repr__(self):
+        return f"MACAddress<{self}>"
+
     @property
     def as_hex(self):
         from esphome.cpp_generator import RawExpression
@@ -312,12 +319,16 @@ class ID:
         from esphome.config_validation import RESERVED_IDS
 
         if self.id is None:
-            base = str(self.type).replace("::", "_").lower()
-            name = "".join(c for c in base if c.isalnum() or c == "_")
             used = set(registered_ids) | set(RESERVED_IDS) | CORE.loaded_integrations
-            self.id = ensure_unique_string(name, used)
+            self.id = ensure_unique_string(self.auto_id_base, used)
         return self.id
 
+    @property
+    def auto_id_base(self):
+        """The name automatically resolved IDs of this type are based on."""
+        base = str(self.type).replace("::", "_").lower()
+        return "".join(c for c in base if c.isalnum() or c == "_")
+
     def __str__(self):
         if self.id is None:
             return ""
@@ -472,6 +483,8 @@ class EsphomeCore:
         self.variables: dict[str, "MockObj"] = {}
         # A list of statements that go in the main setup() block
         self.main_statements: list["Statement"] = []
+        # The component domain that added each of the main statements
+        self.main_statement_domains: list[Optional[str]] = []
         # A list of statements to insert in the global block (includes and global variables)
         self.global_statements: list["Statement"] = []
         # A set of platformio libraries to add to the project
@@ -488,6 +501,9 @@ class EsphomeCore:
         self.component_ids = set()
         # Whether ESPHome was started in verbose mode
         self.verbose = False
+        # Receives the calls of the code generation task being recorded, see
+        # esphome.codegen_cache
+        self.codegen_recorder: Optional[list[tuple[str, tuple]]] = None
 
     def reset(self):
         self.dashboard = False
@@ -500,6 +516,7 @@ class EsphomeCore:
         self.task_counter = 0
         self.variables = {}
         self.main_statements = []
+        self.main_statement_domains = []
         self.global_statements = []
         self.libraries = []
         self.build_flags = set()
@@ -507,6 +524,11 @@ class EsphomeCore:
         self.platformio_options = {}
         self.loaded_integrations = set()
         self.component_ids = set()
+        self.codegen_recorder = None
+
+    def _record_codegen(self, method: str, *args) -> None:
+        if self.codegen_recorder is not None:
+            self.codegen_recorder.append((method, args))
 
     @property
     def address(self) -> Optional[str]:
@@ -609,6 +631,7 @@ class EsphomeCore:
         return self.target_framework == "esp-idf"
 
     def add_job(self, func, *args, **kwargs):
+        self._record_codegen("add_job")
         self.event_loop.add_job(func, *args, **kwargs)
 
     def flush_tasks(self):
@@ -628,6 +651,8 @@ class EsphomeCore:
             )
 
         self.main_statements.append(expression)
+        self.main_statement_domains.append(self.event_loop.current_domain)
+        self._record_codegen("add", expression)
         _LOGGER.debug("Adding: %s", expression)
         return expression
 
@@ -641,6 +666,7 @@ class EsphomeCore:
                 f"Add '{expression}' must be expression or statement, not {type(expression)}"
             )
         self.global_statements.append(expression)
+        self._record_codegen("add_global", expression)
         _LOGGER.debug("Adding global: %s", expression)
         return expression
 
@@ -649,6 +675,7 @@ class EsphomeCore:
             raise ValueError(
                 f"Library {library} must be instance of Library, not {type(library)}"
             )
+        self._record_codegen("add_library", library)
         for other in self.libraries[:]:
             if other.name != library.name or other.name is None or library.name is None:
                 continue
@@ -687,6 +714,7 @@ class EsphomeCore:
 
     def add_build_flag(self, build_flag):
         self.build_flags.add(build_flag)
+        self._record_codegen("add_build_flag", build_flag)
         _LOGGER.debug("Adding build flag: %s", build_flag)
         return build_flag
 
@@ -700,16 +728,21 @@ class EsphomeCore:
                 f"Define {define} must be string or Define, not {type(define)}"
             )
         self.defines.add(define)
+        self._record_codegen("add_define", define)
         _LOGGER.debug("Adding define: %s", define)
         return define
 
     def add_platformio_option(self, key: str, value: Union[str, list[str]]) -> None:
         new_val = value
         old_val = self.platformio_options.get(key)
+        if isinstance(old_val, str) and isinstance(value, list):
+            # Options like extra_scripts take a single value or a list
+            old_val = [old_val]
         if isinstance(old_val, list):
             assert isinstance(value, list)
             new_val = old_val + value
         self.platformio_options[key] = new_val
+        self._record_codegen("add_platformio_option", key, value)
 
     def _get_variable_generator(self, id):
         while True:
@@ -717,11 +750,12 @@ class EsphomeCore:
                 return self.variables[id]
             except KeyError:
                 _LOGGER.debug("Waiting for variable %s (%r)", id, id)
-                yield
+                yield _WaitFor(id)
 
     async def get_variable(self, id) -> "MockObj":
         if not isinstance(id, ID):
             raise ValueError(f"ID {id!r} must be of type ID!")
+        self._record_codegen("get_variable", id)
         # Fast path, check if already registered without awaiting
         if id in self.variables:
             return self.variables[id]
@@ -734,11 +768,12 @@ class EsphomeCore:
                     if k == id:
                         return (k, v)
             _LOGGER.debug("Waiting for variable %s", id)
-            yield
+            yield _WaitFor(id)
 
     async def get_variable_with_full_id(self, id: ID) -> tuple[ID, "MockObj"]:
         if not isinstance(id, ID):
             raise ValueError(f"ID {id!r} must be of type ID!")
+        self._record_codegen("get_variable", id)
         return await _FakeAwaitable(self._get_variable_with_full_id_generator(id))
 
     def register_variable(self, id, obj):
@@ -746,6 +781,8 @@ class EsphomeCore:
             raise EsphomeError(f"ID {id} is already registered")
         _LOGGER.debug("Registered variable %s of type %s", id.id, id.type)
         self.variables[id] = obj
+        self._record_codegen("register_variable", id, obj)
+        self.event_loop.wake(id)
 
     def has_id(self, id):
         return id in self.variables
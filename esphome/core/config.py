@@ -27,6 +27,7 @@ from esphome.const import (
     CONF_PRIORITY,
     CONF_PROJECT,
     CONF_SOURCE,
+    CONF_SPLIT_SETUP,
     CONF_TRIGGER_ID,
     CONF_TYPE,
     CONF_VERSION,
@@ -165,6 +166,7 @@ CONFIG_SCHEMA = cv.All(
             cv.Optional(
                 CONF_COMPILE_PROCESS_LIMIT, default=_compile_process_limit_default
             ): cv.int_range(min=1, max=multiprocessing.cpu_count()),
+            cv.Optional(CONF_SPLIT_SETUP, default=False): cv.boolean,
         }
     ),
     validate_hostname,
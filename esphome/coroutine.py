@@ -48,9 +48,11 @@ import heapq
 import inspect
 import logging
 import types
-from typing import Any, Callable
+from typing import Any, Callable, Hashable, Optional
 from collections.abc import Awaitable, Generator, Iterator
 
+from esphome import trace
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -160,6 +162,19 @@ class FakeAwaitable:
         return ret
 
 
+class WaitFor:
+    """Yielded by a task that can't continue before `key` is available.
+
+    The event loop parks the task until `FakeEventLoop.wake(key)` is called, instead
+    of polling it again.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: Hashable) -> None:
+        self.key = key
+
+
 @functools.total_ordering
 class _Task:
     def __init__(
@@ -168,14 +183,25 @@ class _Task:
         id_number: int,
         iterator: Iterator[None],
         original_function: Any,
+        args: tuple = (),
+        domain: Optional[str] = None,
     ):
         self.priority = priority
         self.id_number = id_number
         self.iterator = iterator
         self.original_function = original_function
+        self.args = args
+        self.domain = domain
 
     def with_priority(self, priority: float) -> "_Task":
-        return _Task(priority, self.id_number, self.iterator, self.original_function)
+        return _Task(
+            priority,
+            self.id_number,
+            self.iterator,
+            self.original_function,
+            self.args,
+            self.domain,
+        )
 
     @property
     def _cmp_tuple(self) -> tuple[float, int]:
@@ -190,6 +216,53 @@ class _Task:
     def __lt__(self, other):
         return self._cmp_tuple < other._cmp_tuple
 
+    def __str__(self):
+        func = self.original_function
+        return f"{func.__module__}.{func.__qualname__}"
+
+
+def _declared_ids(obj: Any) -> Iterator[Any]:
+    """Find the IDs declared in the arguments of a task."""
+    from esphome.core import ID
+
+    if isinstance(obj, ID):
+        if obj.is_declaration:
+            yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from _declared_ids(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            yield from _declared_ids(value)
+
+
+def _deadlock_message(parked: dict[Hashable, list[_Task]]) -> str:
+    """Describe why the parked tasks can't continue, listing a dependency cycle."""
+    waiting_on = {}
+    declared_by = {}
+    for key, tasks in parked.items():
+        for task in tasks:
+            waiting_on[task.id_number] = key
+            for id_ in _declared_ids(task.args):
+                declared_by.setdefault(id_, task)
+
+    for start in parked:
+        path = [start]
+        key = start
+        while key in declared_by and declared_by[key].id_number in waiting_on:
+            key = waiting_on[declared_by[key].id_number]
+            if key in path:
+                cycle = path[path.index(key) :] + [key]
+                return "Circular dependency detected between IDs: " + " -> ".join(
+                    str(id_) for id_ in cycle
+                )
+            path.append(key)
+
+    waits = ", ".join(
+        f"{task} waits for {key}" for key, tasks in parked.items() for task in tasks
+    )
+    return f"Unable to complete code generation: {waits}"
+
 
 class FakeEventLoop:
     """Emulate an asyncio EventLoop to run some registered coroutine jobs in sequence."""
@@ -197,11 +270,19 @@ class FakeEventLoop:
     def __init__(self):
         self._pending_tasks: list[_Task] = []
         self._task_counter = 0
+        # Tasks that yielded WaitFor(key), by key
+        self._parked_tasks: dict[Hashable, list[_Task]] = {}
+        # The component domain of the running task
+        self.current_domain: Optional[str] = None
+        # The number of task steps run so far
+        self.steps = 0
 
     def add_job(self, func, *args, **kwargs):
         """Add a job to the task queue,
 
         Optionally retrieves priority from the function object, and schedules according to that.
+        The job belongs to the component domain in the `codegen_domain` attribute of the
+        function, or else to the domain of the task adding it.
         """
         if inspect.iscoroutine(func):
             raise ValueError("Can only add coroutine functions, not coroutine objects")
@@ -212,10 +293,16 @@ class FakeEventLoop:
             coro = coroutine(func)
             gen = coro(*args, **kwargs)
         prio = getattr(coro, "priority", 0.0)
-        task = _Task(prio, self._task_counter, gen, func)
+        domain = getattr(func, "codegen_domain", self.current_domain)
+        task = _Task(prio, self._task_counter, gen, func, args, domain)
         self._task_counter += 1
         heapq.heappush(self._pending_tasks, task)
 
+    def wake(self, key: Hashable) -> None:
+        """Schedule the tasks waiting for key again, with their original priority."""
+        for task in self._parked_tasks.pop(key, ()):
+            heapq.heappush(self._pending_tasks, task)
+
     def flush_tasks(self):
         """Run until all tasks have been completed.
 
@@ -225,9 +312,10 @@ class FakeEventLoop:
         while self._pending_tasks:
             i += 1
             if i > 1000000:
-                # Detect deadlock/circular dependency by measuring how many times tasks have been
-                # executed. On the big tests/test1.yaml we only get to a fraction of this, so
-                # this shouldn't be a problem.
+                # Tasks that yield without saying what they wait for are polled, detect
+                # them never finishing by measuring how many times tasks have been
+                # executed. On the big tests/test1.yaml we only get to a fraction of this,
+                # so this shouldn't be a problem.
                 raise RuntimeError(
                     "Circular dependency detected! "
                     "Please run with -v option to see what functions failed to "
@@ -235,6 +323,7 @@ class FakeEventLoop:
                 )
 
             task: _Task = heapq.heappop(self._pending_tasks)
+            self.steps += 1
             _LOGGER.debug(
                 "Running %s in %s (num %s)",
                 task.original_function.__qualname__,
@@ -242,12 +331,22 @@ class FakeEventLoop:
                 task.id_number,
             )
 
+            self.current_domain = task.domain
             try:
-                next(task.iterator)
-                # Decrease priority over time, so that if this task is blocked
-                # due to a dependency others will clear the dependency
-                # This could be improved with a less naive approach
-                new_task = task.with_priority(task.priority - 1)
-                heapq.heappush(self._pending_tasks, new_task)
+                with trace.span(str(task), "codegen"):
+                    waiting_for = next(task.iterator)
             except StopIteration:
                 _LOGGER.debug(" -> finished")
+                continue
+            finally:
+                self.current_domain = None
+
+            if isinstance(waiting_for, WaitFor):
+                self._parked_tasks.setdefault(waiting_for.key, []).append(task)
+                continue
+            # Decrease priority over time, so that if this task is blocked
+            # due to a dependency others will clear the dependency
+            heapq.heappush(self._pending_tasks, task.with_priority(task.priority - 1))
+
+        if self._parked_tasks:
+            raise RuntimeError(_deadlock_message(self._parked_tasks))
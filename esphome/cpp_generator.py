@@ -9,6 +9,7 @@ from esphome.core import (
     CORE,
     ID,
     Define,
+    DocumentLocation,
     EnumValue,
     HexInt,
     Lambda,
@@ -183,6 +184,24 @@ class ArrayInitializer(Expression):
         return cpp
 
 
+class ByteArrayInitializer(Expression):
+    """Array initializer for a byte buffer, rendered like an ArrayInitializer of HexInts.
+
+    Stores the bytes instead of one expression per element, for large arrays like
+    image and font data.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]):
+        self.data = bytes(data)
+
+    def __str__(self):
+        if not self.data:
+            return "{}"
+        return "{0x" + self.data.hex(",").upper().replace(",", ", 0x") + "}"
+
+
 class ParameterExpression(Expression):
     __slots__ = ("type", "id")
 
@@ -346,6 +365,8 @@ def safe_exp(obj: SafeExpType) -> Expression:
         return BoolLiteral(obj)
     if isinstance(obj, str):
         return StringLiteral(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return ByteArrayInitializer(obj)
     if isinstance(obj, HexInt):
         return HexIntLiteral(obj)
     if isinstance(obj, int):
@@ -689,8 +710,10 @@ async def process_lambda(
         parts[i * 3 + 2] = ""
 
     if isinstance(value, ESPHomeDataBase) and value.esp_range is not None:
-        location = value.esp_range.start_mark
-        location.line += value.content_offset
+        start = value.esp_range.start_mark
+        location = DocumentLocation(
+            start.document, start.line + value.content_offset, start.column
+        )
     else:
         location = None
     return LambdaExpression(parts, parameters, capture, return_type, location)
@@ -1014,6 +1037,13 @@ class MockObjClass(MockObj):
                 return True
         return False
 
+    def inherited_names(self) -> list[str]:
+        """The names of this class and of all classes it inherits from, without duplicates.
+
+        Every class `other` for which `inherits_from(other)` is true is in this list.
+        """
+        return list(dict.fromkeys([str(self)] + [str(p) for p in self._parents]))
+
     def template(self, *args: SafeExpType) -> "MockObjClass":
         if len(args) != 1 or not isinstance(args[0], TemplateArguments):
             args = TemplateArguments(*args)
@@ -0,0 +1,328 @@
+"""ESPHome validation daemon.
+
+Starting ESPHome, importing esphome.config_validation and loading every component
+takes most of the time of a single `esphome config` run. `esphome daemon` keeps one
+process with all of that loaded around, and validates (or generates the sources for)
+configurations sent to it over a local unix socket. `esphome config` hands its
+configurations to the daemon automatically if one is running. The socket is kept in a
+directory only the user can access, $XDG_RUNTIME_DIR/esphome or ~/.esphome, and
+clients only connect to sockets owned by the user.
+
+The protocol is line based JSON, every request is answered with exactly one response:
+
+    {"type": "run", "version": "...", "command": "config", "configuration": "...",
+     "cwd": "...", "env": {...}, "substitutions": {...}, "verbose": false,
+     "quiet": false, "dashboard": false}
+    {"type": "result", "exit_code": 0, "stdout": "...", "stderr": "..."}
+
+Only the ESPHOME_* variables of the client's environment are sent. If the
+configuration reads other variables with !env_var the daemon answers
+{"type": "env", "names": [...]} and the client sends the request again with those
+variables added, null for the ones it doesn't have.
+
+Configurations using custom_components or external_components would replace the
+components loaded in the daemon, for those it answers {"type": "unsupported"} and the
+client validates the configuration itself.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import sys
+import traceback
+from typing import Any, Callable, Optional
+
+from esphome import const
+from esphome.const import CONF_EXTERNAL_COMPONENTS, ENV_DAEMON_SOCKET
+from esphome.core import CORE, EsphomeError
+from esphome.log import capture_output
+
+_LOGGER = logging.getLogger(__name__)
+
+# The commands the daemon can run, `compile` only generates the source code
+DAEMON_COMMANDS = ("config", "compile")
+# The variables of the client's environment sent along with every request
+DAEMON_ENV_PREFIX = "ESPHOME_"
+SOCKET_NAME = "daemon.sock"
+
+
+def daemon_socket_path() -> str:
+    path = os.getenv(ENV_DAEMON_SOCKET)
+    if path:
+        return path
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "esphome", SOCKET_NAME)
+    return os.path.join(os.path.expanduser("~"), ".esphome", SOCKET_NAME)
+
+
+def _make_private_dir(path: str) -> None:
+    """Create the directory of the socket, accessible only by the user."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise EsphomeError(
+            f"The directory {path} of the daemon socket must only be accessible by "
+            "its owner, the current user."
+        )
+
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class DaemonClient:
+    """Connection to a running ESPHome daemon."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    @classmethod
+    def connect(cls, path: Optional[str] = None) -> Optional["DaemonClient"]:
+        """Connect to the daemon, returns None if no daemon is running."""
+        if not is_supported():
+            return None
+        path = path or daemon_socket_path()
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+            _LOGGER.debug("Not using %s, it is not a socket of the current user", path)
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError as err:
+            _LOGGER.debug("Could not connect to ESPHome daemon at %s: %s", path, err)
+            sock.close()
+            return None
+        _LOGGER.debug("Using ESPHome daemon at %s", path)
+        return cls(sock)
+
+    def run(self, args: argparse.Namespace, conf_path: str) -> Optional[int]:
+        """Run the command for one configuration in the daemon.
+
+        Returns the exit code, or None if the configuration has to be processed locally.
+        """
+        env = {
+            name: value
+            for name, value in os.environ.items()
+            if name.startswith(DAEMON_ENV_PREFIX)
+        }
+        request = {
+            "type": "run",
+            "version": const.__version__,
+            "command": args.command,
+            "configuration": conf_path,
+            "cwd": os.getcwd(),
+            "env": env,
+            "substitutions": dict(args.substitution) if args.substitution else {},
+            "verbose": args.verbose,
+            "quiet": args.quiet,
+            "dashboard": args.dashboard,
+        }
+        response = self._request(request)
+        if response is not None and response["type"] == "env":
+            # The configuration reads more variables with !env_var
+            env.update({name: os.environ.get(name) for name in response["names"]})
+            response = self._request(request)
+        if response is None or response["type"] != "result":
+            _LOGGER.debug("ESPHome daemon can't process %s", conf_path)
+            return None
+        print(response["stderr"], end="", file=sys.stderr)
+        print(response["stdout"], end="")
+        return response["exit_code"]
+
+    def _request(self, request: dict) -> Optional[dict]:
+        try:
+            self._file.write(json.dumps(request).encode() + b"\n")
+            self._file.flush()
+            return json.loads(self._file.readline())
+        except (OSError, ValueError) as err:
+            _LOGGER.debug("ESPHome daemon request failed: %s", err)
+            return None
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+@contextlib.contextmanager
+def _request_context(request: dict):
+    """Run with the environment of the client and capture all output."""
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    old_cwd = os.getcwd()
+    old_env = dict(os.environ)
+    root_logger = logging.getLogger()
+    old_level = root_logger.level
+
+    os.chdir(request["cwd"])
+    # The daemon's own environment, with the variables of the client instead of its
+    # ESPHOME_* variables and the ones the configuration reads
+    for name in list(os.environ):
+        if name.startswith(DAEMON_ENV_PREFIX) or name in request["env"]:
+            del os.environ[name]
+    os.environ.update(
+        {name: value for name, value in request["env"].items() if value is not None}
+    )
+    if request["verbose"]:
+        root_logger.setLevel(logging.DEBUG)
+    elif request["quiet"]:
+        root_logger.setLevel(logging.CRITICAL)
+    else:
+        root_logger.setLevel(logging.INFO)
+    CORE.verbose = request["verbose"]
+    try:
+        with capture_output(stdout, stderr):
+            yield stdout, stderr
+    finally:
+        CORE.reset()
+        CORE.verbose = False
+        root_logger.setLevel(old_level)
+        os.environ.clear()
+        os.environ.update(old_env)
+        os.chdir(old_cwd)
+
+
+def _run_command(request: dict, actions: dict[str, Callable], raw_config) -> int:
+    from esphome.config import read_config
+
+    CORE.config_path = request["configuration"]
+    CORE.dashboard = request["dashboard"]
+    config = read_config(request["substitutions"], raw_config)
+    if config is None:
+        return 2
+    CORE.config = config
+    args = argparse.Namespace(
+        command=request["command"],
+        configuration=[request["configuration"]],
+        only_generate=True,
+        verbose=request["verbose"],
+    )
+    try:
+        return actions[request["command"]](args, config)
+    except EsphomeError as err:
+        _LOGGER.error(err, exc_info=request["verbose"])
+        return 1
+
+
+def _load_raw_config(request: dict) -> tuple[Optional[dict], Any]:
+    """Load the YAML of the configuration of a request.
+
+    Returns the answer if the daemon can't run the request, and the YAML, None if it
+    can't be loaded.
+    """
+    from esphome import yaml_util
+
+    CORE.config_path = request["configuration"]
+    with yaml_util.track_dependencies() as dependencies:
+        try:
+            raw_config = yaml_util.load_yaml(CORE.config_path)
+        except EsphomeError:
+            # Reported by reading it again when validating
+            raw_config = None
+    missing = sorted(set(dependencies["env"]) - set(request["env"]))
+    if missing:
+        return {"type": "env", "names": missing}, None
+    if isinstance(raw_config, dict) and CONF_EXTERNAL_COMPONENTS in raw_config:
+        return {"type": "unsupported", "reason": CONF_EXTERNAL_COMPONENTS}, None
+    return None, raw_config
+
+
+def handle_request(request: dict, actions: dict[str, Callable]) -> dict:
+    from esphome import loader
+
+    if request.get("type") != "run" or request.get("command") not in actions:
+        return {"type": "error", "message": "Unknown request"}
+    if request.get("version") != const.__version__:
+        return {"type": "unsupported", "reason": "ESPHome version mismatch"}
+    config_dir = os.path.dirname(os.path.join(request["cwd"], request["configuration"]))
+    if os.path.isdir(os.path.join(config_dir, "custom_components")):
+        return {"type": "unsupported", "reason": "custom_components"}
+
+    _LOGGER.info("Running %s for %s", request["command"], request["configuration"])
+    with _request_context(request) as (stdout, stderr):
+        response, raw_config = _load_raw_config(request)
+        if response is not None:
+            return response
+        try:
+            exit_code = _run_command(request, actions, raw_config)
+        except Exception:  # pylint: disable=broad-except
+            stderr.write(traceback.format_exc())
+            exit_code = 1
+        # Packages can add external_components as well
+        external = CONF_EXTERNAL_COMPONENTS in (getattr(CORE, "raw_config", None) or {})
+    if external:
+        loader.unload_external_components()
+        return {"type": "unsupported", "reason": CONF_EXTERNAL_COMPONENTS}
+    return {
+        "type": "result",
+        "exit_code": exit_code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                return
+            response = handle_request(request, self.server.actions)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Handles one request at a time, CORE is shared by all requests."""
+
+    def __init__(self, path: str, actions: dict[str, Callable]) -> None:
+        self.actions = actions
+        super().__init__(path, _DaemonRequestHandler)
+        os.chmod(path, 0o600)
+
+
+def create_server(path: str, actions: dict[str, Callable]) -> DaemonServer:
+    if not is_supported():
+        raise EsphomeError("The ESPHome daemon requires unix socket support.")
+    _make_private_dir(os.path.dirname(os.path.abspath(path)))
+    if os.path.exists(path):
+        client = DaemonClient.connect(path)
+        if client is not None:
+            client.close()
+            raise EsphomeError(f"An ESPHome daemon is already running at {path}")
+        # Left over from a daemon that did not shut down cleanly
+        os.unlink(path)
+    return DaemonServer(path, actions)
+
+
+def run_daemon(path: Optional[str], actions: dict[str, Callable]) -> int:
+    from esphome import config_validation  # noqa pylint: disable=unused-import
+
+    path = path or daemon_socket_path()
+    server = create_server(path, actions)
+    _LOGGER.info("ESPHome daemon listening on %s", path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+    return 0
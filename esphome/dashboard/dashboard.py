@@ -27,7 +27,7 @@ import tornado.web
 import tornado.websocket
 from tornado.log import access_log
 
-from esphome import const, platformio_api, util, yaml_util
+from esphome import const, ota_payload, platformio_api, util, yaml_util
 from esphome.core import EsphomeError
 from esphome.helpers import get_bool_env, mkdir_p, run_system_command
 from esphome.storage_json import (
@@ -430,6 +430,7 @@ class DownloadBinaryRequestHandler(BaseHandler):
     @bind_config
     def get(self, configuration=None):
         type = self.get_argument("type", "firmware.bin")
+        compressed = None
 
         storage_path = ext_storage_path(settings.config_dir, configuration)
         storage_json = StorageJSON.load(storage_path)
@@ -446,6 +447,9 @@ class DownloadBinaryRequestHandler(BaseHandler):
         elif storage_json.target_platform.lower() == const.PLATFORM_ESP8266:
             filename = f"{storage_json.name}.bin"
             path = storage_json.firmware_bin_path
+            # Sent as is to clients that decompress it, like browsers
+            if "gzip" in self.request.headers.get("Accept-Encoding", ""):
+                compressed = ota_payload.load_payload(storage_json, path)
 
         elif type == "firmware.bin":
             filename = f"{storage_json.name}.bin"
@@ -482,6 +486,12 @@ class DownloadBinaryRequestHandler(BaseHandler):
         self.set_header("Content-Type", "application/octet-stream")
         self.set_header("Content-Disposition", f'attachment; filename="{filename}"')
         self.set_header("Cache-Control", "no-cache")
+        self.set_header("Vary", "Accept-Encoding")
+        if compressed is not None:
+            self.set_header("Content-Encoding", "gzip")
+            self.write(compressed[0].tobytes())
+            self.finish()
+            return
         if not Path(path).is_file():
             self.send_error(404)
             return
@@ -1,10 +1,11 @@
 import hashlib
 import logging
+import os
 import random
 import socket
 import sys
 import time
-import gzip
+import zlib
 
 from esphome.core import EsphomeError
 from esphome.helpers import is_ip_address, resolve_ip_address
@@ -40,6 +41,14 @@ MAGIC_BYTES = [0x6C, 0x26, 0xF7, 0x5C, 0x45]
 
 FEATURE_SUPPORTS_COMPRESSION = 0x01
 
+# Bytes read from the firmware and sent to the device at once
+OTA_CHUNK_SIZE = 8192
+# Limits the data queued in the socket, so that the progress bar shows the actual
+# progress (the default is usually around 100kB)
+OTA_SEND_BUFFER_SIZE = 8192
+# A gzip stream at level 9 for zlib
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -184,9 +193,58 @@ def send_check(sock, data, msg):
         raise OTAError(f"Error sending {msg}: {err}") from err
 
 
-def perform_ota(sock, password, file_handle, filename):
-    file_contents = file_handle.read()
-    file_size = len(file_contents)
+def prepare_payload(file_handle, compress, chunk_size=OTA_CHUNK_SIZE):
+    """Read the firmware in chunks, gzip it if compress is set and compute the MD5 of
+    the result in the same pass.
+
+    Returns the payload and its MD5, the device needs both before the upload starts.
+    """
+    compressor = zlib.compressobj(9, zlib.DEFLATED, GZIP_WBITS) if compress else None
+    payload = bytearray()
+    md5 = hashlib.md5()
+
+    def add(data):
+        md5.update(data)
+        payload.extend(data)
+
+    while chunk := file_handle.read(chunk_size):
+        add(compressor.compress(chunk) if compressor is not None else chunk)
+    if compressor is not None:
+        add(compressor.flush())
+    return memoryview(payload), md5.hexdigest()
+
+
+def send_payload(sock, payload, chunk_size=OTA_CHUNK_SIZE):
+    """Send the payload in slices of chunk_size bytes, without copying them."""
+    progress = ProgressBar()
+    for offset in range(0, len(payload), chunk_size):
+        chunk = payload[offset : offset + chunk_size]
+        try:
+            sock.sendall(chunk)
+        except OSError as err:
+            sys.stderr.write("\n")
+            raise OTAError(f"Error sending data: {err}") from err
+
+        progress.update((offset + len(chunk)) / len(payload))
+    progress.done()
+
+
+def perform_ota(
+    sock,
+    password,
+    file_handle,
+    filename,
+    chunk_size=OTA_CHUNK_SIZE,
+    send_buffer_size=OTA_SEND_BUFFER_SIZE,
+    compressed_payload=None,
+):
+    """Upload the firmware in file_handle to the device connected to sock.
+
+    compressed_payload is the payload and MD5 from prepare_payload with compression
+    for the same firmware, if it is known already.
+    """
+    file_size = file_handle.seek(0, os.SEEK_END)
+    file_handle.seek(0)
     _LOGGER.info("Uploading %s (%s bytes)", filename, file_size)
 
     # Enable nodelay, we need it for phase 1
@@ -203,11 +261,14 @@ def perform_ota(sock, password, file_handle, filename):
         sock, 1, "features", [RESPONSE_HEADER_OK, RESPONSE_SUPPORTS_COMPRESSION]
     )[0]
 
-    if features == RESPONSE_SUPPORTS_COMPRESSION:
-        upload_contents = gzip.compress(file_contents, compresslevel=9)
-        _LOGGER.info("Compressed to %s bytes", len(upload_contents))
+    compress = features == RESPONSE_SUPPORTS_COMPRESSION
+    if compress and compressed_payload is not None:
+        payload, upload_md5 = compressed_payload
+        _LOGGER.info("Using the firmware compressed to %s bytes", len(payload))
     else:
-        upload_contents = file_contents
+        payload, upload_md5 = prepare_payload(file_handle, compress, chunk_size)
+    if compress and compressed_payload is None:
+        _LOGGER.info("Compressed to %s bytes", len(payload))
 
     (auth,) = receive_exactly(
         sock, 1, "auth", [RESPONSE_REQUEST_AUTH, RESPONSE_AUTH_OK]
@@ -234,7 +295,7 @@ def perform_ota(sock, password, file_handle, filename):
         send_check(sock, result, "auth result")
         receive_exactly(sock, 1, "auth result", RESPONSE_AUTH_OK)
 
-    upload_size = len(upload_contents)
+    upload_size = len(payload)
     upload_size_encoded = [
         (upload_size >> 24) & 0xFF,
         (upload_size >> 16) & 0xFF,
@@ -244,7 +305,6 @@ def perform_ota(sock, password, file_handle, filename):
     send_check(sock, upload_size_encoded, "binary size")
     receive_exactly(sock, 1, "binary size", RESPONSE_UPDATE_PREPARE_OK)
 
-    upload_md5 = hashlib.md5(upload_contents).hexdigest()
     _LOGGER.debug("MD5 of upload is %s", upload_md5)
 
     send_check(sock, upload_md5, "file checksum")
@@ -252,28 +312,11 @@ def perform_ota(sock, password, file_handle, filename):
 
     # Disable nodelay for transfer
     sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 0)
-    # Limit send buffer (usually around 100kB) in order to have progress bar
-    # show the actual progress
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 8192)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer_size)
     # Set higher timeout during upload
     sock.settimeout(20.0)
 
-    offset = 0
-    progress = ProgressBar()
-    while True:
-        chunk = upload_contents[offset : offset + 1024]
-        if not chunk:
-            break
-        offset += len(chunk)
-
-        try:
-            sock.sendall(chunk)
-        except OSError as err:
-            sys.stderr.write("\n")
-            raise OTAError(f"Error sending data: {err}") from err
-
-        progress.update(offset / upload_size)
-    progress.done()
+    send_payload(sock, payload, chunk_size)
 
     # Enable nodelay for last checks
     sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
@@ -290,7 +333,9 @@ def perform_ota(sock, password, file_handle, filename):
     time.sleep(1)
 
 
-def run_ota_impl_(remote_host, remote_port, password, filename):
+def run_ota_impl_(
+    remote_host, remote_port, password, filename, compressed_payload=None
+):
     if is_ip_address(remote_host):
         _LOGGER.info("Connecting to %s", remote_host)
         ip = remote_host
@@ -321,7 +366,13 @@ def run_ota_impl_(remote_host, remote_port, password, filename):
 
     with open(filename, "rb") as file_handle:
         try:
-            perform_ota(sock, password, file_handle, filename)
+            perform_ota(
+                sock,
+                password,
+                file_handle,
+                filename,
+                compressed_payload=compressed_payload,
+            )
         except OTAError as err:
             _LOGGER.error(str(err))
             return 1
@@ -331,9 +382,11 @@ def run_ota_impl_(remote_host, remote_port, password, filename):
     return 0
 
 
-def run_ota(remote_host, remote_port, password, filename):
+def run_ota(remote_host, remote_port, password, filename, compressed_payload=None):
     try:
-        return run_ota_impl_(remote_host, remote_port, password, filename)
+        return run_ota_impl_(
+            remote_host, remote_port, password, filename, compressed_payload
+        )
     except OTAError as err:
         _LOGGER.error(err)
         return 1
@@ -0,0 +1,250 @@
+"""Update a fleet of devices, for `esphome update-all`.
+
+Every configuration is validated, compiled and uploaded Over The Air. Each of these
+stages has its own pool of worker processes, so that compiled devices are uploaded
+while the next ones compile. A failed upload is retried after a delay that doubles
+with every attempt, without keeping an upload worker busy in the meantime.
+
+The validate stage stores the validated configuration (see
+config.save_validated_config) in a temporary directory, the compile and upload
+stages restore it instead of reading the configuration again. The output of each
+stage, including that of PlatformIO, is collected per device.
+"""
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+from esphome.helpers import write_file
+from esphome.log import Fore, color
+from esphome.util import print_bar, safe_print
+
+_LOGGER = logging.getLogger(__name__)
+
+STAGE_VALIDATE = "validate"
+STAGE_COMPILE = "compile"
+STAGE_UPLOAD = "upload"
+STAGE_DONE = "done"
+# The esphome command run for each stage, in order
+STAGE_COMMANDS = {
+    STAGE_VALIDATE: "config",
+    STAGE_COMPILE: "compile",
+    STAGE_UPLOAD: "upload",
+}
+NEXT_STAGE = {
+    STAGE_VALIDATE: STAGE_COMPILE,
+    STAGE_COMPILE: STAGE_UPLOAD,
+    STAGE_UPLOAD: STAGE_DONE,
+}
+
+UPLOAD_ATTEMPTS = 4
+# Seconds until the first retry of an upload
+UPLOAD_RETRY_DELAY = 10.0
+
+
+@dataclass
+class DeviceStatus:
+    configuration: str
+    # Where the validate stage stores the validated configuration
+    validated_config: Optional[str] = None
+    stage: str = STAGE_VALIDATE
+    success: Optional[bool] = None
+    upload_attempts: int = 0
+    # Seconds spent in each stage
+    durations: dict[str, float] = field(default_factory=dict)
+    output: str = ""
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "configuration": self.configuration,
+            "success": self.success,
+            "stage": self.stage,
+            "upload_attempts": self.upload_attempts,
+            "durations": self.durations,
+        }
+
+
+def _stage_args(args: argparse.Namespace, stage: str, device: DeviceStatus):
+    stage_args = argparse.Namespace(**vars(args))
+    stage_args.command = STAGE_COMMANDS[stage]
+    stage_args.configuration = [device.configuration]
+    stage_args.validated_config = device.validated_config
+    stage_args.only_generate = False
+    stage_args.device = "OTA"
+    stage_args.file = None
+    return stage_args
+
+
+def _timed_job(run_job: Callable, args: argparse.Namespace, conf_path: str):
+    start = time.monotonic()
+    rc, output = run_job(args, conf_path)
+    return rc, output, time.monotonic() - start
+
+
+class FleetUpdate:
+    """Run the stages for all configurations, `run_job(args, conf_path)` runs one
+    esphome command in a worker process and returns its exit code and output.
+    """
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        conf_paths: list[str],
+        run_job: Callable,
+        init_job: Optional[Callable] = None,
+        max_compile_jobs: int = 1,
+        max_uploads: int = 4,
+    ) -> None:
+        self.args = args
+        self.devices = [DeviceStatus(conf_path) for conf_path in conf_paths]
+        self._run_job = run_job
+        self._init_job = init_job
+        self._workers = {
+            STAGE_VALIDATE: os.cpu_count() or 1,
+            STAGE_COMPILE: max_compile_jobs,
+            STAGE_UPLOAD: max_uploads,
+        }
+        self._pools: dict[str, ProcessPoolExecutor] = {}
+        self._running: dict[Future, DeviceStatus] = {}
+        # Heap of (time, order, device) of the uploads to retry
+        self._retries: list[tuple[float, int, DeviceStatus]] = []
+        self._order = itertools.count()
+        self._finished = 0
+
+    def _report(self, device: DeviceStatus, status: str) -> None:
+        progress = f"({self._finished}/{len(self.devices)})"
+        safe_print(f"{progress} {status} {device.configuration}")
+
+    def _submit(self, device: DeviceStatus) -> None:
+        if device.stage == STAGE_UPLOAD:
+            device.upload_attempts += 1
+        self._report(device, color(Fore.CYAN, device.stage.upper()))
+        future = self._pools[device.stage].submit(
+            _timed_job,
+            self._run_job,
+            _stage_args(self.args, device.stage, device),
+            device.configuration,
+        )
+        self._running[future] = device
+
+    def _complete(self, device: DeviceStatus, rc: int, output: str, duration: float):
+        device.durations[device.stage] = (
+            device.durations.get(device.stage, 0.0) + duration
+        )
+        device.output += output
+        if rc == 0:
+            # Only the output of a failed stage is shown
+            device.output = ""
+            device.stage = NEXT_STAGE[device.stage]
+            if device.stage != STAGE_DONE:
+                self._submit(device)
+                return
+            device.success = True
+            self._finished += 1
+            self._report(device, color(Fore.BOLD_GREEN, "SUCCESS"))
+            return
+
+        if device.stage == STAGE_UPLOAD and device.upload_attempts < UPLOAD_ATTEMPTS:
+            delay = UPLOAD_RETRY_DELAY * 2 ** (device.upload_attempts - 1)
+            self._report(
+                device,
+                color(Fore.YELLOW, f"UPLOAD FAILED, RETRYING IN {delay:.0f}s"),
+            )
+            heapq.heappush(
+                self._retries, (time.monotonic() + delay, next(self._order), device)
+            )
+            return
+
+        device.success = False
+        self._finished += 1
+        print_bar(color(Fore.CYAN, device.configuration))
+        safe_print(device.output.rstrip("\n"))
+        self._report(device, color(Fore.BOLD_RED, f"FAILED ({device.stage})"))
+
+    def _wait(self) -> None:
+        timeout = None
+        if self._retries:
+            timeout = self._retries[0][0] - time.monotonic()
+            if timeout <= 0:
+                self._submit(heapq.heappop(self._retries)[2])
+                return
+        done, _ = wait(self._running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            device = self._running.pop(future)
+            try:
+                rc, output, duration = future.result()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug("Worker failed", exc_info=True)
+                rc, output, duration = 1, f"Running {device.stage} failed: {err}\n", 0
+            self._complete(device, rc, output, duration)
+
+    def run(self) -> int:
+        """Update all devices, returns the number of devices that failed."""
+        if not self.devices:
+            return 0
+        with ExitStack() as stack:
+            directory = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="esphome-update-all-")
+            )
+            for index, device in enumerate(self.devices):
+                device.validated_config = os.path.join(directory, f"{index}.pickle")
+            for stage, workers in self._workers.items():
+                self._pools[stage] = stack.enter_context(
+                    ProcessPoolExecutor(
+                        max_workers=min(workers, len(self.devices)),
+                        initializer=self._init_job,
+                        initargs=(self.args.verbose, self.args.quiet),
+                    )
+                )
+            for device in self.devices:
+                self._submit(device)
+            while self._running or self._retries:
+                self._wait()
+            self._pools.clear()
+        return sum(not device.success for device in self.devices)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "succeeded": sum(device.success for device in self.devices),
+            "failed": sum(not device.success for device in self.devices),
+            "devices": [device.as_dict() for device in self.devices],
+        }
+
+
+def update_all(
+    args: argparse.Namespace,
+    conf_paths: list[str],
+    run_job: Callable,
+    init_job: Optional[Callable] = None,
+) -> int:
+    fleet = FleetUpdate(
+        args,
+        conf_paths,
+        run_job,
+        init_job,
+        max_compile_jobs=args.max_compile_jobs,
+        max_uploads=args.max_uploads,
+    )
+    start = time.monotonic()
+    failed = fleet.run()
+
+    print_bar(f"[{color(Fore.BOLD_WHITE, 'SUMMARY')}]")
+    for device in fleet.devices:
+        if device.success:
+            safe_print(f"  - {device.configuration}: {color(Fore.GREEN, 'SUCCESS')}")
+        else:
+            status = color(Fore.BOLD_RED, f"FAILED ({device.stage})")
+            safe_print(f"  - {device.configuration}: {status}")
+    if args.summary_json:
+        summary = fleet.summary()
+        summary["duration"] = time.monotonic() - start
+        write_file(args.summary_json, json.dumps(summary, indent=2) + "\n")
+    return failed
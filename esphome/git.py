@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import Callable, Optional
 
 import esphome.config_validation as cv
+from esphome import trace
 from esphome.core import CORE, TimePeriodSeconds
 
 _LOGGER = logging.getLogger(__name__)
@@ -16,7 +17,8 @@ _LOGGER = logging.getLogger(__name__)
 
 def run_git_command(cmd, cwd=None) -> str:
     try:
-        ret = subprocess.run(cmd, cwd=cwd, capture_output=True, check=False)
+        with trace.span(" ".join(cmd[:2]), "git", cmd=cmd):
+            ret = subprocess.run(cmd, cwd=cwd, capture_output=True, check=False)
     except FileNotFoundError as err:
         raise cv.Invalid(
             "git is not installed but required for external_components.\n"
@@ -255,6 +255,64 @@ def copy_file_if_changed(src: os.PathLike, dst: os.PathLike) -> None:
         raise EsphomeError(f"Error copying file {src} to {dst}: {err}") from err
 
 
+def file_hash(path: os.PathLike) -> str:
+    """Return the sha256 hex digest of the contents of a file."""
+    import hashlib
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f_handle:
+        for chunk in iter(lambda: f_handle.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# ioctl cloning a file on Linux filesystems with copy on write (btrfs, xfs)
+FICLONE = 0x40049409
+
+
+def _reflink(src: os.PathLike, dst: os.PathLike) -> bool:
+    """Create dst as a copy on write clone of src, if the filesystem supports it."""
+    import sys
+
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        with open(src, "rb") as src_handle, open(dst, "xb") as dst_handle:
+            fcntl.ioctl(dst_handle.fileno(), FICLONE, src_handle.fileno())
+    except OSError:
+        with suppress(OSError):
+            os.unlink(dst)
+        return False
+    return True
+
+
+def reflink_or_copy_file(src: os.PathLike, dst: os.PathLike) -> None:
+    """Replace dst with a copy of src.
+
+    Where the filesystem supports it, dst is a reflink sharing the data of src until
+    either is modified. dst is replaced atomically.
+    """
+    import shutil
+
+    dst = Path(dst)
+    mkdir_p(dst.parent)
+    tmp_path = dst.with_name(f".{dst.name}.tmp")
+    try:
+        with suppress(FileNotFoundError):
+            tmp_path.unlink()
+        if not _reflink(src, tmp_path):
+            shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except OSError as err:
+        with suppress(OSError):
+            tmp_path.unlink()
+        from esphome.core import EsphomeError
+
+        raise EsphomeError(f"Error copying file {src} to {dst}: {err}") from err
+
+
 def list_starts_with(list_, sub):
     return len(sub) <= len(list_) and all(list_[i] == x for i, x in enumerate(sub))
 
@@ -302,8 +360,12 @@ _TYPE_OVERLOADS = {
     list: type("EList", (list,), {}),
 }
 
+_TYPE_OVERLOAD_BASES = {v: k for k, v in _TYPE_OVERLOADS.items()}
+
 # cache created classes here
 _CLASS_LOOKUP = {}
+# reverse of _CLASS_LOOKUP, maps each created class to its (original class, added class)
+_CLASS_ORIGIN = {}
 
 
 def add_class_to_obj(value, cls):
@@ -324,6 +386,7 @@ def add_class_to_obj(value, cls):
         if new_cls is None:
             new_cls = orig_cls.__class__(orig_cls.__name__, (orig_cls, cls), {})
             _CLASS_LOOKUP[key] = new_cls
+            _CLASS_ORIGIN[new_cls] = key
         value.__class__ = new_cls
         return value
     except TypeError:
@@ -334,3 +397,17 @@ def add_class_to_obj(value, cls):
             if type(value) is type_:  # pylint: disable=unidiomatic-typecheck
                 return add_class_to_obj(func(value), cls)
         raise
+
+
+def split_added_classes(cls):
+    """Split a class created by add_class_to_obj into its parts.
+
+    Returns the original (builtin) type the value had before any class was added, and
+    the list of classes that were added to it, in the order they were added.
+    """
+    added = []
+    while cls in _CLASS_ORIGIN:
+        cls, extra = _CLASS_ORIGIN[cls]
+        added.append(extra)
+    added.reverse()
+    return _TYPE_OVERLOAD_BASES.get(cls, cls), added
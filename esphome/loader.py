@@ -9,9 +9,11 @@ import sys
 from pathlib import Path
 from dataclasses import dataclass
 
-from esphome.const import SOURCE_FILE_EXTENSIONS
+from esphome.component_index import ComponentIndex
+from esphome.const import ENV_NO_COMPONENT_INDEX, SOURCE_FILE_EXTENSIONS
 import esphome.core.config
-from esphome.core import CORE
+from esphome.core import CORE, EsphomeError
+from esphome.helpers import get_bool_env
 from esphome.types import ConfigType
 
 _LOGGER = logging.getLogger(__name__)
@@ -61,6 +63,14 @@ class ComponentManifest:
     def to_code(self) -> Optional[Callable[[Any], None]]:
         return getattr(self.module, "to_code", None)
 
+    @property
+    def prepare_assets(self) -> Optional[Callable[[ConfigType], None]]:
+        """Components can declare a `prepare_assets` function that is called with the
+        validated configuration before code generation starts, to start converting
+        their asset files in parallel (see esphome.asset_cache.prefetch_asset).
+        """
+        return getattr(self.module, "prepare_assets", None)
+
     @property
     def dependencies(self) -> list[str]:
         return getattr(self.module, "DEPENDENCIES", [])
@@ -86,6 +96,15 @@ class ComponentManifest:
         """
         return getattr(self.module, "FINAL_VALIDATE_SCHEMA", None)
 
+    @property
+    def has_config_schema(self) -> bool:
+        return self.config_schema is not None
+
+    @property
+    def file(self) -> Optional[Path]:
+        file = getattr(self.module, "__file__", None)
+        return None if file is None else Path(file)
+
     @property
     def resources(self) -> list[FileResource]:
         """Return a list of all file resources defined in the package of this component.
@@ -104,6 +123,84 @@ class ComponentManifest:
         return ret
 
 
+class IndexedComponentManifest(ComponentManifest):
+    """Component manifest answering the metadata from the component index.
+
+    The module is only imported once anything else is needed, like the config
+    schema or to_code.
+    """
+
+    def __init__(self, name: str, file: Path, metadata: dict[str, Any]) -> None:
+        # pylint: disable=super-init-not-called
+        self._name = name
+        self._file = file
+        self._metadata = metadata
+        self._module: Optional[ModuleType] = None
+        self.import_error: Optional[Exception] = None
+
+    @property
+    def module(self) -> ModuleType:
+        if self._module is None:
+            self.import_module()
+        return self._module
+
+    @property
+    def domain(self) -> str:
+        return self._name[len("esphome.components.") :]
+
+    def import_module(self) -> None:
+        if self._module is not None:
+            return
+        if self.import_error is None:
+            try:
+                self._module = importlib.import_module(self._name)
+                return
+            except Exception as err:  # pylint: disable=broad-except
+                self.import_error = err
+                # Looked up again by the next configuration
+                if _COMPONENT_CACHE.get(self.domain) is self:
+                    del _COMPONENT_CACHE[self.domain]
+        raise EsphomeError(
+            f"Unable to load component {self._name}: {self.import_error}"
+        ) from self.import_error
+
+    @property
+    def file(self) -> Path:
+        return self._file
+
+    @property
+    def is_platform(self) -> bool:
+        return len(self._name.split(".")) == 4
+
+    @property
+    def is_platform_component(self) -> bool:
+        return self._metadata["IS_PLATFORM_COMPONENT"]
+
+    @property
+    def multi_conf(self) -> bool:
+        return self._metadata["MULTI_CONF"]
+
+    @property
+    def dependencies(self) -> list[str]:
+        return self._metadata["DEPENDENCIES"]
+
+    @property
+    def conflicts_with(self) -> list[str]:
+        return self._metadata["CONFLICTS_WITH"]
+
+    @property
+    def auto_load(self) -> list[str]:
+        return self._metadata["AUTO_LOAD"]
+
+    @property
+    def codeowners(self) -> list[str]:
+        return self._metadata["CODEOWNERS"]
+
+    @property
+    def has_config_schema(self) -> bool:
+        return self._metadata["CONFIG_SCHEMA"]
+
+
 class ComponentMetaFinder(importlib.abc.MetaPathFinder):
     def __init__(
         self, components_path: Path, allowed_components: Optional[list[str]] = None
@@ -154,10 +251,65 @@ def install_custom_components_meta_finder():
     install_meta_finder(custom_components_dir)
 
 
+def _find_component_file(domain: str) -> Optional[Path]:
+    """Find the file of a component or platform module without importing it."""
+    component, _, platform = domain.partition(".")
+    try:
+        spec = importlib.util.find_spec(f"esphome.components.{component}")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.origin is None or not spec.submodule_search_locations:
+        return None
+    if not platform:
+        return Path(spec.origin)
+    for location in spec.submodule_search_locations:
+        for file in (
+            Path(location) / f"{platform}.py",
+            Path(location) / platform / "__init__.py",
+        ):
+            if file.is_file():
+                return file
+    return None
+
+
+def get_component_index() -> ComponentIndex:
+    path = None
+    if CORE.config_path is not None and not get_bool_env(ENV_NO_COMPONENT_INDEX):
+        path = Path(CORE.relative_internal_path("component_index.json"))
+    if path not in _COMPONENT_INDEXES:
+        _COMPONENT_INDEXES[path] = ComponentIndex(path)
+    return _COMPONENT_INDEXES[path]
+
+
+def save_component_index() -> None:
+    for index in _COMPONENT_INDEXES.values():
+        index.save()
+
+
+def _lookup_indexed_module(domain: str) -> Optional[IndexedComponentManifest]:
+    name = f"esphome.components.{domain}"
+    if name in sys.modules:
+        # Already imported, nothing to gain
+        return None
+    file = _find_component_file(domain)
+    if file is None:
+        return None
+    metadata = get_component_index().get(file)
+    if metadata is None:
+        return None
+    return IndexedComponentManifest(name, file, metadata)
+
+
 def _lookup_module(domain):
     if domain in _COMPONENT_CACHE:
         return _COMPONENT_CACHE[domain]
 
+    manif = _lookup_indexed_module(domain)
+    if manif is not None:
+        _COMPONENT_CACHE[domain] = manif
+        _PENDING_IMPORTS.append(manif)
+        return manif
+
     try:
         module = importlib.import_module(f"esphome.components.{domain}")
     except ImportError as e:
@@ -173,6 +325,61 @@ def _lookup_module(domain):
         return manif
 
 
+def is_core_component(manifest: ComponentManifest) -> bool:
+    """Return whether the component is shipped with ESPHome itself."""
+    file = manifest.file
+    if file is None:
+        return False
+    return CORE_COMPONENTS_PATH in file.resolve().parents
+
+
+def unload_external_components():
+    """Forget all loaded custom and external components.
+
+    Used by long running processes, so that the next configuration imports the
+    components from its own custom_components/external_components again.
+    """
+    for domain, manifest in list(_COMPONENT_CACHE.items()):
+        if domain != "esphome" and not is_core_component(manifest):
+            del _COMPONENT_CACHE[domain]
+    _PENDING_IMPORTS[:] = [m for m in _PENDING_IMPORTS if is_core_component(m)]
+    for name, module in list(sys.modules.items()):
+        if not name.startswith("esphome.components."):
+            continue
+        if not is_core_component(ComponentManifest(module)):
+            del sys.modules[name]
+
+
+def import_components():
+    """Import all components that were loaded from the component index.
+
+    Components register their actions, conditions and pin schemas when they are
+    imported, which the schemas of other components use. Components that fail to
+    import are reported at their configuration by import_component().
+    """
+    while _PENDING_IMPORTS:
+        try:
+            _PENDING_IMPORTS.pop(0).import_module()
+        except EsphomeError:
+            pass
+
+
+def import_component(manifest: ComponentManifest) -> bool:
+    """Import a component loaded from the component index, False if that fails."""
+    if not isinstance(manifest, IndexedComponentManifest):
+        return True
+    try:
+        manifest.import_module()
+    except EsphomeError:
+        _LOGGER.error(
+            "Unable to load component %s:",
+            manifest.domain,
+            exc_info=manifest.import_error,
+        )
+        return False
+    return True
+
+
 def get_component(domain):
     assert "." not in domain
     return _lookup_module(domain)
@@ -184,5 +391,8 @@ def get_platform(domain, platform):
 
 
 _COMPONENT_CACHE = {}
+_COMPONENT_INDEXES: dict[Optional[Path], ComponentIndex] = {}
+# Components loaded from the index that still have to be imported
+_PENDING_IMPORTS: list[IndexedComponentManifest] = []
 CORE_COMPONENTS_PATH = (Path(__file__).parent / "components").resolve()
 _COMPONENT_CACHE["esphome"] = ComponentManifest(esphome.core.config)
@@ -1,4 +1,9 @@
+import contextlib
 import logging
+import os
+import sys
+import tempfile
+from typing import TextIO
 
 from esphome.core import CORE
 
@@ -86,3 +91,48 @@ def setup_log(
     logging.getLogger().handlers[0].setFormatter(
         ESPHomeLogFormatter(include_timestamp=include_timestamp)
     )
+
+
+@contextlib.contextmanager
+def capture_output(stdout: TextIO, stderr: TextIO):
+    """Redirect stdout and all log records to the given streams."""
+    root_logger = logging.getLogger()
+    old_handlers = root_logger.handlers[:]
+    handler = logging.StreamHandler(stderr)
+    if old_handlers:
+        handler.setFormatter(old_handlers[0].formatter)
+    root_logger.handlers = [handler]
+    try:
+        with contextlib.redirect_stdout(stdout):
+            yield
+    finally:
+        root_logger.handlers = old_handlers
+
+
+@contextlib.contextmanager
+def capture_process_output(output: TextIO):
+    """Capture all output of the process, including that of subprocesses.
+
+    Redirects the stdout and stderr file descriptors, so it can only be used by
+    processes doing one thing at a time, like the workers of a process pool.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    with tempfile.TemporaryFile() as tmp:
+        try:
+            os.dup2(tmp.fileno(), 1)
+            os.dup2(tmp.fileno(), 2)
+            # Line buffered, to keep the order with the output of subprocesses
+            with open(
+                tmp.fileno(), "w", buffering=1, encoding="utf-8", closefd=False
+            ) as stream:
+                with capture_output(stream, stream), contextlib.redirect_stderr(stream):
+                    yield
+        finally:
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            tmp.seek(0)
+            output.write(tmp.read().decode("utf-8", errors="replace"))
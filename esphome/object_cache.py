@@ -0,0 +1,224 @@
+"""Cache of compiled objects, shared by the builds of all configurations.
+
+Each device is its own PlatformIO project, but similar devices compile mostly the
+same files: the core, api, wifi, logger and so on. Every generated project runs its
+compiles through object_cache_launcher.py, which keys each object by the compiler,
+its flags and defines and the preprocessed source, leaving out the paths of the build
+directory. The objects are kept in .esphome/objects and reused by the builds of all
+configurations in the same directory.
+
+After each compile the hits and misses are reported and the least recently used
+objects are removed once the cache is larger than $ESPHOME_OBJECT_CACHE_SIZE, or
+OBJECT_CACHE_SIZE bytes. `esphome cache stats|prune` inspects and shrinks it.
+"""
+from collections import Counter
+from dataclasses import dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import re
+from typing import Optional
+
+from esphome import object_cache_launcher
+from esphome.const import ENV_NO_OBJECT_CACHE, ENV_OBJECT_CACHE_SIZE
+from esphome.core import CORE, EsphomeError
+from esphome.helpers import get_bool_env, write_file, write_file_if_changed
+
+_LOGGER = logging.getLogger(__name__)
+
+OBJECT_CACHE_SIZE = 2 * 1024**3
+# The PlatformIO extra script in the build directory that installs the launcher
+PROJECT_SCRIPT = "object_cache.py"
+# The results of the compiles of one build, written by the launcher
+COMPILE_LOG = "object_cache.log"
+STATS_FILE = "stats.json"
+
+PROJECT_SCRIPT_FORMAT = """\
+# Auto generated code by esphome
+# pylint: disable=E0602
+Import("env")  # noqa
+
+env.Replace(OBJECT_CACHE_LAUNCHER={launcher!r})  # noqa
+for command in ("CCCOM", "CXXCOM"):
+    env[command] = "$OBJECT_CACHE_LAUNCHER " + env[command]  # noqa
+"""
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+@dataclass
+class CacheStats:
+    objects: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes with an optional K, M or G suffix, like 500M."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*", value, re.I)
+    if match is None:
+        raise ValueError(f"Invalid size {value!r}, use bytes or a size like 500M")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def format_size(size: int) -> str:
+    for unit in ("G", "M", "K"):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f} {unit}iB"
+    return f"{size} B"
+
+
+def directory_for(config_dir: str) -> Path:
+    return Path(config_dir, ".esphome", "objects")
+
+
+def cache_dir() -> Optional[Path]:
+    if CORE.config_path is None or get_bool_env(ENV_NO_OBJECT_CACHE):
+        return None
+    return directory_for(CORE.config_dir)
+
+
+def max_size() -> int:
+    value = os.environ.get(ENV_OBJECT_CACHE_SIZE)
+    if not value:
+        return OBJECT_CACHE_SIZE
+    try:
+        return parse_size(value)
+    except ValueError as err:
+        raise EsphomeError(f"${ENV_OBJECT_CACHE_SIZE}: {err}") from err
+
+
+def _quote(value: str) -> str:
+    # For the command lines of SCons, where $ starts a variable
+    return '"' + value.replace("$", "$$") + '"'
+
+
+def write_project_script() -> None:
+    """Run the compiles of the PlatformIO project through the object cache."""
+    directory = cache_dir()
+    if directory is None:
+        return
+    # Replaced in the keys, the same sources in other build directories match
+    prefixes = [
+        CORE.relative_pioenvs_path(CORE.name),
+        CORE.relative_piolibdeps_path(CORE.name),
+        CORE.build_path,
+    ]
+    paths = [
+        object_cache_launcher.__file__,
+        str(directory),
+        CORE.relative_build_path(COMPILE_LOG),
+        *prefixes,
+    ]
+    launcher = " ".join(
+        ['"$PYTHONEXE"', "-I"]
+        + [_quote(os.path.abspath(path)) for path in paths]
+        + [object_cache_launcher.SEPARATOR]
+    )
+    write_file_if_changed(
+        CORE.relative_build_path(PROJECT_SCRIPT),
+        PROJECT_SCRIPT_FORMAT.format(launcher=launcher),
+    )
+    CORE.add_platformio_option("extra_scripts", [f"pre:{PROJECT_SCRIPT}"])
+
+
+def start_compile() -> None:
+    try:
+        os.unlink(CORE.relative_build_path(COMPILE_LOG))
+    except FileNotFoundError:
+        pass
+
+
+def _read_stats(directory: Path) -> Counter:
+    try:
+        return Counter(json.loads((directory / STATS_FILE).read_text()))
+    except (OSError, ValueError):
+        return Counter()
+
+
+def _entries(directory: Path) -> list[tuple[int, int, Path]]:
+    """Return (last use, size, path) of the cached objects."""
+    entries = []
+    for path in directory.glob("*/*.o"):
+        stderr = path.with_suffix(".stderr")
+        try:
+            stat = path.stat()
+            size = stat.st_size
+            if stderr.is_file():
+                size += stderr.stat().st_size
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, size, path))
+    return entries
+
+
+def trim(directory: Path, limit: int) -> tuple[int, int]:
+    """Remove the least recently used objects until the cache fits in limit bytes.
+
+    Returns the number of removed objects and their size.
+    """
+    entries = _entries(directory)
+    total = sum(size for _, size, _ in entries)
+    removed = freed = 0
+    # Oldest use first
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            path.unlink()
+            path.with_suffix(".stderr").unlink(missing_ok=True)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def finish_compile() -> Optional[Counter]:
+    """Report the hits and misses of the last compile and trim the cache.
+
+    Returns the results of the compile, None without cache.
+    """
+    directory = cache_dir()
+    if directory is None:
+        return None
+    try:
+        with open(CORE.relative_build_path(COMPILE_LOG), encoding="utf-8") as f_handle:
+            results = Counter(line.strip() for line in f_handle)
+    except FileNotFoundError:
+        results = Counter()
+    hits = results[object_cache_launcher.HIT]
+    misses = results[object_cache_launcher.MISS]
+    if hits or misses:
+        _LOGGER.info(
+            "Object cache: %s hits, %s misses (%.0f%% hit rate)",
+            hits,
+            misses,
+            100 * hits / (hits + misses),
+        )
+    if results and directory.is_dir():
+        totals = _read_stats(directory)
+        totals.update(results)
+        write_file(directory / STATS_FILE, json.dumps(totals))
+        removed, freed = trim(directory, max_size())
+        if removed:
+            _LOGGER.info(
+                "Removed %s objects (%s) from the object cache",
+                removed,
+                format_size(freed),
+            )
+    return results
+
+
+def stats(directory: Path) -> CacheStats:
+    entries = _entries(directory)
+    totals = _read_stats(directory)
+    return CacheStats(
+        objects=len(entries),
+        size=sum(size for _, size, _ in entries),
+        hits=totals[object_cache_launcher.HIT],
+        misses=totals[object_cache_launcher.MISS],
+    )
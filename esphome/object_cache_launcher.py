@@ -0,0 +1,188 @@
+"""Compiler launcher of the object cache, see esphome/object_cache.py.
+
+PlatformIO runs every compile of a project through this script:
+
+    python -I object_cache_launcher.py CACHE_DIR LOG_FILE PREFIX... -- COMPILER ARGS...
+
+An object is keyed by the compiler, its arguments and the preprocessed source, with
+each PREFIX (the directories of the build) replaced by a placeholder. Identical
+sources compiled in the build directories of different devices get the same key.
+The objects are compiled with -fdebug-prefix-map for each PREFIX, so their debug
+information doesn't contain the build directory either. Sources with the build
+directory in their code, like expansions of __FILE__, keep it in the key.
+The result of each compile, hit, miss or uncached, is appended to LOG_FILE.
+
+This runs once for every compiled file, so it only uses the standard library.
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+from typing import Optional
+
+LAUNCHER_VERSION = 2
+SEPARATOR = "--"
+
+HIT = "hit"
+MISS = "miss"
+UNCACHED = "uncached"
+
+
+def compile_target(args: list[str]) -> Optional[str]:
+    """Return the object file compiled by args, None if it isn't a plain compile."""
+    if "-c" not in args or args.count("-o") != 1:
+        return None
+    if any(arg in ("-E", "-S", "-M", "-MM") for arg in args):
+        return None
+    index = args.index("-o")
+    if index + 1 >= len(args):
+        return None
+    return args[index + 1]
+
+
+def _encoded_prefixes(prefix: str) -> list[bytes]:
+    encoded = [os.fsencode(prefix)]
+    if os.sep == "\\":
+        # Escaped in the line markers and strings of the preprocessed source
+        encoded.append(os.fsencode(prefix.replace("\\", "\\\\")))
+    return encoded
+
+
+def normalize(data: bytes, prefixes: list[str]) -> bytes:
+    for i, prefix in enumerate(prefixes):
+        placeholder = f"<{i}>".encode()
+        for encoded in _encoded_prefixes(prefix):
+            data = data.replace(encoded, placeholder)
+    return data
+
+
+def paths_in_code(source: bytes, prefixes: list[str]) -> bool:
+    """Whether the preprocessed source has the prefixes outside of line markers."""
+    encoded = [re.escape(value) for p in prefixes for value in _encoded_prefixes(p)]
+    if not encoded:
+        return False
+    pattern = rb"^(?!#).*(?:" + b"|".join(encoded) + rb")"
+    return re.search(pattern, source, re.MULTILINE) is not None
+
+
+def prefix_map_args(prefixes: list[str]) -> list[str]:
+    """Map the prefixes in the debug information to the working directory."""
+    # The last matching option wins, the longest prefix is the most specific one
+    return [f"-fdebug-prefix-map={prefix}=." for prefix in sorted(prefixes, key=len)]
+
+
+def _compiler_id(compiler: str) -> str:
+    path = shutil.which(compiler) or compiler
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def cache_key(args: list[str], target: str, prefixes: list[str]) -> Optional[str]:
+    """Return the key of the object compiled by args, None if it can't be keyed."""
+    index = args.index("-o")
+    flags = args[:index] + args[index + 2 :]
+    preprocess = ["-E" if arg == "-c" else arg for arg in flags]
+    result = subprocess.run(
+        preprocess, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False
+    )
+    if result.returncode != 0:
+        # Compiling reports the error
+        return None
+
+    hasher = hashlib.sha256()
+    for value in (str(LAUNCHER_VERSION), _compiler_id(args[0]), *flags):
+        hasher.update(normalize(value.encode(), prefixes))
+        hasher.update(b"\0")
+    if paths_in_code(result.stdout, prefixes):
+        # The object contains the build directory
+        hasher.update("\0".join(prefixes).encode())
+    hasher.update(normalize(result.stdout, prefixes))
+    return hasher.hexdigest()
+
+
+def _copy(src: str, dst: str) -> None:
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def _restore(entry: str, target: str) -> bool:
+    try:
+        with open(f"{entry}.stderr", "rb") as f_handle:
+            stderr = f_handle.read()
+    except FileNotFoundError:
+        stderr = b""
+    try:
+        _copy(f"{entry}.o", target)
+        # The modification time orders the entries for eviction
+        os.utime(f"{entry}.o")
+    except OSError:
+        return False
+    sys.stderr.buffer.write(stderr)
+    sys.stderr.flush()
+    return True
+
+
+def _store(entry: str, target: str, stderr: bytes) -> None:
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    if stderr:
+        tmp = f"{entry}.stderr.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f_handle:
+            f_handle.write(stderr)
+        os.replace(tmp, f"{entry}.stderr")
+    # Written last, an entry is complete once the object exists
+    _copy(target, f"{entry}.o")
+
+
+def run(cache_dir: str, prefixes: list[str], args: list[str]) -> tuple[str, int]:
+    """Compile with args through the cache, returns the result and the exit code."""
+    target = compile_target(args)
+    key = None
+    if target is not None:
+        try:
+            key = cache_key(args, target, prefixes)
+        except OSError:
+            pass
+    if key is None:
+        return UNCACHED, subprocess.call(args)
+
+    entry = os.path.join(cache_dir, key[:2], key)
+    if _restore(entry, target):
+        return HIT, 0
+
+    result = subprocess.run(
+        args + prefix_map_args(prefixes), stderr=subprocess.PIPE, check=False
+    )
+    sys.stderr.buffer.write(result.stderr)
+    sys.stderr.flush()
+    if result.returncode == 0:
+        try:
+            _store(entry, target, result.stderr)
+        except OSError:
+            pass
+    return MISS, result.returncode
+
+
+def main(argv: list[str]) -> int:
+    if SEPARATOR not in argv or argv.index(SEPARATOR) < 2:
+        sys.stderr.write(f"usage: {__doc__.splitlines()[4].strip()}\n")
+        return 2
+    index = argv.index(SEPARATOR)
+    cache_dir, log_file, *prefixes = argv[:index]
+    result, returncode = run(cache_dir, prefixes, argv[index + 1 :])
+    try:
+        with open(log_file, "a", encoding="utf-8") as f_handle:
+            f_handle.write(f"{result}\n")
+    except OSError:
+        pass
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""Precompressed payloads for OTA uploads.
+
+Devices that support compression get the firmware gzipped at level 9, which takes
+seconds of CPU for every upload. After a compile for such a device the payload is
+compressed once and stored next to firmware.bin as firmware.bin.gz, and its MD5 and
+the sha256 of the firmware it was compressed from are recorded in the StorageJSON.
+Uploads and dashboard downloads of a firmware with that hash use the stored payload.
+"""
+import hashlib
+import logging
+from typing import Optional
+
+from esphome.const import PLATFORM_ESP8266
+from esphome.core import EsphomeError
+from esphome.helpers import file_hash, write_file
+from esphome.storage_json import StorageJSON, storage_path
+
+_LOGGER = logging.getLogger(__name__)
+
+PAYLOAD_SUFFIX = ".gz"
+# Only the OTA of the ESP8266 Arduino core decompresses uploads
+COMPRESSING_PLATFORMS = (PLATFORM_ESP8266,)
+
+
+def payload_path(firmware_bin: str) -> str:
+    return f"{firmware_bin}{PAYLOAD_SUFFIX}"
+
+
+def write_payload() -> None:
+    """Compress the firmware of the current build for OTA uploads, unless the
+    stored payload is up to date or the device can't decompress it."""
+    from esphome import espota2
+
+    path = storage_path()
+    storage = StorageJSON.load(path)
+    if (
+        storage is None
+        or storage.firmware_bin_path is None
+        or storage.target_platform.lower() not in COMPRESSING_PLATFORMS
+    ):
+        return
+    firmware_bin = storage.firmware_bin_path
+    if load_payload(storage, firmware_bin) is not None:
+        return
+    try:
+        firmware_sha256 = file_hash(firmware_bin)
+    except OSError:
+        return
+
+    with open(firmware_bin, "rb") as file_handle:
+        payload, md5 = espota2.prepare_payload(file_handle, True)
+    try:
+        write_file(payload_path(firmware_bin), payload)
+    except EsphomeError as err:
+        _LOGGER.warning("Could not store the compressed firmware: %s", err)
+        return
+    storage.ota_payload_md5 = md5
+    storage.ota_payload_firmware_sha256 = firmware_sha256
+    storage.save(path)
+    _LOGGER.info("Compressed the firmware for OTA uploads to %s bytes", len(payload))
+
+
+def load_payload(
+    storage: Optional[StorageJSON], firmware_bin: str
+) -> Optional[tuple[memoryview, str]]:
+    """Return the stored payload and its MD5 if it was compressed from firmware_bin."""
+    if storage is None or storage.ota_payload_md5 is None:
+        return None
+    try:
+        if file_hash(firmware_bin) != storage.ota_payload_firmware_sha256:
+            return None
+        with open(payload_path(firmware_bin), "rb") as file_handle:
+            payload = file_handle.read()
+    except OSError:
+        return None
+    md5 = hashlib.md5(payload).hexdigest()
+    if md5 != storage.ota_payload_md5:
+        _LOGGER.debug("Ignoring the changed compressed firmware of %s", firmware_bin)
+        return None
+    return memoryview(payload), md5
@@ -9,6 +9,7 @@ import re
 import subprocess
 
 from esphome.const import CONF_COMPILE_PROCESS_LIMIT, CONF_ESPHOME, KEY_CORE
+from esphome import trace
 from esphome.core import CORE, EsphomeError
 from esphome.util import run_external_command, run_external_process
 
@@ -84,13 +85,14 @@ def run_platformio_cli(*args, **kwargs) -> Union[str, int]:
     if not CORE.verbose:
         kwargs["filter_lines"] = FILTER_PLATFORMIO_LINES
 
-    if os.environ.get("ESPHOME_USE_SUBPROCESS") is not None:
-        return run_external_process(*cmd, **kwargs)
+    with trace.span(" ".join(cmd[:2]), "platformio", cmd=cmd):
+        if os.environ.get("ESPHOME_USE_SUBPROCESS") is not None:
+            return run_external_process(*cmd, **kwargs)
 
-    import platformio.__main__
+        import platformio.__main__
 
-    patch_structhash()
-    return run_external_command(platformio.__main__.main, *cmd, **kwargs)
+        patch_structhash()
+        return run_external_command(platformio.__main__.main, *cmd, **kwargs)
 
 
 def run_platformio_cli_run(config, verbose, *args, **kwargs) -> Union[str, int]:
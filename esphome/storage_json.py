@@ -45,6 +45,10 @@ class StorageJSON:
         build_path,
         firmware_bin_path,
         loaded_integrations,
+        firmware_fingerprint=None,
+        firmware_sha256=None,
+        ota_payload_md5=None,
+        ota_payload_firmware_sha256=None,
     ):
         # Version of the storage JSON schema
         assert storage_version is None or isinstance(storage_version, int)
@@ -72,6 +76,14 @@ class StorageJSON:
         # A list of strings of names of loaded integrations
         self.loaded_integrations: list[str] = loaded_integrations
         self.loaded_integrations.sort()
+        # The fingerprint of the build inputs of the firmware binary
+        self.firmware_fingerprint: Optional[str] = firmware_fingerprint
+        # The sha256 of the firmware binary built from them
+        self.firmware_sha256: Optional[str] = firmware_sha256
+        # The MD5 of the compressed OTA payload next to the firmware binary
+        self.ota_payload_md5: Optional[str] = ota_payload_md5
+        # The sha256 of the firmware binary the OTA payload was compressed from
+        self.ota_payload_firmware_sha256: Optional[str] = ota_payload_firmware_sha256
 
     def as_dict(self):
         return {
@@ -86,6 +98,10 @@ class StorageJSON:
             "build_path": self.build_path,
             "firmware_bin_path": self.firmware_bin_path,
             "loaded_integrations": self.loaded_integrations,
+            "firmware_fingerprint": self.firmware_fingerprint,
+            "firmware_sha256": self.firmware_sha256,
+            "ota_payload_md5": self.ota_payload_md5,
+            "ota_payload_firmware_sha256": self.ota_payload_firmware_sha256,
         }
 
     def to_json(self):
@@ -115,6 +131,12 @@ class StorageJSON:
             build_path=esph.build_path,
             firmware_bin_path=esph.firmware_bin,
             loaded_integrations=list(esph.loaded_integrations),
+            firmware_fingerprint=old.firmware_fingerprint if old else None,
+            firmware_sha256=old.firmware_sha256 if old else None,
+            ota_payload_md5=old.ota_payload_md5 if old else None,
+            ota_payload_firmware_sha256=(
+                old.ota_payload_firmware_sha256 if old else None
+            ),
         )
 
     @staticmethod
@@ -150,6 +172,10 @@ class StorageJSON:
         build_path = storage.get("build_path")
         firmware_bin_path = storage.get("firmware_bin_path")
         loaded_integrations = storage.get("loaded_integrations", [])
+        firmware_fingerprint = storage.get("firmware_fingerprint")
+        firmware_sha256 = storage.get("firmware_sha256")
+        ota_payload_md5 = storage.get("ota_payload_md5")
+        ota_payload_firmware_sha256 = storage.get("ota_payload_firmware_sha256")
         return StorageJSON(
             storage_version,
             name,
@@ -162,6 +188,10 @@ class StorageJSON:
             build_path,
             firmware_bin_path,
             loaded_integrations,
+            firmware_fingerprint,
+            firmware_sha256,
+            ota_payload_md5,
+            ota_payload_firmware_sha256,
         )
 
     @staticmethod
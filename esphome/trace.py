@@ -0,0 +1,63 @@
+"""Record where time is spent as Chrome trace events.
+
+Enabled with `esphome --trace FILE <command>`, the written file can be opened in
+chrome://tracing or https://ui.perfetto.dev to see the phases of the command on a
+timeline. When tracing is disabled `span` returns a shared no-op context manager.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, ContextManager, Optional
+
+from esphome.helpers import write_file
+
+_NULL_SPAN = contextlib.nullcontext()
+_EVENTS: Optional[list[dict[str, Any]]] = None
+
+
+def start_tracing() -> None:
+    global _EVENTS
+    _EVENTS = []
+
+
+def is_tracing() -> bool:
+    return _EVENTS is not None
+
+
+@contextlib.contextmanager
+def _record_span(events: list[dict[str, Any]], name: str, cat: str, args: dict):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def span(name: str, cat: str, **args: Any) -> ContextManager[None]:
+    """Record the time spent in the with block as a complete event."""
+    if _EVENTS is None:
+        return _NULL_SPAN
+    return _record_span(_EVENTS, name, cat, args)
+
+
+def write_trace(path: str) -> None:
+    """Write the recorded events to path and stop tracing."""
+    global _EVENTS
+    events, _EVENTS = _EVENTS or [], None
+    events.sort(key=lambda event: event["ts"])
+    data = {"traceEvents": events, "displayTimeUnit": "ms"}
+    write_file(path, json.dumps(data, default=str))
@@ -81,6 +81,15 @@ def safe_print(message=""):
             print("Cannot print line because of invalid locale!")
 
 
+def print_bar(middle_text, twidth=60):
+    import click
+
+    middle_text = f" {middle_text} "
+    width = len(click.unstyle(middle_text))
+    half_line = "=" * ((twidth - width) // 2)
+    click.echo(f"{half_line}{middle_text}{half_line}")
+
+
 def shlex_quote(s):
     if not s:
         return "''"
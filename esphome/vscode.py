@@ -3,7 +3,12 @@ import os
 
 from typing import Optional
 
-from esphome.config import load_config, _format_vol_invalid, Config
+from esphome.config import (
+    load_config,
+    _format_vol_invalid,
+    Config,
+    SchemaValidationCache,
+)
 from esphome.core import CORE, DocumentRange
 import esphome.config_validation as cv
 
@@ -57,6 +62,8 @@ class VSCodeResult:
 
 
 def read_config(args):
+    # Reuse schema validation results for the parts of the config that did not change
+    schema_cache = SchemaValidationCache()
     while True:
         CORE.reset()
         data = json.loads(input())
@@ -70,7 +77,9 @@ def read_config(args):
             CORE.config_path = data["file"]
         vs = VSCodeResult()
         try:
-            res = load_config(dict(args.substitution) if args.substitution else {})
+            res = load_config(
+                dict(args.substitution) if args.substitution else {}, schema_cache
+            )
         except Exception as err:  # pylint: disable=broad-except
             vs.add_yaml_error(str(err))
         else:
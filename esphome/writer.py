@@ -1,8 +1,10 @@
+from contextlib import suppress
+import json
 import logging
 import os
 import re
 from pathlib import Path
-from typing import Union
+from typing import AbstractSet, Any, Optional, Union
 
 from esphome.config import iter_components
 from esphome.const import (
@@ -13,15 +15,19 @@ from esphome.const import (
 )
 from esphome.core import CORE, EsphomeError
 from esphome.helpers import (
+    indent,
     mkdir_p,
     read_file,
+    write_file,
     write_file_if_changed,
     walk_files,
-    copy_file_if_changed,
+    file_compare,
+    file_hash,
     get_bool_env,
+    reflink_or_copy_file,
 )
 from esphome.storage_json import StorageJSON, storage_path
-from esphome import loader
+from esphome import loader, object_cache, trace, yaml_util
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -49,6 +55,30 @@ void loop() {
 """,
 )
 
+# Directory in src for the setup code of each domain, with split_setup
+SETUP_SHARD_DIR = "setup"
+# Included by the setup code files instead of the global code of main.cpp, with the
+# global statements that rarely change
+SETUP_SHARD_HEADER = "setup_globals.h"
+SETUP_SHARD_HEADER_FORMAT = """// Auto generated code by esphome
+#pragma once
+#include "esphome.h"
+{}
+"""
+SETUP_SHARD_FORMAT = """// Auto generated code by esphome
+#include "{}"
+
+{}"""
+# Global statements every setup code file needs, all others are only in main.cpp
+SHARED_GLOBAL_PREFIXES = ("using ", "#define ")
+# The names of types and macros declared by global code only in main.cpp
+USER_DECLARATION_RE = re.compile(
+    r"\b(?:class|struct|union|enum(?:\s+class)?|using|#\s*define)\s+(\w+)"
+    r"|\btypedef\b[^;]*?(\w+)\s*;"
+)
+INCLUDE_RE = re.compile(r'^\s*#\s*include\s+"([^"]+)"')
+LAMBDA_RE = re.compile(r"\[[=&]?\]\(")
+
 INI_BASE_FORMAT = (
     """; Auto generated code by esphome
 
@@ -194,6 +224,7 @@ def write_platformio_ini(content):
 def write_platformio_project():
     mkdir_p(CORE.build_path)
 
+    object_cache.write_project_script()
     content = get_ini_content()
     if not get_bool_env(ENV_NOGITIGNORE):
         write_gitignore()
@@ -213,6 +244,9 @@ VERSION_H_FORMAT = """\
 """
 DEFINES_H_TARGET = "esphome/core/defines.h"
 VERSION_H_TARGET = "esphome/core/version.h"
+# Records the source files copied to src/esphome, to skip unchanged files
+SRC_MANIFEST = "src_manifest.json"
+SRC_MANIFEST_VERSION = 1
 ESPHOME_README_TXT = """
 THIS DIRECTORY IS AUTO-GENERATED, DO NOT MODIFY
 
@@ -225,54 +259,161 @@ the custom_components folder or the external_components feature.
 """
 
 
+def _load_src_manifest() -> dict[str, Any]:
+    """Read the manifest of the last copy_src_tree, or an empty one."""
+    try:
+        manifest = json.loads(read_file(CORE.relative_build_path(SRC_MANIFEST)))
+    except (EsphomeError, ValueError):
+        return {}
+    if (
+        not isinstance(manifest, dict)
+        or manifest.get("version") != SRC_MANIFEST_VERSION
+    ):
+        return {}
+    return manifest
+
+
+def _component_resources(
+    component: loader.ComponentManifest,
+    listed: dict[str, Any],
+    packages: dict[str, Any],
+) -> tuple[list[loader.FileResource], Optional[Path]]:
+    """Return the source files of a component and the directory containing them.
+
+    The listing of the directory is reused from the manifest until the directory is
+    modified. Components not in a directory on disk return None as directory.
+    """
+    package = component.package
+    if component.file is not None:
+        directory = component.file.parent
+        try:
+            mtime_ns = directory.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns is not None:
+            entry = listed.get(package)
+            if entry is None or entry["path"] != str(directory):
+                entry = None
+            elif entry["mtime_ns"] != mtime_ns:
+                entry = None
+            if entry is None:
+                entry = {
+                    "path": str(directory),
+                    "mtime_ns": mtime_ns,
+                    "resources": [res.resource for res in component.resources],
+                }
+            packages[package] = entry
+            resources = [loader.FileResource(package, r) for r in entry["resources"]]
+            return resources, directory
+    return component.resources, None
+
+
+def _sync_file(src: str, dst: str, entry: Optional[dict[str, Any]]) -> dict[str, Any]:
+    """Update dst to the contents of src.
+
+    entry is what the manifest recorded for dst at the last sync. If neither file
+    changed since, they are not read at all. Returns the new entry.
+    """
+    src_stat = os.stat(src)
+    source = [src, src_stat.st_size, src_stat.st_mtime_ns]
+    try:
+        dst_stat = os.stat(dst)
+        target = [dst_stat.st_size, dst_stat.st_mtime_ns]
+    except FileNotFoundError:
+        target = None
+    if entry is not None and entry["source"] == source and entry["target"] == target:
+        return entry
+
+    digest = file_hash(src)
+    if target is None or not (
+        (entry is not None and entry["target"] == target and entry["sha256"] == digest)
+        or file_compare(src, dst)
+    ):
+        reflink_or_copy_file(src, dst)
+        dst_stat = os.stat(dst)
+        target = [dst_stat.st_size, dst_stat.st_mtime_ns]
+    return {"source": source, "target": target, "sha256": digest}
+
+
 def copy_src_tree():
+    manifest = _load_src_manifest()
+    packages: dict[str, Any] = {}
+    source_dirs: dict[str, str] = {}
     source_files: list[loader.FileResource] = []
     for _, component, _ in iter_components(CORE.config):
-        source_files += component.resources
+        if component.package in packages:
+            continue
+        resources, directory = _component_resources(
+            component, manifest.get("packages", {}), packages
+        )
+        source_files += resources
+        if directory is not None:
+            source_dirs[component.package] = str(directory)
+    # Target paths relative to src, as posix paths
     source_files_map = {
-        Path(x.package.replace(".", "/") + "/" + x.resource): x for x in source_files
+        x.package.replace(".", "/") + "/" + x.resource: x for x in source_files
     }
 
-    # Convert to list and sort
+    # Convert to list and sort by path components
     source_files_l = list(source_files_map.items())
-    source_files_l.sort()
+    source_files_l.sort(key=lambda item: item[0].split("/"))
 
     # Build #include list for esphome.h
     include_l = []
     for target, _ in source_files_l:
-        if target.suffix in HEADER_FILE_EXTENSIONS:
+        if os.path.splitext(target)[1] in HEADER_FILE_EXTENSIONS:
             include_l.append(f'#include "{target}"')
     include_l.append("")
     include_s = "\n".join(include_l)
 
     source_files_copy = source_files_map.copy()
-    ignore_targets = [Path(x) for x in (DEFINES_H_TARGET, VERSION_H_TARGET)]
+    ignore_targets = [DEFINES_H_TARGET, VERSION_H_TARGET]
     for t in ignore_targets:
         source_files_copy.pop(t)
 
-    for fname in walk_files(CORE.relative_src_path("esphome")):
-        p = Path(fname)
-        if p.suffix not in SOURCE_FILE_EXTENSIONS:
-            # Not a source file, ignore
-            continue
-        # Transform path to target path name
-        target = p.relative_to(CORE.relative_src_path())
-        if target in ignore_targets:
-            # Ignore defines.h, will be dealt with later
-            continue
-        if target not in source_files_copy:
+    src_dir = CORE.relative_src_path()
+    synced = manifest.get("files")
+    if synced is None:
+        # Unknown state, remove all files not copied from a source
+        synced = {}
+        for fname in walk_files(CORE.relative_src_path("esphome")):
+            p = Path(fname)
+            if p.suffix not in SOURCE_FILE_EXTENSIONS:
+                # Not a source file, ignore
+                continue
+            # Transform path to target path name
+            target = p.relative_to(src_dir).as_posix()
+            if target not in ignore_targets and target not in source_files_copy:
+                # Source file removed, delete target
+                p.unlink()
+    else:
+        for target in synced.keys() - source_files_copy.keys():
             # Source file removed, delete target
-            p.unlink()
-        else:
-            src_file = source_files_copy.pop(target)
-            with src_file.path() as src_path:
-                copy_file_if_changed(src_path, p)
+            with suppress(FileNotFoundError):
+                os.unlink(os.path.join(src_dir, target))
 
-    # Now copy new files
+    files = {}
     for target, src_file in source_files_copy.items():
-        dst_path = CORE.relative_src_path(*target.parts)
+        dst_path = os.path.join(src_dir, target)
+        entry = synced.get(target)
+        directory = source_dirs.get(src_file.package)
+        if directory is not None:
+            src_path = os.path.join(directory, src_file.resource)
+            files[target] = _sync_file(src_path, dst_path, entry)
+            continue
         with src_file.path() as src_path:
-            copy_file_if_changed(src_path, dst_path)
+            files[target] = _sync_file(str(src_path), dst_path, entry)
+
+    new_manifest = {
+        "version": SRC_MANIFEST_VERSION,
+        "packages": packages,
+        "files": files,
+    }
+    if new_manifest != manifest:
+        write_file(
+            CORE.relative_build_path(SRC_MANIFEST),
+            json.dumps(new_manifest, separators=(",", ":")),
+        )
 
     # Finally copy defines
     write_file_if_changed(
@@ -312,7 +453,212 @@ def generate_version_h():
     )
 
 
-def write_cpp(code_s):
+def _setup_runs() -> list[tuple[Optional[str], list]]:
+    """Split the statements of setup() into runs added by the same component domain."""
+    runs = []
+    for statement, domain in zip(CORE.main_statements, CORE.main_statement_domains):
+        if not runs or runs[-1][0] != domain:
+            runs.append((domain, []))
+        runs[-1][1].append(statement)
+    return runs
+
+
+def _main_only_names(global_code: list[str]) -> set[str]:
+    """Return the types and macros declared by global code only in main.cpp.
+
+    Looks into the headers of the configuration's includes as well.
+    """
+    texts = list(global_code)
+    for line in global_code:
+        match = INCLUDE_RE.match(line)
+        if match is None:
+            continue
+        with suppress(OSError, UnicodeDecodeError):
+            texts.append(read_file(CORE.relative_src_path(match.group(1))))
+    names = set()
+    for match in USER_DECLARATION_RE.finditer("\n".join(texts)):
+        names.add(match.group(1) or match.group(2))
+    return names
+
+
+def _inline_runs(
+    runs: list[tuple[Optional[str], list]],
+    global_code: list[str],
+    variable_types: dict[str, str],
+) -> set[int]:
+    """Find the runs that have to stay in setup() of main.cpp.
+
+    Local variables of setup() and the static data of a domain used outside of its
+    file can only be seen in one function, so all runs declaring or using them stay
+    inline. The global code only in main.cpp (like the includes of the
+    configuration) is also only visible there, so runs with lambdas or using its
+    types stay inline as well.
+    """
+    from esphome.cpp_generator import (
+        AssignmentExpression,
+        ProgmemAssignmentExpression,
+        StaticConstAssignmentExpression,
+    )
+
+    declared: list[set[str]] = []
+    used: list[set[str]] = []
+    pinned = set()
+    owners: dict[str, set[Optional[str]]] = {}
+    for domain, statements in runs:
+        names = set()
+        for statement_ in statements:
+            expression = getattr(statement_, "expression", None)
+            if isinstance(expression, AssignmentExpression) and expression.type:
+                names.add(str(expression.name))
+                if not isinstance(
+                    expression,
+                    (ProgmemAssignmentExpression, StaticConstAssignmentExpression),
+                ):
+                    pinned.add(str(expression.name))
+        declared.append(names)
+        used.append(set(re.findall(r"[A-Za-z_]\w*", "\n".join(map(str, statements)))))
+    for (domain, _), names in zip(runs, used):
+        for name in names:
+            owners.setdefault(name, set()).add(domain)
+    scoped = set().union(*declared)
+    pinned |= {name for name in scoped if len(owners[name]) > 1}
+
+    inline = {index for index, (domain, _) in enumerate(runs) if domain is None}
+    if global_code:
+        main_only = _main_only_names(global_code)
+        for name, type_ in variable_types.items():
+            if set(re.findall(r"[A-Za-z_]\w*", type_)) & main_only:
+                main_only.add(name)
+        for index, (_, statements) in enumerate(runs):
+            code = "\n".join(map(str, statements))
+            if used[index] & main_only or LAMBDA_RE.search(code):
+                inline.add(index)
+                pinned |= declared[index]
+    while True:
+        added = {
+            index
+            for index, names in enumerate(used)
+            if index not in inline and names & pinned
+        }
+        if not added:
+            return inline
+        inline |= added
+        pinned |= set().union(*(declared[index] for index in added))
+
+
+def _split_globals() -> tuple[list[str], dict[str, str], list[str]]:
+    """Split the global statements of main.cpp for the setup code files.
+
+    Returns the statements all files need, the declarations of the variables by name
+    and the remaining global code, which may only be compiled once in main.cpp.
+    """
+    from esphome.cpp_generator import VariableDeclarationExpression, statement
+
+    shared = []
+    variables = {}
+    main_only = []
+    for global_statement in CORE.global_statements:
+        expression = getattr(global_statement, "expression", None)
+        if isinstance(expression, VariableDeclarationExpression):
+            variables[str(expression.name)] = str(expression)
+            continue
+        line = str(statement(global_statement)).rstrip()
+        if line.lstrip().startswith(SHARED_GLOBAL_PREFIXES):
+            shared.append(line)
+        else:
+            main_only.append(line)
+    return shared, variables, main_only
+
+
+def _shard_file(
+    functions: list[str], statics: list[str], variables: dict[str, str]
+) -> str:
+    code = "\n".join(functions)
+    if statics:
+        code = "\n".join(statics) + "\n\n" + code
+    # Defined in main.cpp, only declare the variables the file uses
+    used = set(re.findall(r"[A-Za-z_]\w*", code))
+    externs = [
+        f"extern {declaration};"
+        for name, declaration in sorted(variables.items())
+        if name in used
+    ]
+    if externs:
+        code = "\n".join(externs) + "\n\n" + code
+    return SETUP_SHARD_FORMAT.format(SETUP_SHARD_HEADER, code)
+
+
+def write_setup_shards() -> tuple[str, str]:
+    """Write the statements of setup() to a source file per component domain.
+
+    Each run of statements added by one domain becomes a function in the file of the
+    domain. Returns the declarations and the code calling these functions in order for
+    main.cpp. With the code of each domain in its own file, a change to one component
+    only recompiles the file of its domain. The files declare the variables of main.cpp
+    they use themselves, so adding a variable doesn't change the other files.
+    """
+    from esphome.cpp_generator import (
+        ProgmemAssignmentExpression,
+        StaticConstAssignmentExpression,
+        statement,
+    )
+
+    shards: dict[str, tuple[list[str], list[str]]] = {}
+    declarations = []
+    calls = []
+    shared, variables, main_only = _split_globals()
+    runs = _setup_runs()
+    inline = _inline_runs(runs, main_only, variables)
+    for index, (domain, statements) in enumerate(runs):
+        lines = [str(statement(s)).rstrip() for s in statements]
+        if index in inline:
+            calls += lines
+            continue
+        functions, statics = shards.setdefault(domain, ([], []))
+        name = f"setup_{domain}_{len(functions)}"
+        body = []
+        for statement_, line in zip(statements, lines):
+            expression = getattr(statement_, "expression", None)
+            if isinstance(
+                expression,
+                (ProgmemAssignmentExpression, StaticConstAssignmentExpression),
+            ):
+                # Other runs of the domain can use them too
+                statics.append(line)
+            else:
+                body.append(line)
+        body_s = indent("\n".join(body))
+        functions.append(f"void {name}() {{\n{body_s}\n}}\n")
+        declarations.append(f"void {name}();")
+        calls.append(f"{name}();")
+
+    directory = Path(CORE.relative_src_path(SETUP_SHARD_DIR))
+    for domain, (functions, statics) in shards.items():
+        write_file_if_changed(
+            directory / f"{domain}.cpp", _shard_file(functions, statics, variables)
+        )
+    if shards:
+        write_file_if_changed(
+            directory / SETUP_SHARD_HEADER,
+            SETUP_SHARD_HEADER_FORMAT.format("\n".join(shared)),
+        )
+    remove_setup_shards(set(shards))
+    return "\n".join(declarations) + "\n", "\n".join(calls) + "\n\n"
+
+
+def remove_setup_shards(keep: AbstractSet[str] = frozenset()) -> None:
+    """Delete the setup code files of domains not in keep."""
+    directory = Path(CORE.relative_src_path(SETUP_SHARD_DIR))
+    if not directory.is_dir():
+        return
+    for path in directory.glob("*.cpp"):
+        if path.stem not in keep:
+            path.unlink()
+    if not keep:
+        (directory / SETUP_SHARD_HEADER).unlink(missing_ok=True)
+
+
+def write_cpp(code_s, declarations_s=""):
     path = CORE.relative_src_path("main.cpp")
     if os.path.isfile(path):
         text = read_file(path)
@@ -326,9 +672,11 @@ def write_cpp(code_s):
     else:
         code_format = CPP_BASE_FORMAT
 
-    copy_src_tree()
+    with trace.span("copy_src_tree", "writer"):
+        copy_src_tree()
     global_s = '#include "esphome.h"\n'
     global_s += CORE.cpp_global_section
+    global_s += declarations_s
 
     full_file = f"{code_format[0] + CPP_INCLUDE_BEGIN}\n{global_s}{CPP_INCLUDE_END}"
     full_file += (
@@ -349,6 +697,10 @@ def clean_build():
     if os.path.isdir(piolibdeps):
         _LOGGER.info("Deleting %s", piolibdeps)
         shutil.rmtree(piolibdeps)
+    yaml_cache = CORE.relative_internal_path(yaml_util.YAML_CACHE_DIR)
+    if os.path.isdir(yaml_cache):
+        _LOGGER.info("Deleting %s", yaml_cache)
+        shutil.rmtree(yaml_cache)
 
 
 GITIGNORE_CONTENT = """# Gitignore settings for ESPHome
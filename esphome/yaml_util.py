@@ -1,17 +1,24 @@
+import contextlib
 import fnmatch
 import functools
+import hashlib
 import inspect
+import io
 import logging
 import math
 import os
+import pickle
+from pathlib import Path
 
 import uuid
 import yaml
 import yaml.constructor
 
-from esphome import core
+from esphome import core, trace
 from esphome.config_helpers import read_config_file
+from esphome.const import ENV_NO_YAML_CACHE, __version__
 from esphome.core import (
+    CORE,
     EsphomeError,
     IPAddress,
     Lambda,
@@ -19,9 +26,19 @@ from esphome.core import (
     TimePeriod,
     DocumentRange,
 )
-from esphome.helpers import add_class_to_obj
+from esphome.helpers import (
+    add_class_to_obj,
+    get_bool_env,
+    split_added_classes,
+    write_file,
+)
 from esphome.util import OrderedDict, filter_yaml_files
 
+try:
+    from yaml import CSafeLoader as FastestAvailableSafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as FastestAvailableSafeLoader
+
 _LOGGER = logging.getLogger(__name__)
 
 # Mostly copied from Home Assistant because that code works fine and
@@ -31,6 +48,13 @@ SECRET_YAML = "secrets.yaml"
 _SECRET_CACHE = {}
 _SECRET_VALUES = {}
 
+# Bump when the layout of the parse cache entries changes
+YAML_CACHE_VERSION = 2
+# Directory in .esphome of the parse cache, with one entry for each parsed file
+YAML_CACHE_DIR = "yaml_cache"
+# Stack of the dependency records of the files currently being parsed
+_CACHE_RECORDS = []
+
 
 class ESPHomeDataBase:
     @property
@@ -45,7 +69,8 @@ class ESPHomeDataBase:
         # pylint: disable=attribute-defined-outside-init
         self._esp_range = DocumentRange.from_marks(node.start_mark, node.end_mark)
         if isinstance(node, yaml.ScalarNode):
-            if node.style is not None and node.style in "|>":
+            # The C parser uses an empty string instead of None for plain scalars
+            if node.style in ("|", ">"):
                 self._content_offset = 1
 
     def from_database(self, database):
@@ -88,9 +113,13 @@ def _add_data_ref(fn):
     return wrapped
 
 
-class ESPHomeLoader(yaml.SafeLoader):
+class ESPHomeLoaderMixin:
     """Loader class that keeps track of line numbers."""
 
+    def __init__(self, stream, name):
+        super().__init__(stream)
+        self.name = name
+
     @_add_data_ref
     def construct_yaml_int(self, node):
         return super().construct_yaml_int(node)
@@ -222,6 +251,7 @@ class ESPHomeLoader(yaml.SafeLoader):
     @_add_data_ref
     def construct_env_var(self, node):
         args = node.value.split()
+        _record_dependency("env", args[0], os.getenv(args[0]))
         # Check for a default value
         if len(args) > 1:
             return os.getenv(args[0], " ".join(args[1:]))
@@ -238,6 +268,11 @@ class ESPHomeLoader(yaml.SafeLoader):
     def _rel_path(self, *args):
         return os.path.join(self._directory, *args)
 
+    def _find_yaml_files(self, directory):
+        files = filter_yaml_files(_find_files(self._rel_path(directory), "*.yaml"))
+        _record_dependency("dirs", self._rel_path(directory), files)
+        return files
+
     @_add_data_ref
     def construct_secret(self, node):
         secrets = _load_yaml_internal(self._rel_path(SECRET_YAML))
@@ -247,6 +282,7 @@ class ESPHomeLoader(yaml.SafeLoader):
             )
         val = secrets[node.value]
         _SECRET_VALUES[str(val)] = node.value
+        _record_dependency("secrets", str(val), node.value)
         return val
 
     @_add_data_ref
@@ -297,12 +333,12 @@ class ESPHomeLoader(yaml.SafeLoader):
 
     @_add_data_ref
     def construct_include_dir_list(self, node):
-        files = filter_yaml_files(_find_files(self._rel_path(node.value), "*.yaml"))
+        files = self._find_yaml_files(node.value)
         return [_load_yaml_internal(f) for f in files]
 
     @_add_data_ref
     def construct_include_dir_merge_list(self, node):
-        files = filter_yaml_files(_find_files(self._rel_path(node.value), "*.yaml"))
+        files = self._find_yaml_files(node.value)
         merged_list = []
         for fname in files:
             loaded_yaml = _load_yaml_internal(fname)
@@ -312,7 +348,7 @@ class ESPHomeLoader(yaml.SafeLoader):
 
     @_add_data_ref
     def construct_include_dir_named(self, node):
-        files = filter_yaml_files(_find_files(self._rel_path(node.value), "*.yaml"))
+        files = self._find_yaml_files(node.value)
         mapping = OrderedDict()
         for fname in files:
             filename = os.path.splitext(os.path.basename(fname))[0]
@@ -321,7 +357,7 @@ class ESPHomeLoader(yaml.SafeLoader):
 
     @_add_data_ref
     def construct_include_dir_merge_named(self, node):
-        files = filter_yaml_files(_find_files(self._rel_path(node.value), "*.yaml"))
+        files = self._find_yaml_files(node.value)
         mapping = OrderedDict()
         for fname in files:
             loaded_yaml = _load_yaml_internal(fname)
@@ -339,36 +375,50 @@ class ESPHomeLoader(yaml.SafeLoader):
         return add_class_to_obj(obj, ESPForceValue)
 
 
-ESPHomeLoader.add_constructor("tag:yaml.org,2002:int", ESPHomeLoader.construct_yaml_int)
-ESPHomeLoader.add_constructor(
-    "tag:yaml.org,2002:float", ESPHomeLoader.construct_yaml_float
-)
-ESPHomeLoader.add_constructor(
-    "tag:yaml.org,2002:binary", ESPHomeLoader.construct_yaml_binary
-)
-ESPHomeLoader.add_constructor(
-    "tag:yaml.org,2002:omap", ESPHomeLoader.construct_yaml_omap
-)
-ESPHomeLoader.add_constructor("tag:yaml.org,2002:str", ESPHomeLoader.construct_yaml_str)
-ESPHomeLoader.add_constructor("tag:yaml.org,2002:seq", ESPHomeLoader.construct_yaml_seq)
-ESPHomeLoader.add_constructor("tag:yaml.org,2002:map", ESPHomeLoader.construct_yaml_map)
-ESPHomeLoader.add_constructor("!env_var", ESPHomeLoader.construct_env_var)
-ESPHomeLoader.add_constructor("!secret", ESPHomeLoader.construct_secret)
-ESPHomeLoader.add_constructor("!include", ESPHomeLoader.construct_include)
-ESPHomeLoader.add_constructor(
-    "!include_dir_list", ESPHomeLoader.construct_include_dir_list
-)
-ESPHomeLoader.add_constructor(
-    "!include_dir_merge_list", ESPHomeLoader.construct_include_dir_merge_list
-)
-ESPHomeLoader.add_constructor(
-    "!include_dir_named", ESPHomeLoader.construct_include_dir_named
-)
-ESPHomeLoader.add_constructor(
-    "!include_dir_merge_named", ESPHomeLoader.construct_include_dir_merge_named
-)
-ESPHomeLoader.add_constructor("!lambda", ESPHomeLoader.construct_lambda)
-ESPHomeLoader.add_constructor("!force", ESPHomeLoader.construct_force)
+class _NamedStream(io.StringIO):
+    """Stream that passes the file name on to the marks of the C parser."""
+
+    def __init__(self, content, name):
+        super().__init__(content)
+        self.name = name
+
+
+class ESPHomeLoader(ESPHomeLoaderMixin, FastestAvailableSafeLoader):
+    """Loader class that uses the libyaml parser if it is available."""
+
+    def __init__(self, content, name):
+        # The C parser takes the document name for the marks from the stream
+        super().__init__(_NamedStream(content, name), name)
+
+
+class ESPHomePurePythonLoader(ESPHomeLoaderMixin, yaml.SafeLoader):
+    """Loader class that uses the pure python parser.
+
+    This is slower, but has more readable error messages.
+    """
+
+
+for _loader in (ESPHomeLoader, ESPHomePurePythonLoader):
+    _loader.add_constructor("tag:yaml.org,2002:int", _loader.construct_yaml_int)
+    _loader.add_constructor("tag:yaml.org,2002:float", _loader.construct_yaml_float)
+    _loader.add_constructor("tag:yaml.org,2002:binary", _loader.construct_yaml_binary)
+    _loader.add_constructor("tag:yaml.org,2002:omap", _loader.construct_yaml_omap)
+    _loader.add_constructor("tag:yaml.org,2002:str", _loader.construct_yaml_str)
+    _loader.add_constructor("tag:yaml.org,2002:seq", _loader.construct_yaml_seq)
+    _loader.add_constructor("tag:yaml.org,2002:map", _loader.construct_yaml_map)
+    _loader.add_constructor("!env_var", _loader.construct_env_var)
+    _loader.add_constructor("!secret", _loader.construct_secret)
+    _loader.add_constructor("!include", _loader.construct_include)
+    _loader.add_constructor("!include_dir_list", _loader.construct_include_dir_list)
+    _loader.add_constructor(
+        "!include_dir_merge_list", _loader.construct_include_dir_merge_list
+    )
+    _loader.add_constructor("!include_dir_named", _loader.construct_include_dir_named)
+    _loader.add_constructor(
+        "!include_dir_merge_named", _loader.construct_include_dir_merge_named
+    )
+    _loader.add_constructor("!lambda", _loader.construct_lambda)
+    _loader.add_constructor("!force", _loader.construct_force)
 
 
 def load_yaml(fname, clear_secrets=True):
@@ -379,9 +429,47 @@ def load_yaml(fname, clear_secrets=True):
 
 
 def _load_yaml_internal(fname):
-    content = read_config_file(fname)
-    loader = ESPHomeLoader(content)
-    loader.name = fname
+    with trace.span("load_yaml", "yaml", file=str(fname)):
+        content = read_config_file(fname)
+        if not _yaml_cache_enabled():
+            return _parse_yaml(fname, content)
+
+        digest = _content_hash(content)
+        _record_dependency("files", str(fname), digest)
+        cache_path = _yaml_cache_path(fname)
+        key = _yaml_cache_key(digest)
+        entry = _read_yaml_cache(cache_path, key)
+        if entry is not None:
+            _SECRET_VALUES.update(entry["secrets"])
+            if _CACHE_RECORDS:
+                _merge_record(_CACHE_RECORDS[-1], entry)
+            return entry["data"]
+
+        record = _new_record()
+        _CACHE_RECORDS.append(record)
+        try:
+            data = _parse_yaml(fname, content)
+        finally:
+            _CACHE_RECORDS.pop()
+            if _CACHE_RECORDS:
+                _merge_record(_CACHE_RECORDS[-1], record)
+        _write_yaml_cache(cache_path, {**record, "key": key, "data": data})
+        return data
+
+
+def _parse_yaml(fname, content):
+    try:
+        return _parse_yaml_with_type(ESPHomeLoader, fname, content)
+    except EsphomeError:
+        if ESPHomeLoader is ESPHomePurePythonLoader:
+            raise
+        # Loading failed, load again with the pure python loader which has
+        # more readable error messages
+        return _parse_yaml_with_type(ESPHomePurePythonLoader, fname, content)
+
+
+def _parse_yaml_with_type(loader_type, fname, content):
+    loader = loader_type(content, fname)
     try:
         return loader.get_single_data() or OrderedDict()
     except yaml.YAMLError as exc:
@@ -390,6 +478,140 @@ def _load_yaml_internal(fname):
         loader.dispose()
 
 
+def _yaml_cache_enabled():
+    # In vscode mode files are read over stdin, so checking dependencies is not cheap
+    return (
+        CORE.config_path is not None
+        and not CORE.vscode
+        and not get_bool_env(ENV_NO_YAML_CACHE)
+    )
+
+
+def _content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _yaml_cache_path(fname):
+    # One entry per file, replaced when the file changes. The file name also ends up
+    # in the document marks.
+    name = hashlib.sha256(repr(fname).encode("utf-8")).hexdigest()
+    return Path(CORE.relative_internal_path(YAML_CACHE_DIR, f"{name}.pickle"))
+
+
+def _yaml_cache_key(digest):
+    return f"{__version__}\0{YAML_CACHE_VERSION}\0{digest}"
+
+
+def _new_record():
+    # Everything other than the file contents the constructed tree depends on:
+    # - files: all (transitively) included files with their content hash
+    # - dirs: the files found for each !include_dir_* directory
+    # - env: the value of each environment variable read by !env_var
+    # - secrets: the secret values and names to restore for is_secret()
+    return {"files": {}, "dirs": {}, "env": {}, "secrets": {}}
+
+
+@contextlib.contextmanager
+def track_dependencies():
+    """Record what the YAML loaded inside the context depends on, see _new_record."""
+    record = _new_record()
+    _CACHE_RECORDS.append(record)
+    try:
+        yield record
+    finally:
+        _CACHE_RECORDS.remove(record)
+
+
+def _merge_record(record, other):
+    for key in ("files", "dirs", "env", "secrets"):
+        record[key].update(other[key])
+
+
+def _record_dependency(kind, key, value):
+    if _CACHE_RECORDS:
+        _CACHE_RECORDS[-1][kind][key] = value
+
+
+def _is_record_valid(record):
+    for fname, digest in record["files"].items():
+        try:
+            if _content_hash(read_config_file(fname)) != digest:
+                return False
+        except EsphomeError:
+            return False
+    for directory, files in record["dirs"].items():
+        if filter_yaml_files(_find_files(directory, "*.yaml")) != files:
+            return False
+    for var, value in record["env"].items():
+        if os.getenv(var) != value:
+            return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _restored_class(base, added):
+    obj = base() if base in (int, float, str, bytes) else base.__new__(base)
+    for cls in added:
+        obj = add_class_to_obj(obj, cls)
+    return type(obj)
+
+
+def _restore_cached_obj(base, added, value):
+    cls = _restored_class(base, added)
+    if base in (int, float, str, bytes):
+        return cls(value)
+    return cls.__new__(cls)
+
+
+class CachePickler(pickle.Pickler):
+    """Pickler that can store values created by add_class_to_obj.
+
+    The classes created at runtime can't be pickled by reference, so these objects
+    are stored as their original type plus the classes that were added to them.
+    """
+
+    def reducer_override(self, obj):
+        base, added = split_added_classes(type(obj))
+        if not added:
+            return NotImplemented
+        value = base(obj) if base in (int, float, str, bytes) else None
+        return (
+            _restore_cached_obj,
+            (base, tuple(added), value),
+            getattr(obj, "__dict__", None) or None,
+            iter(obj) if isinstance(obj, list) else None,
+            iter(obj.items()) if isinstance(obj, dict) else None,
+        )
+
+
+def _read_yaml_cache(path, key):
+    try:
+        with open(path, "rb") as f_handle:
+            entry = pickle.load(f_handle)
+    except FileNotFoundError:
+        return None
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.debug("Ignoring unreadable YAML cache file %s: %s", path, err)
+        return None
+    if entry.get("key") != key or not _is_record_valid(entry):
+        return None
+    return entry
+
+
+def _write_yaml_cache(path, entry):
+    with io.BytesIO() as buf:
+        try:
+            CachePickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(entry)
+        except (pickle.PicklingError, TypeError, AttributeError) as err:
+            _LOGGER.debug("Could not cache %s: %s", path, err)
+            return
+        data = buf.getvalue()
+    try:
+        write_file(path, data)
+    except EsphomeError as err:
+        _LOGGER.debug("Could not write YAML cache file %s: %s", path, err)
+
+
 def dump(dict_):
     """Dump YAML to a string and remove null."""
     return yaml.dump(
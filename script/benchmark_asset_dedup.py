@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Report the flash and generated code size saved by sharing repeated animation
+frames and font glyph bitmaps.
+
+    script/benchmark_asset_dedup.py [--frames 48] [--unique 6] [--font FILE.ttf]
+"""
+import argparse
+import io
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from esphome.components.animation import convert_animation  # noqa: E402
+from esphome.components.font import DEFAULT_GLYPHS, rasterize_font  # noqa: E402
+from esphome.components.image import convert  # noqa: E402
+from esphome.cpp_generator import ByteArrayInitializer  # noqa: E402
+
+
+def make_animation(frames, unique):
+    """A GIF looping over `unique` different frames, like a spinner."""
+    images = []
+    for index in range(frames):
+        image = Image.new("RGB", (128, 64), "black")
+        draw = ImageDraw.Draw(image)
+        angle = (index % unique) * 360 // unique
+        draw.pieslice((32, 0, 96, 64), angle, angle + 90, fill="white")
+        images.append(image)
+    gif = io.BytesIO()
+    # Keep the repeated frames, by default Pillow merges consecutive equal ones
+    images[0].save(gif, "GIF", save_all=True, append_images=images[1:], duration=50)
+    gif.seek(0)
+    return gif
+
+
+def report(name, before, after, initializers):
+    code = sum(len(str(ByteArrayInitializer(data))) for data in initializers)
+    print(
+        f"  {name:<14}{before:>9} -> {after:>9} bytes ({before - after} saved), "
+        f"{code} characters of generated code"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=48)
+    parser.add_argument("--unique", type=int, default=6)
+    parser.add_argument("--font", help="TrueType font to rasterize")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 9, 12, 20])
+    args = parser.parse_args()
+
+    gif = make_animation(args.frames, args.unique)
+    print(f"{args.frames} frame animation with {args.unique} different frames:")
+    for image_type in ("BINARY", "RGB565"):
+        data, width, height, frames, frame_index = convert_animation(
+            gif, image_type, None
+        )
+        before = convert.frame_size(width, height, image_type) * frames
+        after = len(data) + len(frame_index or b"")
+        report(image_type, before, after, [data, frame_index or b""])
+
+    if args.font is None:
+        return
+    glyphs = sorted(DEFAULT_GLYPHS)
+    print(f"{os.path.basename(args.font)} with {len(glyphs)} glyphs:")
+    for size in args.sizes:
+        data, glyph_args, _, _ = rasterize_font(args.font, "local", size, glyphs)
+        before = sum(
+            (width + 7) // 8 * height for _, _, _, width, height in glyph_args.values()
+        )
+        report(f"size {size}", before, len(data), [data])
+
+
+if __name__ == "__main__":
+    main()
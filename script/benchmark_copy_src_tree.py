@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Time writer.copy_src_tree for a configuration: a first copy, a sync comparing
+every file like before the sync manifest, and a no-op sync with the manifest.
+
+    script/benchmark_copy_src_tree.py CONFIG.yaml [--runs 10]
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from esphome import config as config_, writer  # noqa: E402
+from esphome.core import CORE  # noqa: E402
+
+
+def timed(label, func, runs, setup=None):
+    timings = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    best = min(timings) * 1000
+    mean = sum(timings) / len(timings) * 1000
+    print(f"  {label:<16}best {best:8.2f} ms  mean {mean:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("configuration")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    CORE.config_path = os.path.abspath(args.configuration)
+    CORE.config = config_.read_config({})
+    if CORE.config is None:
+        sys.exit(1)
+    manifest = CORE.relative_build_path(writer.SRC_MANIFEST)
+
+    def remove_src():
+        shutil.rmtree(CORE.relative_src_path("esphome"), ignore_errors=True)
+        if os.path.exists(manifest):
+            os.unlink(manifest)
+
+    def remove_manifest():
+        os.unlink(manifest)
+
+    files = {
+        resource
+        for _, component, _ in config_.iter_components(CORE.config)
+        for resource in component.resources
+    }
+    print(f"{CORE.name}, {len(files)} source files:")
+    timed("first copy", writer.copy_src_tree, args.runs, remove_src)
+    timed("compare all", writer.copy_src_tree, args.runs, remove_manifest)
+    timed("no-op", writer.copy_src_tree, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Compare the image conversion of esphome.components.image.convert with the old
+per-pixel loops, on a large image and a long GIF.
+
+    script/benchmark_image_conversion.py [--size 1024] [--frames 120]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from esphome.components.image import convert  # noqa: E402
+
+
+def pixel_loops(frame, image_type):
+    width, height = frame.size
+    if image_type == "GRAYSCALE":
+        return bytearray(frame.getdata())
+    if image_type == "RGB24":
+        data = bytearray(height * width * 3)
+        pos = 0
+        for pix in frame.getdata():
+            data[pos] = pix[0]
+            data[pos + 1] = pix[1]
+            data[pos + 2] = pix[2]
+            pos += 3
+        return data
+    if image_type == "RGB565":
+        data = bytearray(height * width * 2)
+        pos = 0
+        for pix in frame.getdata():
+            rgb = ((pix[0] >> 3) << 11) | ((pix[1] >> 2) << 5) | (pix[2] >> 3)
+            data[pos] = rgb >> 8
+            data[pos + 1] = rgb & 255
+            pos += 2
+        return data
+    width8 = ((width + 7) // 8) * 8
+    data = bytearray(height * width8 // 8)
+    for y in range(height):
+        for x in range(width):
+            if image_type == "BINARY" and frame.getpixel((x, y)):
+                continue
+            if image_type == "TRANSPARENT_BINARY" and not frame.getpixel((x, y))[3]:
+                continue
+            pos = x + y * width8
+            data[pos // 8] |= 0x80 >> (pos % 8)
+    return data
+
+
+def make_image(size):
+    image = Image.radial_gradient("L").resize((size, size)).convert("RGBA")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size, 16):
+        draw.line((0, i, size - 1, size - 1 - i), fill=(255, i % 256, 0, i % 256))
+    return image
+
+
+def make_animation(frames):
+    """Write a GIF and read its frames back, like the animation component does."""
+    base = make_image(240).crop((0, 0, 240, 135)).convert("RGB")
+    gif = io.BytesIO()
+    rotated = [base.rotate(i * 3) for i in range(frames)]
+    rotated[0].save(gif, "GIF", save_all=True, append_images=rotated[1:])
+    image = Image.open(gif)
+    result = []
+    for index in range(image.n_frames):
+        image.seek(index)
+        result.append(image.convert("RGBA"))
+    return result
+
+
+def run(name, converters, frames):
+    print(f"{name}:")
+    for image_type, mode in convert.FRAME_MODES.items():
+        converted = [frame.convert(mode) for frame in frames]
+        results = {}
+        timings = []
+        for label, func in converters:
+            start = time.perf_counter()
+            results[label] = b"".join(
+                bytes(func(frame, image_type)) for frame in converted
+            )
+            timings.append(f"{label} {time.perf_counter() - start:8.3f}s")
+        identical = len(set(results.values())) == 1
+        print(f"  {image_type:<20}{'  '.join(timings)}  identical={identical}")
+        if not identical:
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--frames", type=int, default=120)
+    args = parser.parse_args()
+
+    converters = [("loops", pixel_loops)]
+    converters.append(
+        ("pillow", lambda f, t: convert.pack_frame(f, t, use_numpy=False))
+    )
+    if convert.np is not None:
+        converters.append(("numpy", convert.pack_frame))
+
+    run(f"{args.size}x{args.size} image", converters, [make_image(args.size)])
+    run(f"{args.frames} frame GIF", converters, make_animation(args.frames))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,26 @@ sys.path.insert(0, package_root.as_posix())
 
 import pytest
 
+from esphome.const import (
+    ENV_NO_ASSET_CACHE,
+    ENV_NO_CODEGEN_CACHE,
+    ENV_NO_COMPONENT_INDEX,
+    ENV_NO_YAML_CACHE,
+)
 from esphome.core import CORE
 from esphome.config import read_config
 from esphome.__main__ import generate_cpp_contents
 
 
+@pytest.fixture(autouse=True)
+def no_yaml_cache(monkeypatch):
+    """Don't write caches next to the test configurations."""
+    monkeypatch.setenv(ENV_NO_YAML_CACHE, "1")
+    monkeypatch.setenv(ENV_NO_COMPONENT_INDEX, "1")
+    monkeypatch.setenv(ENV_NO_CODEGEN_CACHE, "1")
+    monkeypatch.setenv(ENV_NO_ASSET_CACHE, "1")
+
+
 @pytest.fixture
 def generate_main():
     """Generates the C++ main.cpp file and returns it in string form."""
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+from esphome import asset_cache
+from esphome.const import ENV_NO_ASSET_CACHE
+from esphome.core import CORE
+
+CALLS = []
+
+
+def _convert(path, scale):
+    CALLS.append((path, scale))
+    with open(path, "rb") as f_handle:
+        return f_handle.read() * scale, {"scale": scale}
+
+
+@pytest.fixture
+def source(tmp_path):
+    CALLS.clear()
+    CORE.config_path = str(tmp_path / "test.yaml")
+    path = tmp_path / "image.png"
+    path.write_bytes(b"pixels")
+    yield path
+    CORE.reset()
+
+
+def _entries():
+    return sorted(asset_cache.cache_dir().glob("*.pickle"))
+
+
+def test_convert_asset__reuses_conversion(source):
+    first = asset_cache.convert_asset(_convert, str(source), 2)
+    assert asset_cache.convert_asset(_convert, str(source), 2) == first
+    assert first == (b"pixelspixels", {"scale": 2})
+    assert len(CALLS) == 1
+
+    # Other parameters and contents are converted again
+    asset_cache.convert_asset(_convert, str(source), 3)
+    source.write_bytes(b"other")
+    assert asset_cache.convert_asset(_convert, str(source), 2)[0] == b"otherother"
+    assert len(CALLS) == 3
+    assert len(_entries()) == 3
+
+
+def test_convert_asset__esphome_upgrade_converts_again(source, monkeypatch):
+    asset_cache.convert_asset(_convert, str(source), 2)
+    monkeypatch.setattr(asset_cache, "__version__", "9999.1.0")
+
+    asset_cache.convert_asset(_convert, str(source), 2)
+
+    assert len(CALLS) == 2
+
+
+def test_convert_asset__same_contents_share_entry(source):
+    copy = source.with_name("copy.png")
+    copy.write_bytes(source.read_bytes())
+
+    asset_cache.convert_asset(_convert, str(source), 2)
+    asset_cache.convert_asset(_convert, str(copy), 2)
+
+    assert len(CALLS) == 1
+
+
+def test_convert_asset__disabled(source, monkeypatch):
+    monkeypatch.setenv(ENV_NO_ASSET_CACHE, "1")
+
+    asset_cache.convert_asset(_convert, str(source), 2)
+    asset_cache.convert_asset(_convert, str(source), 2)
+
+    assert len(CALLS) == 2
+    assert asset_cache.cache_dir() is None
+
+
+def test_convert_asset__evicts_least_recently_used(source, monkeypatch):
+    for index, scale in enumerate((1, 2, 3)):
+        asset_cache.convert_asset(_convert, str(source), scale)
+        # Converted long ago, in this order
+        (entry,) = set(_entries()) - {
+            entry for entry in _entries() if entry.stat().st_mtime_ns < 10**12
+        }
+        os.utime(entry, ns=(index, index))
+    size = max(entry.stat().st_size for entry in _entries())
+    # Using the oldest entry makes it the most recent one
+    asset_cache.convert_asset(_convert, str(source), 1)
+
+    monkeypatch.setattr(asset_cache, "ASSET_CACHE_SIZE", 3 * size)
+    asset_cache.convert_asset(_convert, str(source), 4)
+
+    assert len(_entries()) == 3
+    CALLS.clear()
+    for scale in (1, 3, 4, 2):
+        asset_cache.convert_asset(_convert, str(source), scale)
+    # Only the conversion with scale 2 was evicted
+    assert CALLS == [(str(source), 2)]
+
+
+def test_clean_assets(source):
+    asset_cache.convert_asset(_convert, str(source), 2)
+    assert asset_cache.cache_dir().is_dir()
+
+    asset_cache.clean_assets()
+
+    assert not asset_cache.cache_dir().exists()
+
+
+def test_prefetch_asset__converts_in_worker(source, monkeypatch):
+    monkeypatch.setattr(asset_cache, "_workers", lambda: 2)
+    try:
+        asset_cache.prefetch_asset(_convert, str(source), 2)
+        asset_cache.prefetch_asset(_convert, str(source), 3)
+
+        assert asset_cache.convert_asset(_convert, str(source), 3)[0] == b"pixels" * 3
+        assert asset_cache.convert_asset(_convert, str(source), 2)[0] == b"pixels" * 2
+    finally:
+        asset_cache.shutdown()
+
+    # Converted in the worker processes and cached
+    assert not CALLS
+    assert len(_entries()) == 2
+    asset_cache.prefetch_asset(_convert, str(source), 2)
+    assert not asset_cache._PENDING
@@ -0,0 +1,139 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from esphome import build_cache
+from esphome.const import ENV_ARTIFACT_CACHE, KEY_CORE, KEY_TARGET_PLATFORM
+from esphome.core import CORE
+from esphome.storage_json import StorageJSON, storage_path
+
+
+@pytest.fixture(autouse=True)
+def reset_core():
+    yield
+    CORE.reset()
+
+
+def _setup_build(config_dir: Path, name="device"):
+    CORE.reset()
+    CORE.config_path = str(config_dir / f"{name}.yaml")
+    CORE.build_path = str(config_dir / "build" / name)
+    CORE.name = name
+    StorageJSON.from_wizard(name, f"{name}.local", "ESP32").save(storage_path())
+    src = Path(CORE.relative_src_path())
+    src.mkdir(parents=True)
+    (src / "main.cpp").write_text("void setup() {}\n")
+    Path(CORE.relative_build_path("platformio.ini")).write_text("[env:device]\n")
+    return src
+
+
+def _compile(firmware=b"firmware"):
+    """Stands in for PlatformIO, returns the idedata of the build."""
+    env_dir = Path(CORE.relative_pioenvs_path(CORE.name))
+    env_dir.mkdir(parents=True, exist_ok=True)
+    (env_dir / "firmware.bin").write_bytes(firmware)
+    (env_dir / "firmware.elf").write_bytes(b"elf")
+    (env_dir / "partitions.bin").write_bytes(b"partitions")
+    return SimpleNamespace(
+        firmware_bin_path=str(env_dir / "firmware.bin"),
+        firmware_elf_path=str(env_dir / "firmware.elf"),
+        extra_flash_images=[
+            SimpleNamespace(path=str(env_dir / "partitions.bin"), offset="0x8000"),
+            SimpleNamespace(path="/framework/boot_app0.bin", offset="0xe000"),
+        ],
+    )
+
+
+def test_fingerprint__covers_build_inputs(tmp_path):
+    src = _setup_build(tmp_path)
+    first = build_cache.fingerprint()
+    assert build_cache.fingerprint() == first
+
+    (src / "esphome").mkdir()
+    (src / "esphome" / "component.h").write_text("#pragma once\n")
+    with_header = build_cache.fingerprint()
+    Path(CORE.relative_build_path("partitions.csv")).write_text("nvs, data\n")
+    with_partitions = build_cache.fingerprint()
+    # Build results don't change it
+    _compile()
+
+    assert len({first, with_header, with_partitions}) == 3
+    assert build_cache.fingerprint() == with_partitions
+
+
+def test_fingerprint__covers_platformio_packages(tmp_path, monkeypatch):
+    core_dir = tmp_path / "platformio"
+    monkeypatch.setenv("PLATFORMIO_CORE_DIR", str(core_dir))
+    _setup_build(tmp_path)
+    first = build_cache.fingerprint()
+
+    toolchain = core_dir / "packages" / "toolchain-xtensa"
+    toolchain.mkdir(parents=True)
+    (toolchain / "package.json").write_text('{"version": "2.100300.220621"}')
+    installed = build_cache.fingerprint()
+    (toolchain / "package.json").write_text('{"version": "2.100300.230110"}')
+    updated = build_cache.fingerprint()
+    # Not a manifest
+    (toolchain / "README").write_text("Toolchain\n")
+
+    assert len({first, installed, updated}) == 3
+    assert build_cache.fingerprint() == updated
+
+
+def test_restore_firmware__unchanged_build(tmp_path):
+    src = _setup_build(tmp_path)
+    fingerprint = build_cache.fingerprint()
+    assert not build_cache.restore_firmware(fingerprint)
+
+    build_cache.store_firmware(fingerprint, _compile())
+
+    storage = StorageJSON.load(storage_path())
+    assert storage.firmware_fingerprint == fingerprint
+    assert build_cache.restore_firmware(fingerprint)
+    # A changed source or firmware needs a compile
+    (src / "main.cpp").write_text("void setup() { App.setup(); }\n")
+    assert not build_cache.restore_firmware(build_cache.fingerprint())
+    Path(CORE.firmware_bin).write_bytes(b"other")
+    assert not build_cache.restore_firmware(fingerprint)
+
+
+def test_restore_firmware__keeps_record_on_config_update(tmp_path):
+    from esphome import writer
+
+    _setup_build(tmp_path)
+    CORE.config = {"esphome": {}}
+    CORE.data[KEY_CORE] = {KEY_TARGET_PLATFORM: "esp8266"}
+    writer.update_storage_json()
+    fingerprint = build_cache.fingerprint()
+    build_cache.store_firmware(fingerprint, _compile())
+    CORE.config = {"esphome": {"comment": "Changed"}}
+
+    writer.update_storage_json()
+
+    assert StorageJSON.load(storage_path()).comment == "Changed"
+    assert build_cache.restore_firmware(fingerprint)
+
+
+def test_restore_firmware__artifact_cache(tmp_path, monkeypatch):
+    store = tmp_path / "artifacts"
+    monkeypatch.setenv(ENV_ARTIFACT_CACHE, str(store))
+    _setup_build(tmp_path / "first")
+    fingerprint = build_cache.fingerprint()
+    build_cache.store_firmware(fingerprint, _compile(b"shared firmware"))
+
+    assert sorted(path.name for path in (store / fingerprint).iterdir()) == [
+        "firmware.bin",
+        "firmware.elf",
+        "partitions.bin",
+    ]
+    assert [path.name for path in store.iterdir()] == [fingerprint]
+
+    # The same sources in another build directory
+    _setup_build(tmp_path / "second")
+    assert build_cache.fingerprint() == fingerprint
+    assert build_cache.restore_firmware(fingerprint)
+
+    assert Path(CORE.firmware_bin).read_bytes() == b"shared firmware"
+    assert Path(CORE.relative_pioenvs_path("device", "partitions.bin")).is_file()
+    assert StorageJSON.load(storage_path()).firmware_fingerprint == fingerprint
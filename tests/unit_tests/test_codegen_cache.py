@@ -0,0 +1,125 @@
+import pytest
+
+from esphome import codegen_cache
+from esphome.__main__ import generate_cpp_contents
+from esphome.config import read_config
+from esphome.const import ENV_NO_CODEGEN_CACHE
+from esphome.core import CORE
+
+CONFIG = """
+esphome:
+  name: codegen
+esp8266:
+  board: d1_mini
+binary_sensor:
+  - platform: gpio
+    pin: D1
+    name: Button
+sensor:
+  - platform: template
+    id: source
+    name: Source
+    filters:
+      - multiply: {factor}
+  - platform: copy
+    source_id: source
+    name: Copy
+  - platform: uptime
+    name: Uptime
+"""
+
+
+def _generate(path, factor):
+    path.write_text(CONFIG.format(factor=factor))
+    return _generate_file(path)
+
+
+def _generate_file(path):
+    CORE.reset()
+    CORE.config_path = str(path)
+    CORE.config = read_config({})
+    generate_cpp_contents(CORE.config)
+    return (
+        CORE.cpp_global_section,
+        CORE.cpp_main_section,
+        sorted(define.as_macro for define in CORE.defines),
+        sorted(CORE.build_flags),
+        [str(lib) for lib in CORE.libraries],
+        CORE.platformio_options,
+    )
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    yield tmp_path / "codegen.yaml"
+    CORE.reset()
+
+
+@pytest.fixture
+def load_spy(mocker):
+    return mocker.spy(codegen_cache.CodegenCache, "load")
+
+
+def test_replays_unchanged_components(config_file, load_spy):
+    first = _generate(config_file, 2.0)
+    assert load_spy.spy_return.reused == 0
+    assert (config_file.parent / ".esphome" / "codegen_cache").is_dir()
+
+    assert _generate(config_file, 2.0) == first
+    cache = load_spy.spy_return
+    # The esp8266 platform and gpio pins change CORE.data and always run
+    assert 0 < cache.reused < cache.total
+
+
+SCRIPT_CONFIG = """
+esphome:
+  name: codegen
+esp8266:
+  board: d1_mini
+script:
+  - id: my_script
+    parameters:
+      x: {type}
+    then:
+      - logger.log: "Script"
+sensor:
+  - platform: template
+    name: Source
+    on_value:
+      - script.execute:
+          id: my_script
+          x: !lambda "return x;"
+logger:
+"""
+
+
+def test_changed_config_matches_full_generation(config_file, load_spy, monkeypatch):
+    # The sensor automation reads the parameters of the script from CORE.config
+    config_file.write_text(SCRIPT_CONFIG.format(type="int"))
+    # The fingerprinted modules change until the generation imported all of them
+    for _ in range(3):
+        _generate_file(config_file)
+    assert load_spy.spy_return.reused > 0
+    config_file.write_text(SCRIPT_CONFIG.format(type="float"))
+    cached = _generate_file(config_file)
+    assert "Script<float>" in cached[1]
+    # Only the script and the sensors executing it run again, besides the components
+    # changing CORE.data
+    assert load_spy.spy_return.reused == 2
+
+    monkeypatch.setenv(ENV_NO_CODEGEN_CACHE, "1")
+    assert _generate_file(config_file) == cached
+    assert load_spy.spy_return.path is None
+
+
+def test_moved_lambda_matches_full_generation(config_file, load_spy, monkeypatch):
+    config_file.write_text(SCRIPT_CONFIG.format(type="int"))
+    for _ in range(3):
+        _generate_file(config_file)
+    # The lambda moves one line down
+    config_file.write_text("# Comment\n" + SCRIPT_CONFIG.format(type="int"))
+    cached = _generate_file(config_file)
+    assert f'#line 19 "{config_file}"' in cached[1]
+
+    monkeypatch.setenv(ENV_NO_CODEGEN_CACHE, "1")
+    assert _generate_file(config_file) == cached
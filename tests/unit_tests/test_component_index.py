@@ -0,0 +1,137 @@
+import sys
+
+import pytest
+
+from esphome import component_index, config, loader
+from esphome.core import CORE
+
+CUSTOM_COMPONENT = """\
+import esphome.config_validation as cv
+
+DEPENDENCIES = ["wifi"]
+AUTO_LOAD = ["json"]
+MULTI_CONF = 2
+
+CONFIG_SCHEMA = cv.Schema({})
+"""
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    (
+        (
+            "import esphome.config_validation as cv\n"
+            "DEPENDENCIES = ['i2c']\n"
+            "CONFLICTS_WITH: list[str] = ['other']\n"
+            "IS_PLATFORM_COMPONENT = True\n"
+            "CODEOWNERS = ['@esphome/core']\n"
+            "CONFIG_SCHEMA = cv.Schema({})\n",
+            {
+                "DEPENDENCIES": ["i2c"],
+                "CONFLICTS_WITH": ["other"],
+                "AUTO_LOAD": [],
+                "CODEOWNERS": ["@esphome/core"],
+                "MULTI_CONF": False,
+                "IS_PLATFORM_COMPONENT": True,
+                "CONFIG_SCHEMA": True,
+            },
+        ),
+        (
+            "from .schema import CONFIG_SCHEMA\nMULTI_CONF = 3\n",
+            {
+                "DEPENDENCIES": [],
+                "CONFLICTS_WITH": [],
+                "AUTO_LOAD": [],
+                "CODEOWNERS": [],
+                "MULTI_CONF": 3,
+                "IS_PLATFORM_COMPONENT": False,
+                "CONFIG_SCHEMA": True,
+            },
+        ),
+        ("AUTO_LOAD = ['a'] + OTHER\n", None),
+        ("def AUTO_LOAD():\n    return ['a']\n", None),
+        ("DEPENDENCIES = []\nDEPENDENCIES += ['a']\n", None),
+        ("if FOO:\n    DEPENDENCIES = ['a']\n", None),
+        ("try:\n    CONFIG_SCHEMA = 1\nexcept ImportError:\n    pass\n", None),
+        ("from .base import *\n", None),
+        ("DEPENDENCIES = [\n", None),
+    ),
+)
+def test_read_metadata(source, expected):
+    assert component_index.read_metadata(source) == expected
+
+
+def test_index_updates_changed_files(tmp_path):
+    component = tmp_path / "component.py"
+    component.write_text("DEPENDENCIES = ['a']\n")
+    index_path = tmp_path / "index.json"
+
+    index = component_index.ComponentIndex(index_path)
+    assert index.get(component)["DEPENDENCIES"] == ["a"]
+    index.save()
+
+    component.write_text("DEPENDENCIES = ['a', 'b']\n")
+    index = component_index.ComponentIndex(index_path)
+    assert index.get(component)["DEPENDENCIES"] == ["a", "b"]
+
+
+@pytest.fixture
+def custom_component(tmp_path, monkeypatch):
+    components = tmp_path / "custom_components" / "index_test"
+    components.mkdir(parents=True)
+    (components / "__init__.py").write_text(CUSTOM_COMPONENT)
+    monkeypatch.setattr(loader, "_COMPONENT_CACHE", dict(loader._COMPONENT_CACHE))
+    monkeypatch.setattr(loader, "_COMPONENT_INDEXES", {})
+    monkeypatch.setattr(loader, "_PENDING_IMPORTS", [])
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    monkeypatch.setattr(CORE, "config_path", str(tmp_path / "test.yaml"))
+    loader.install_custom_components_meta_finder()
+    yield "esphome.components.index_test"
+    sys.modules.pop("esphome.components.index_test", None)
+
+
+def test_custom_component_metadata_without_import(custom_component, tmp_path):
+    manifest = loader.get_component("index_test")
+
+    assert manifest.dependencies == ["wifi"]
+    assert manifest.auto_load == ["json"]
+    assert manifest.multi_conf == 2
+    assert manifest.has_config_schema
+    assert custom_component not in sys.modules
+
+    loader.import_components()
+    assert custom_component in sys.modules
+    assert manifest.config_schema is not None
+    assert not loader.is_core_component(manifest)
+
+    loader.save_component_index()
+    assert (tmp_path / ".esphome" / "component_index.json").is_file()
+
+
+BROKEN_COMPONENT = """\
+import missing_module
+import esphome.config_validation as cv
+
+CONFIG_SCHEMA = cv.Schema({})
+"""
+
+
+def test_broken_component_error_at_its_path(custom_component, tmp_path):
+    broken = tmp_path / "custom_components" / "brokencomp"
+    broken.mkdir()
+    (broken / "__init__.py").write_text(BROKEN_COMPONENT)
+    CORE.config_path = str(tmp_path / "test.yaml")
+    (tmp_path / "test.yaml").write_text(
+        "esphome:\n  name: test\n\nesp8266:\n  board: d1_mini\n\n"
+        "brokencomp:\n\nlogger:\n"
+    )
+    try:
+        result = config.load_config({})
+    finally:
+        CORE.reset()
+
+    assert [(err.msg, err.path) for err in result.errors] == [
+        ("Component not found: brokencomp", ["brokencomp"])
+    ]
+    assert result["logger"]["baud_rate"] == 115200
+    assert "brokencomp" not in loader._COMPONENT_CACHE
@@ -0,0 +1,162 @@
+import pytest
+
+from esphome import config, yaml_util
+from esphome.core import CORE
+
+BASE_CONFIG = """\
+esphome:
+  name: test
+
+esp8266:
+  board: d1_mini
+
+logger:
+
+sensor:
+  - platform: template
+    id: sensor_a
+    lambda: return id(sensor_b).state;
+  - platform: template
+    id: sensor_b
+    update_interval: {interval}
+
+binary_sensor:
+  - platform: template
+    name: {binary_name}
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "test.yaml"
+    monkeypatch.setattr(CORE, "config_path", str(path))
+    yield path
+    CORE.reset()
+
+
+def _validate(path, content, schema_cache=None):
+    path.write_text(content)
+    CORE.reset()
+    CORE.config_path = str(path)
+    result = config.load_config({}, schema_cache)
+    errors = [(err.path, str(err)) for err in result.errors]
+    return errors, yaml_util.dump(config.strip_default_ids(config.OrderedDict(result)))
+
+
+@pytest.mark.parametrize(
+    "interval, binary_name",
+    (
+        ("30s", "Binary"),
+        ("not_a_time", "Binary"),
+        ("30s", "[1, 2]"),
+    ),
+)
+def test_schema_cache_matches_full_validation(config_file, interval, binary_name):
+    schema_cache = config.SchemaValidationCache()
+    _validate(
+        config_file, BASE_CONFIG.format(interval="60s", binary_name="A"), schema_cache
+    )
+
+    changed = BASE_CONFIG.format(interval=interval, binary_name=binary_name)
+    cached = _validate(config_file, changed, schema_cache)
+    full = _validate(config_file, changed)
+
+    assert cached == full
+
+
+def test_schema_cache_reuses_unchanged_fragments(config_file, mocker):
+    schema_cache = config.SchemaValidationCache()
+    _validate(
+        config_file, BASE_CONFIG.format(interval="60s", binary_name="A"), schema_cache
+    )
+
+    spy = mocker.spy(schema_cache, "set")
+    _validate(
+        config_file, BASE_CONFIG.format(interval="30s", binary_name="A"), schema_cache
+    )
+
+    # Only the changed sensor is validated again
+    assert [call.args[0][0] for call in spy.call_args_list] == [("sensor", 1)]
+
+
+ID_CONFIG = """\
+esphome:
+  name: test
+
+esp8266:
+  board: d1_mini
+{extra}
+sensor:
+  - platform: template
+    name: First
+  - platform: template
+    id: template__templatesensor_2
+  - platform: template
+    name: Third
+{sensors}
+"""
+
+I2C_BUS = "  - scl: {scl}\n    sda: {sda}\n"
+
+AHT10 = "  - platform: aht10\n    temperature:\n      name: Temperature\n"
+
+
+def test_id_pass_resolves_auto_ids(config_file):
+    extra = "i2c:\n" + I2C_BUS.format(scl=4, sda=5)
+    config_file.write_text(ID_CONFIG.format(extra=extra, sensors=AHT10))
+    result = config.load_config({})
+
+    assert not result.errors
+    ids = [conf["id"] for conf in result["sensor"]]
+    assert [id.id for id in ids] == [
+        "template__templatesensor",
+        "template__templatesensor_2",
+        "template__templatesensor_3",
+        "aht10_aht10component",
+    ]
+    assert [id.is_manual for id in ids] == [False, True, False, False]
+    assert {id.id for id in ids} <= CORE.component_ids
+    # The i2c bus of the sensor is found by its type
+    assert result["sensor"][3]["i2c_id"].id == result["i2c"][0]["id"].id
+
+
+@pytest.mark.parametrize(
+    "extra, sensors, error",
+    (
+        (
+            "",
+            "  - platform: template\n    id: template__templatesensor_2\n",
+            "ID template__templatesensor_2 redefined! Check sensor->1->id",
+        ),
+        (
+            "",
+            "  - platform: copy\n    source_id: template__templatesensor_3\n    name: Copy\n",
+            "Couldn't find ID 'template__templatesensor_3'. Please check you have "
+            "defined an ID with that name in your configuration. These IDs look "
+            'similar: "template__templatesensor_2".',
+        ),
+        (
+            "binary_sensor:\n"
+            "  - platform: copy\n    source_id: template__templatesensor_2\n    name: Copy\n",
+            "",
+            "ID 'template__templatesensor_2' of type template_::TemplateSensor doesn't "
+            "inherit from binary_sensor::BinarySensor. Please double check your ID is "
+            "pointing to the correct value",
+        ),
+        (
+            "i2c:\n"
+            + I2C_BUS.format(scl=4, sda=5)
+            + "    id: bus_a\n"
+            + I2C_BUS.format(scl=12, sda=13)
+            + "    id: bus_b\n",
+            AHT10,
+            "Too many candidates found for 'i2c_id' type 'i2c::I2CBus' Some are "
+            "'bus_a', 'bus_b'",
+        ),
+    ),
+)
+def test_id_pass_errors(config_file, extra, sensors, error):
+    config_file.write_text(ID_CONFIG.format(extra=extra, sensors=sensors))
+    result = config.load_config({})
+
+    assert [err.msg for err in result.errors] == [error]
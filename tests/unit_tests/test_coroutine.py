@@ -0,0 +1,94 @@
+import pytest
+
+from esphome import core
+from esphome.coroutine import coroutine_with_priority
+
+
+@pytest.fixture
+def target():
+    return core.EsphomeCore()
+
+
+def test_flush_tasks__wakes_waiting_tasks(target):
+    count = 3000
+    order = []
+
+    async def declare(index):
+        if index + 1 < count:
+            await target.get_variable(core.ID(f"var_{index + 1}"))
+        target.register_variable(core.ID(f"var_{index}", is_declaration=True), index)
+        order.append(index)
+
+    # Every task waits for the one added after it
+    for index in range(count):
+        target.add_job(declare, index)
+    target.flush_tasks()
+
+    assert order == list(reversed(range(count)))
+    assert not target.event_loop._parked_tasks
+
+
+def test_flush_tasks__woken_tasks_keep_priority(target):
+    order = []
+
+    @coroutine_with_priority(10.0)
+    async def waiting():
+        await target.get_variable(core.ID("provided"))
+        order.append("waiting")
+
+    @coroutine_with_priority(5.0)
+    async def provider():
+        target.register_variable(core.ID("provided", is_declaration=True), None)
+        order.append("provider")
+
+    @coroutine_with_priority(1.0)
+    async def low():
+        order.append("low")
+
+    target.add_job(low)
+    target.add_job(provider)
+    target.add_job(waiting)
+    target.flush_tasks()
+
+    assert order == ["provider", "waiting", "low"]
+
+
+def test_flush_tasks__reports_cycle(target):
+    async def declare(config, depends_on):
+        await target.get_variable(core.ID(depends_on))
+        target.register_variable(config["id"], None)
+
+    for name, depends_on in (("a", "b"), ("b", "c"), ("c", "a"), ("d", "a")):
+        target.add_job(declare, {"id": core.ID(name, is_declaration=True)}, depends_on)
+
+    with pytest.raises(core.EsphomeError, match="between IDs: b -> c -> a -> b"):
+        target.flush_tasks()
+
+
+def test_flush_tasks__reports_missing_variable(target):
+    async def waiting():
+        await target.get_variable(core.ID("missing"))
+
+    target.add_job(waiting)
+
+    with pytest.raises(core.EsphomeError, match="waiting waits for missing"):
+        target.flush_tasks()
+
+
+def test_flush_tasks__statements_keep_domain(target):
+    from esphome.cpp_generator import RawStatement
+
+    async def helper():
+        target.add(RawStatement("helper();"))
+
+    async def to_code():
+        target.add(RawStatement("sensor();"))
+        target.add_job(helper)
+
+    to_code.codegen_domain = "sensor"
+    target.add_job(to_code)
+    target.add(RawStatement("core();"))
+    target.flush_tasks()
+
+    # Jobs added by a component belong to its domain
+    assert target.main_statement_domains == [None, "sensor", "sensor"]
@@ -131,6 +131,23 @@ class TestArrayInitializer:
         assert actual == "{\n  1,\n  2,\n  3,\n  4,\n}"
 
 
+class TestByteArrayInitializer:
+    def test_str__empty(self):
+        target = cg.ByteArrayInitializer(b"")
+
+        actual = str(target)
+
+        assert actual == "{}"
+
+    def test_str__matches_hex_ints(self):
+        data = bytes(range(256))
+        target = cg.ByteArrayInitializer(bytearray(data))
+
+        actual = str(target)
+
+        assert actual == str(cg.ArrayInitializer(*(cg.HexInt(x) for x in data)))
+
+
 class TestParameterListExpression:
     def test_str(self):
         target = cg.ParameterListExpression(
@@ -226,6 +243,8 @@ FAKE_ENUM_VALUE.enum_value = "foo"
         (cg.TimePeriodMinutes(minutes=42), cg.IntLiteral),
         ((1, 2, 3), cg.ArrayInitializer),
         ([1, 2, 3], cg.ArrayInitializer),
+        (b"\x01\x02", cg.ByteArrayInitializer),
+        (bytearray(3), cg.ByteArrayInitializer),
     ),
 )
 def test_safe_exp__allowed_values(obj, expected_type):
@@ -0,0 +1,160 @@
+import argparse
+import os
+import threading
+
+import pytest
+
+from esphome import daemon, yaml_util
+from esphome.core import CORE, EsphomeError
+
+
+def _args(**kwargs):
+    defaults = {
+        "command": "config",
+        "substitution": None,
+        "verbose": False,
+        "quiet": False,
+        "dashboard": False,
+    }
+    defaults.update(kwargs)
+    return argparse.Namespace(**defaults)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "run" / "daemon.sock")
+
+
+@pytest.fixture
+def server(socket_path):
+    calls = []
+
+    def command_config(args, config):
+        calls.append((CORE.config_path, dict(config)))
+        print("validated")
+        return 0
+
+    server = daemon.create_server(socket_path, {"config": command_config})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield calls
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.mark.skipif(not daemon.is_supported(), reason="requires unix sockets")
+def test_daemon_runs_config(server, socket_path, tmp_path, capsys, mocker):
+    conf = tmp_path / "test.yaml"
+    conf.write_text("esphome:\n  name: test\n\nesp8266:\n  board: d1_mini\n")
+    load_yaml = mocker.spy(yaml_util, "load_yaml")
+
+    client = daemon.DaemonClient.connect(socket_path)
+    assert client is not None
+    with client:
+        assert client.run(_args(), str(conf)) == 0
+        # Validates the YAML it checked
+        assert load_yaml.call_count == 1
+        assert client.run(_args(), str(tmp_path / "missing.yaml")) == 2
+
+    assert [path for path, _ in server] == [str(conf)]
+    assert server[0][1]["esphome"]["name"] == "test"
+    out, err = capsys.readouterr()
+    assert "validated" in out
+    assert "missing.yaml" in err
+    assert CORE.config_path is None
+
+
+@pytest.mark.skipif(not daemon.is_supported(), reason="requires unix sockets")
+def test_daemon_skips_custom_components(server, socket_path, tmp_path):
+    conf = tmp_path / "test.yaml"
+    conf.write_text("esphome:\n  name: test\n")
+    (tmp_path / "custom_components").mkdir()
+
+    client = daemon.DaemonClient.connect(socket_path)
+    try:
+        assert client.run(_args(), str(conf)) is None
+    finally:
+        client.close()
+    assert server == []
+
+
+def test_connect_without_daemon(socket_path):
+    assert daemon.DaemonClient.connect(socket_path) is None
+
+
+@pytest.mark.skipif(not daemon.is_supported(), reason="requires unix sockets")
+def test_daemon_socket_is_private(server, socket_path, monkeypatch):
+    assert os.stat(os.path.dirname(socket_path)).st_mode & 0o777 == 0o700
+
+    uid = os.getuid()
+    monkeypatch.setattr(daemon.os, "getuid", lambda: uid + 1)
+    assert daemon.DaemonClient.connect(socket_path) is None
+
+
+def test_daemon_socket_path(monkeypatch, tmp_path):
+    monkeypatch.delenv("ESPHOME_DAEMON_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert daemon.daemon_socket_path() == str(tmp_path / "esphome" / "daemon.sock")
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert daemon.daemon_socket_path() == str(tmp_path / ".esphome" / "daemon.sock")
+
+
+def test_create_server_in_shared_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+
+    with pytest.raises(EsphomeError, match="only be accessible"):
+        daemon.create_server(str(shared / "daemon.sock"), {})
+
+
+@pytest.mark.skipif(not daemon.is_supported(), reason="requires unix sockets")
+def test_daemon_sends_only_needed_env(server, socket_path, tmp_path, monkeypatch):
+    conf = tmp_path / "test.yaml"
+    conf.write_text(
+        "esphome:\n  name: !env_var DEVICE_NAME\n\nesp8266:\n  board: d1_mini\n"
+    )
+    monkeypatch.setenv("DEVICE_NAME", "from-env")
+    monkeypatch.setenv("API_TOKEN", "secret")
+    requests = []
+    handle_request = daemon.handle_request
+
+    def record_request(request, actions):
+        requests.append(dict(request["env"]))
+        return handle_request(request, actions)
+
+    monkeypatch.setattr(daemon, "handle_request", record_request)
+    client = daemon.DaemonClient.connect(socket_path)
+    try:
+        assert client.run(_args(), str(conf)) == 0
+    finally:
+        client.close()
+
+    assert server[0][1]["esphome"]["name"] == "from-env"
+    assert "DEVICE_NAME" not in requests[0]
+    assert requests[1]["DEVICE_NAME"] == "from-env"
+    assert all("API_TOKEN" not in env for env in requests)
+
+
+@pytest.mark.skipif(not daemon.is_supported(), reason="requires unix sockets")
+def test_daemon_skips_external_components_before_validating(
+    server, socket_path, tmp_path, monkeypatch
+):
+    conf = tmp_path / "test.yaml"
+    conf.write_text(
+        "esphome:\n  name: test\n\nexternal_components:\n  - source: missing\n"
+    )
+
+    def read_config(*args):
+        raise AssertionError("Validated")
+
+    monkeypatch.setattr("esphome.config.read_config", read_config)
+    client = daemon.DaemonClient.connect(socket_path)
+    try:
+        assert client.run(_args(), str(conf)) is None
+    finally:
+        client.close()
+    assert server == []
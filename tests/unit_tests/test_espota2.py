@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import io
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from esphome import espota2
+
+# Upload of 4MB to the fake device over loopback with the default chunk and send
+# buffer sizes, about 0.4s on a current machine. Chunks smaller than the send buffer
+# stall on delayed acknowledgements and take about 10s.
+THROUGHPUT_BUDGET_S = 2.0
+
+
+class FakeDevice(threading.Thread):
+    """Receives one upload over the OTA protocol of the devices, on localhost."""
+
+    def __init__(self, compression=True, password=None):
+        super().__init__(daemon=True)
+        self.compression = compression
+        self.password = password
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.payload = None
+        self.md5 = None
+        self.error = None
+
+    def _recv(self, conn, amount):
+        data = bytearray(amount)
+        view = memoryview(data)
+        while view:
+            received = conn.recv_into(view)
+            if not received:
+                raise ConnectionError("Connection closed")
+            view = view[received:]
+        return bytes(data)
+
+    def _receive(self, conn):
+        assert list(self._recv(conn, 5)) == espota2.MAGIC_BYTES
+        conn.sendall(bytes([espota2.RESPONSE_OK, espota2.OTA_VERSION_1_0]))
+        features = self._recv(conn, 1)[0]
+        if self.compression and features & espota2.FEATURE_SUPPORTS_COMPRESSION:
+            conn.sendall(bytes([espota2.RESPONSE_SUPPORTS_COMPRESSION]))
+        else:
+            conn.sendall(bytes([espota2.RESPONSE_HEADER_OK]))
+
+        if self.password is None:
+            conn.sendall(bytes([espota2.RESPONSE_AUTH_OK]))
+        else:
+            nonce = "0" * 32
+            conn.sendall(bytes([espota2.RESPONSE_REQUEST_AUTH]) + nonce.encode())
+            cnonce = self._recv(conn, 32).decode()
+            expected = hashlib.md5(
+                (self.password + nonce + cnonce).encode()
+            ).hexdigest()
+            if self._recv(conn, 32).decode() != expected:
+                conn.sendall(bytes([espota2.RESPONSE_ERROR_AUTH_INVALID]))
+                return
+            conn.sendall(bytes([espota2.RESPONSE_AUTH_OK]))
+
+        size = int.from_bytes(self._recv(conn, 4), "big")
+        conn.sendall(bytes([espota2.RESPONSE_UPDATE_PREPARE_OK]))
+        self.md5 = self._recv(conn, 32).decode()
+        conn.sendall(bytes([espota2.RESPONSE_BIN_MD5_OK]))
+        self.payload = self._recv(conn, size)
+        if hashlib.md5(self.payload).hexdigest() != self.md5:
+            conn.sendall(bytes([espota2.RESPONSE_ERROR_MD5_MISMATCH]))
+            return
+        conn.sendall(bytes([espota2.RESPONSE_RECEIVE_OK]))
+        conn.sendall(bytes([espota2.RESPONSE_UPDATE_END_OK]))
+        assert self._recv(conn, 1)[0] == espota2.RESPONSE_OK
+
+    def run(self):
+        try:
+            conn, _ = self.server.accept()
+            with conn:
+                self._receive(conn)
+        except Exception as err:  # pylint: disable=broad-except
+            self.error = err
+        finally:
+            self.server.close()
+
+    def firmware(self):
+        if self.compression:
+            return gzip.decompress(self.payload)
+        return self.payload
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(espota2.time, "sleep", lambda _: None)
+
+
+def _upload(device, firmware, password=None, **kwargs):
+    device.start()
+    sock = socket.create_connection(("127.0.0.1", device.port), timeout=10.0)
+    try:
+        espota2.perform_ota(
+            sock, password, io.BytesIO(firmware), "firmware.bin", **kwargs
+        )
+    finally:
+        sock.close()
+        device.join(10.0)
+    assert device.error is None
+
+
+@pytest.mark.parametrize("compression", [True, False])
+def test_perform_ota(compression):
+    firmware = os.urandom(20000) + bytes(30000)
+    device = FakeDevice(compression=compression)
+
+    _upload(device, firmware, chunk_size=1000, send_buffer_size=4096)
+
+    assert device.firmware() == firmware
+    assert device.md5 == hashlib.md5(device.payload).hexdigest()
+    assert len(device.payload) < len(firmware) or not compression
+
+
+def test_perform_ota__password():
+    device = FakeDevice(password="secret")
+
+    _upload(device, b"firmware" * 100, password="secret")
+
+    assert device.firmware() == b"firmware" * 100
+
+
+def test_perform_ota__wrong_password():
+    device = FakeDevice(password="secret")
+    device.start()
+    sock = socket.create_connection(("127.0.0.1", device.port), timeout=10.0)
+
+    with pytest.raises(espota2.OTAError, match="Authentication invalid"):
+        espota2.perform_ota(sock, "wrong", io.BytesIO(b"firmware"), "firmware.bin")
+    device.join(10.0)
+
+
+def test_prepare_payload__single_pass():
+    firmware = bytes(range(256)) * 1000
+    reads = []
+
+    class Reader(io.BytesIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    payload, md5 = espota2.prepare_payload(Reader(firmware), True, chunk_size=4096)
+
+    assert gzip.decompress(payload) == firmware
+    assert md5 == hashlib.md5(payload).hexdigest()
+    # Read in chunks, each once
+    assert reads == [4096] * (len(firmware) // 4096 + 2)
+
+
+def test_perform_ota__throughput():
+    firmware = os.urandom(4 * 1024 * 1024)
+    device = FakeDevice(compression=False)
+
+    start = time.perf_counter()
+    _upload(device, firmware)
+    duration = time.perf_counter() - start
+
+    assert device.firmware() == firmware
+    assert duration < THROUGHPUT_BUDGET_S
+
+
+def test_perform_ota__compressed_payload(monkeypatch):
+    firmware = b"firmware" * 1000
+    compressed = espota2.prepare_payload(io.BytesIO(firmware), True)
+    device = FakeDevice()
+
+    def prepare_payload(*args):
+        raise AssertionError("Compressed again")
+
+    monkeypatch.setattr(espota2, "prepare_payload", prepare_payload)
+    _upload(device, firmware, compressed_payload=compressed)
+
+    assert device.payload == compressed[0]
+    assert device.md5 == compressed[1]
+    assert device.firmware() == firmware
+
+
+def test_perform_ota__compressed_payload_without_compression():
+    device = FakeDevice(compression=False)
+    compressed = espota2.prepare_payload(io.BytesIO(b"firmware"), True)
+
+    _upload(device, b"firmware", compressed_payload=compressed)
+
+    assert device.payload == b"firmware"
@@ -0,0 +1,135 @@
+import json
+import os
+from pathlib import Path
+import time
+
+import pytest
+
+from esphome import __main__ as esphome_main, fleet
+from esphome.util import ANSI_ESCAPE
+
+
+def _fake_job(args, conf_path):
+    """Stands in for running the esphome command in a worker process."""
+    name = Path(conf_path).stem
+    with open(args.events, "a") as f_handle:
+        f_handle.write(f"start {args.command} {name}\n")
+    rc = 0
+    if args.command == "config":
+        Path(args.validated_config).write_text(name)
+        with open(f"{args.events}.validated", "a") as f_handle:
+            f_handle.write(f"{args.validated_config}\n")
+    elif Path(args.validated_config).read_text() != name:
+        # Not the configuration validated for this device
+        rc = 3
+    if args.command == "compile":
+        time.sleep(0.2)
+    elif args.command == "config" and name == "invalid":
+        rc = 2
+    elif args.command == "upload" and name == "offline":
+        rc = 1
+    elif args.command == "upload" and name == "flaky":
+        # Online from the third attempt
+        rc = int(_events(args.events).count("start upload flaky") < 3)
+    with open(args.events, "a") as f_handle:
+        f_handle.write(f"end {args.command} {name}\n")
+    return rc, f"{args.command} {name} output\n"
+
+
+def _events(path):
+    return Path(path).read_text().splitlines()
+
+
+@pytest.fixture
+def fleet_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(fleet, "UPLOAD_RETRY_DELAY", 0.01)
+    devices = tmp_path / "devices"
+    devices.mkdir()
+    return devices
+
+
+def _args(fleet_dir, *options):
+    args = esphome_main.parse_args(["esphome", "update-all", str(fleet_dir), *options])
+    args.events = str(fleet_dir.parent / "events.txt")
+    return args
+
+
+def test_update_all__uploads_while_compiling(fleet_dir, capsys):
+    paths = [str(fleet_dir / f"{name}.yaml") for name in ("first", "second")]
+    args = _args(fleet_dir, "--max-compile-jobs", "1")
+
+    failed = fleet.update_all(args, paths, _fake_job)
+
+    assert failed == 0
+    events = _events(args.events)
+    for name in ("first", "second"):
+        commands = [
+            event.split()[1]
+            for event in events
+            if event.startswith("start ") and event.endswith(f" {name}")
+        ]
+        assert commands == ["config", "compile", "upload"]
+    # Compiles one at a time, in the order the configurations were validated. The
+    # first compiled device uploads during the second compile.
+    compiled = [
+        event.split()[2] for event in events if event.startswith("start compile")
+    ]
+    first, second = compiled
+    assert events.index(f"start compile {second}") > events.index(
+        f"end compile {first}"
+    )
+    assert events.index(f"start upload {first}") < events.index(f"end compile {second}")
+    # Each device has its own validated configuration, removed afterwards
+    validated = _events(f"{args.events}.validated")
+    assert len(set(validated)) == 2
+    assert not any(os.path.exists(path) for path in validated)
+    out = ANSI_ESCAPE.sub("", capsys.readouterr().out)
+    assert out.count(") SUCCESS ") == 2
+    assert "(2/2) SUCCESS " in out
+    # The output of successful commands is not shown
+    assert "compile first output" not in out
+
+
+def test_update_all__retries_uploads(fleet_dir, capsys):
+    paths = [
+        str(fleet_dir / f"{name}.yaml") for name in ("flaky", "offline", "invalid")
+    ]
+    summary_path = fleet_dir.parent / "summary.json"
+    args = _args(fleet_dir, "--summary-json", str(summary_path))
+
+    failed = fleet.update_all(args, paths, _fake_job)
+
+    assert failed == 2
+    events = _events(args.events)
+    assert events.count("start upload flaky") == 3
+    assert events.count("start upload offline") == fleet.UPLOAD_ATTEMPTS
+    assert "start compile invalid" not in events
+
+    summary = json.loads(summary_path.read_text())
+    assert (summary["succeeded"], summary["failed"]) == (1, 2)
+    devices = {Path(d["configuration"]).stem: d for d in summary["devices"]}
+    assert devices["flaky"]["success"] is True
+    assert devices["flaky"]["stage"] == "done"
+    assert devices["flaky"]["upload_attempts"] == 3
+    assert set(devices["flaky"]["durations"]) == {"validate", "compile", "upload"}
+    assert devices["offline"]["success"] is False
+    assert devices["offline"]["stage"] == "upload"
+    assert devices["invalid"]["stage"] == "validate"
+    assert devices["invalid"]["upload_attempts"] == 0
+
+    out = ANSI_ESCAPE.sub("", capsys.readouterr().out)
+    assert "UPLOAD FAILED, RETRYING IN" in out
+    assert f"{paths[1]}: FAILED (upload)" in out
+    assert f"{paths[2]}: FAILED (validate)" in out
+    # The output of the failed command is shown
+    assert "config invalid output" in out
+
+
+def test_update_all__knobs_parsed_like_jobs(fleet_dir, monkeypatch, capsys):
+    monkeypatch.setattr(esphome_main.os, "cpu_count", lambda: 3)
+    args = _args(fleet_dir, "--max-compile-jobs", "0", "--max-uploads", "2")
+    assert (args.max_compile_jobs, args.max_uploads) == (3, 2)
+
+    with pytest.raises(SystemExit):
+        _args(fleet_dir, "--max-uploads", "-1")
+    assert "invalid number of jobs" in capsys.readouterr().err
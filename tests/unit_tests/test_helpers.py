@@ -1,3 +1,6 @@
+import shutil
+import sys
+
 import pytest
 
 from hypothesis import given
@@ -229,3 +232,26 @@ def test_file_compare(fixture_path, file1, file2, expected):
     actual = helpers.file_compare(path1, path2)
 
     assert actual == expected
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+@pytest.mark.parametrize("reflink", (True, False), ids=("reflink", "copy"))
+def test_reflink_or_copy_file(tmp_path, mocker, reflink):
+    ioctl = mocker.patch("fcntl.ioctl")
+    if not reflink:
+        ioctl.side_effect = OSError("Not supported")
+    copyfile = mocker.spy(shutil, "copyfile")
+    src = tmp_path / "src.h"
+    src.write_text("source")
+    dst = tmp_path / "build" / "dst.h"
+    dst.parent.mkdir()
+    dst.write_text("old")
+
+    helpers.reflink_or_copy_file(src, dst)
+
+    assert ioctl.call_args[0][1] == helpers.FICLONE
+    assert copyfile.call_count == (0 if reflink else 1)
+    assert [path.name for path in dst.parent.iterdir()] == ["dst.h"]
+    if not reflink:
+        assert dst.read_text() == "source"
+        assert not dst.samefile(src)
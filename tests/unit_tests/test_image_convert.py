@@ -0,0 +1,160 @@
+import random
+import tracemalloc
+
+import pytest
+from PIL import Image
+
+from esphome.components.image import convert
+from esphome.core import EsphomeError
+
+
+def _reference(frame, image_type):
+    """The per-pixel loops image and animation used before."""
+    width, height = frame.size
+    if image_type == "GRAYSCALE":
+        return bytes(frame.getdata())
+    if image_type == "RGB24":
+        return bytes(value for pix in frame.getdata() for value in pix)
+    if image_type == "RGB565":
+        data = bytearray()
+        for pix in frame.getdata():
+            rgb = (pix[0] >> 3) << 11 | (pix[1] >> 2) << 5 | pix[2] >> 3
+            data += bytes([rgb >> 8, rgb & 255])
+        return bytes(data)
+    width8 = ((width + 7) // 8) * 8
+    data = bytearray(height * width8 // 8)
+    for y in range(height):
+        for x in range(width):
+            if image_type == "BINARY" and frame.getpixel((x, y)):
+                continue
+            if image_type == "TRANSPARENT_BINARY" and not frame.getpixel((x, y))[3]:
+                continue
+            pos = x + y * width8
+            data[pos // 8] |= 0x80 >> (pos % 8)
+    return bytes(data)
+
+
+def _noise(size):
+    rand = random.Random(size[0] * 1000 + size[1])
+    image = Image.new("RGBA", size)
+    image.putdata(
+        [
+            tuple(rand.choice((0, rand.randrange(256), 255)) for _ in range(4))
+            for _ in range(size[0] * size[1])
+        ]
+    )
+    return image
+
+
+@pytest.fixture(params=[False, True], ids=["pillow", "numpy"])
+def use_numpy(request):
+    if request.param:
+        pytest.importorskip("numpy")
+    return request.param
+
+
+@pytest.mark.parametrize("image_type", sorted(convert.FRAME_MODES))
+@pytest.mark.parametrize("size", [(1, 1), (8, 3), (13, 7), (45, 33)])
+def test_pack_frame__matches_pixel_loops(image_type, size, use_numpy):
+    frame = _noise(size).convert(convert.FRAME_MODES[image_type])
+
+    actual = convert.pack_frame(frame, image_type, use_numpy=use_numpy)
+
+    assert actual == _reference(frame, image_type)
+
+
+def test_pack_frame__wrong_mode():
+    with pytest.raises(EsphomeError, match="Can't convert RGB image to BINARY"):
+        convert.pack_frame(Image.new("RGB", (4, 4)), "BINARY")
+
+
+@pytest.mark.parametrize("frames", [4, 40])
+def test_convert_animation__memory_of_one_frame(tmp_path, frames):
+    from esphome.components.animation import convert_animation
+
+    path = tmp_path / "animation.gif"
+    gradient = Image.linear_gradient("L").resize((160, 120)).convert("RGB")
+    images = [gradient.rotate(index * 5) for index in range(frames)]
+    images[0].save(path, save_all=True, append_images=images[1:])
+    frame_size = convert.frame_size(160, 120, "RGB565")
+    # Load the GIF plugin and pillow internals first
+    convert_animation(str(path), "RGB565", None)
+
+    tracemalloc.start()
+    try:
+        data, width, height, count, _ = convert_animation(str(path), "RGB565", None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert (width, height, count) == (160, 120, frames)
+    assert len(data) == frame_size * frames
+    # Besides the packed data only about a frame is held at once
+    assert peak - len(data) < 4 * frame_size
+
+
+def test_convert_animation__shares_repeated_frames(tmp_path):
+    from esphome.components.animation import convert_animation
+
+    path = tmp_path / "animation.gif"
+    gradient = Image.linear_gradient("L").resize((20, 10)).convert("RGB")
+    images = [gradient.rotate(angle) for angle in (0, 90, 0, 180, 90, 0)]
+    images[0].save(path, save_all=True, append_images=images[1:])
+
+    data, _, _, frames, frame_index = convert_animation(str(path), "RGB565", None)
+
+    size = convert.frame_size(20, 10, "RGB565")
+    assert frames == 6
+    assert len(data) == 3 * size
+    assert frame_index == bytes([0, 0, 0, 1, 0, 0, 0, 2, 0, 1, 0, 0])
+    packed = [convert.pack_frame(image, "RGB565") for image in images]
+    assert data == packed[0] + packed[1] + packed[3]
+
+
+def test_rasterize_font__shares_identical_glyphs(monkeypatch):
+    from esphome.components import font
+
+    class FakeFont:
+        def getmetrics(self, glyphs):
+            return 8, 2
+
+        def getoffset(self, glyph):
+            return 0, 0
+
+        def getmask(self, glyph, mode):
+            mask = Image.new(mode, (3 if glyph == "l" else 5, 4))
+            if glyph != " ":
+                mask.putpixel((0, 0), 1)
+            return mask
+
+    monkeypatch.setattr(font, "load_ttf_font", lambda path, size: FakeFont())
+
+    data, glyph_args, _, _ = font.rasterize_font("font.ttf", "local", 8, list(" Il|"))
+
+    # I and | have the same bitmap, l differs only in width and shares it too
+    assert data == bytes(4) + bytes([0x80, 0, 0, 0])
+    assert glyph_args == {
+        " ": (0, 0, 0, 5, 4),
+        "I": (4, 0, 0, 5, 4),
+        "l": (4, 0, 0, 3, 4),
+        "|": (4, 0, 0, 5, 4),
+    }
+
+
+@pytest.mark.parametrize("image_type", sorted(convert.FRAME_MODES))
+def test_convert_animation__image_types(tmp_path, image_type):
+    from esphome.components.animation import convert_animation
+
+    path = tmp_path / "animation.png"
+    images = [_noise((13, 7)), _noise((7, 13)).resize((13, 7))]
+    images[0].save(path, save_all=True, append_images=images[1:])
+
+    data, width, height, frames, _ = convert_animation(str(path), image_type, None)
+
+    assert (width, height, frames) == (13, 7, 2)
+    mode = convert.FRAME_MODES[image_type]
+    expected = [
+        convert.pack_frame(image.convert(mode, dither=Image.NONE), image_type)
+        for image in images
+    ]
+    assert data == b"".join(expected)
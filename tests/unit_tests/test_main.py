@@ -0,0 +1,177 @@
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+import esphome
+from esphome import __main__ as esphome_main, trace
+from esphome.core import CORE
+from esphome.util import ANSI_ESCAPE
+
+# Import time of `esphome version`, about 60ms on a current machine
+VERSION_IMPORT_BUDGET_MS = 150
+
+VALID_CONFIG = """
+esphome:
+  name: {name}
+
+esp8266:
+  board: d1_mini
+"""
+
+
+def test_run_configs_parallel(tmp_path, capsys):
+    good = tmp_path / "good.yaml"
+    good.write_text(VALID_CONFIG.format(name="good"))
+    other = tmp_path / "other.yaml"
+    other.write_text(VALID_CONFIG.format(name="other"))
+    bad = tmp_path / "bad.yaml"
+    bad.write_text(VALID_CONFIG.format(name="Not Valid"))
+
+    paths = [str(good), str(bad), str(other)]
+    args = esphome_main.parse_args(["esphome", "config", "--jobs", "2", *paths])
+
+    rc = esphome_main.run_configs_parallel(args, paths, args.jobs)
+
+    assert rc == 2
+    out = ANSI_ESCAPE.sub("", capsys.readouterr().out)
+    assert "name: good" in out
+    assert "name: other" in out
+    assert f"{good}: SUCCESS" in out
+    assert f"{other}: SUCCESS" in out
+    assert f"{bad}: FAILED" in out
+    assert CORE.config_path is None
+
+
+def test_run_config__restores_validated_config(tmp_path, monkeypatch, capsys):
+    conf = tmp_path / "good.yaml"
+    conf.write_text(VALID_CONFIG.format(name="good"))
+    validated = tmp_path / "validated.pickle"
+    args = esphome_main.parse_args(["esphome", "config", str(conf)])
+    args.validated_config = str(validated)
+
+    assert esphome_main.run_config(args, str(conf)) == 0
+    CORE.reset()
+    assert validated.is_file()
+
+    def read_config(*args):
+        raise AssertionError("Read again")
+
+    monkeypatch.setattr("esphome.config.read_config", read_config)
+    try:
+        assert esphome_main.run_config(args, str(conf)) == 0
+        assert CORE.name == "good"
+        assert CORE.build_path == str(tmp_path / ".esphome" / "build" / "good")
+    finally:
+        CORE.reset()
+    assert capsys.readouterr().out.count("name: good") == 2
+
+
+def test_run_config_job__captures_subprocess_output(monkeypatch):
+    def run_config(args, conf_path):
+        print("before")
+        subprocess.run([sys.executable, "-c", "print('from subprocess')"], check=True)
+        esphome_main._LOGGER.error("after")
+        return 1
+
+    monkeypatch.setattr(esphome_main, "run_config", run_config)
+
+    rc, output = esphome_main._run_config_job(None, "device.yaml")
+
+    assert rc == 1
+    assert output.splitlines()[:2] == ["before", "from subprocess"]
+    assert "after" in output.splitlines()[2]
+
+
+def test_version_cold_start_budget():
+    env = dict(os.environ, PYTHONPATH=str(Path(esphome.__file__).parent.parent))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "esphome", "version"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    assert proc.stdout.startswith("Version: ")
+
+    times = esphome_main.parse_import_times(proc.stderr.splitlines())
+    # Only the command line parsing and CORE are needed for `version`
+    for module in (
+        "esphome.config",
+        "esphome.config_validation",
+        "esphome.codegen",
+        "esphome.writer",
+        "esphome.yaml_util",
+        "voluptuous",
+    ):
+        assert module not in times
+    esphome_ms = (
+        sum(
+            cumulative
+            for name, (_, cumulative, level) in times.items()
+            if level == 0 and name.split(".")[0] in ("esphome", "__main__")
+        )
+        / 1000
+    )
+    assert esphome_ms < VERSION_IMPORT_BUDGET_MS
+
+
+def test_trace_config(tmp_path, capsys):
+    conf = tmp_path / "traced.yaml"
+    conf.write_text(
+        "substitutions:\n  device: traced\npackages: {}\n"
+        + VALID_CONFIG.format(name="${device}")
+    )
+    trace_file = tmp_path / "trace.json"
+    args = esphome_main.parse_args(
+        ["esphome", "--trace", str(trace_file), "config", str(conf)]
+    )
+
+    trace.start_tracing()
+    try:
+        assert esphome_main.run_config(args, str(conf)) == 0
+    finally:
+        trace.write_trace(args.trace)
+        CORE.reset()
+
+    assert not trace.is_tracing()
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    names = {event["name"] for event in events}
+    assert {"read_config", "config", "substitutions", "packages"} <= names
+    assert "LoadValidationStep esp8266" in names
+    assert "SchemaValidationStep esphome" in names
+    loads = [event for event in events if event["name"] == "load_yaml"]
+    assert loads[0]["args"]["file"] == str(conf)
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+
+
+def test_run_esphome__closes_daemon_client(tmp_path, monkeypatch):
+    class Client:
+        closed = False
+
+        def run(self, args, conf_path):
+            return 2
+
+        def close(self):
+            Client.closed = True
+
+    monkeypatch.setattr("esphome.daemon.DaemonClient.connect", Client)
+
+    assert esphome_main.run_esphome(["esphome", "config", "a.yaml"]) == 2
+    assert Client.closed
+
+
+def test_jobs_argument(monkeypatch, capsys):
+    monkeypatch.setattr(esphome_main.os, "cpu_count", lambda: 3)
+    args = esphome_main.parse_args(["esphome", "config", "-j", "0", "a.yaml"])
+    assert args.jobs == 3
+    args = esphome_main.parse_args(["esphome", "compile", "--jobs", "2", "a.yaml"])
+    assert args.jobs == 2
+
+    for value in ("-1", "many"):
+        with pytest.raises(SystemExit):
+            esphome_main.parse_args(["esphome", "config", "--jobs", value, "a.yaml"])
+        assert "invalid number of jobs" in capsys.readouterr().err
@@ -0,0 +1,226 @@
+import json
+import os
+from pathlib import Path
+import sys
+
+import pytest
+
+from esphome import __main__ as esphome_main, object_cache, object_cache_launcher
+from esphome.const import ENV_NO_OBJECT_CACHE, ENV_OBJECT_CACHE_SIZE
+from esphome.core import CORE
+
+# Stands in for the compiler, counts the compiles in compiles.txt next to itself
+FAKE_COMPILER = """\
+import os
+import sys
+
+args = sys.argv[1:]
+source = [arg for arg in args if not arg.startswith("-")][-1]
+with open(source) as f_handle:
+    text = " ".join(a for a in args if a[:2] == "-D") + "\\n" + f_handle.read()
+if "-E" in args:
+    sys.stdout.write(f"# 1 \\"{source}\\"\\n" + text)
+    sys.exit()
+if "error" in text:
+    sys.stderr.write("error: failed\\n")
+    sys.exit(1)
+if "-g" in args:
+    # Debug information with the path of the source, the last matching map wins
+    name = source
+    for arg in args:
+        old, _, new = arg.partition("=")[2].partition("=")
+        if arg.startswith("-fdebug-prefix-map=") and source.startswith(old):
+            name = new + source[len(old):]
+    text += f"debug {name}\\n"
+with open(args[args.index("-o") + 1], "w") as f_handle:
+    f_handle.write("object of " + text)
+with open(os.path.join(os.path.dirname(__file__), "compiles.txt"), "a") as f_handle:
+    f_handle.write("x")
+sys.stderr.write("warning: unused\\n")
+"""
+
+
+@pytest.fixture
+def compiler(tmp_path):
+    path = tmp_path / "cc.py"
+    path.write_text(FAKE_COMPILER)
+    return path
+
+
+def _compiles(compiler: Path) -> int:
+    count = compiler.with_name("compiles.txt")
+    return len(count.read_text()) if count.exists() else 0
+
+
+def _launch(tmp_path, compiler, build: str, *flags, source="main.cpp"):
+    build_dir = tmp_path / build
+    target = build_dir / ".pioenvs" / f"{source}.o"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    argv = [str(tmp_path / "cache"), str(build_dir / "log"), str(build_dir), "--"]
+    argv += [sys.executable, str(compiler), "-o", str(target), "-c", *flags]
+    argv += [f"-I{build_dir / 'src'}", str(build_dir / "src" / source)]
+    rc = object_cache_launcher.main(argv)
+    log = (build_dir / "log").read_text().split()
+    return rc, log[-1], target
+
+
+def _write_source(tmp_path, build: str, text: str, source="main.cpp") -> None:
+    path = tmp_path / build / "src" / source
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_launcher__shares_objects_across_build_dirs(tmp_path, compiler, capfd):
+    _write_source(tmp_path, "first", "int main() {}\n")
+    _write_source(tmp_path, "second", "int main() {}\n")
+
+    assert _launch(tmp_path, compiler, "first", "-DA=1")[:2] == (0, "miss")
+    rc, result, target = _launch(tmp_path, compiler, "second", "-DA=1")
+
+    assert (rc, result) == (0, "hit")
+    assert _compiles(compiler) == 1
+    assert target.read_text().endswith("int main() {}\n")
+    # The warnings of the compile are shown for the cached object as well
+    assert capfd.readouterr().err == "warning: unused\n" * 2
+
+
+def test_launcher__objects_independent_of_build_dir(tmp_path, compiler):
+    _write_source(tmp_path, "first", "int main() {}\n")
+    _write_source(tmp_path, "second", "int main() {}\n")
+
+    _launch(tmp_path, compiler, "first", "-g")
+    rc, result, target = _launch(tmp_path, compiler, "second", "-g")
+
+    assert (rc, result) == (0, "hit")
+    assert target.read_text().endswith("debug ./src/main.cpp\n")
+
+
+def test_launcher__path_in_code_not_shared(tmp_path, compiler):
+    for build in ("first", "second"):
+        # Like an expansion of __FILE__
+        path = tmp_path / build / "src" / "file.cpp"
+        _write_source(tmp_path, build, f'const char *f = "{path}";\n', "file.cpp")
+
+    assert _launch(tmp_path, compiler, "first", source="file.cpp")[1] == "miss"
+    rc, result, target = _launch(tmp_path, compiler, "second", source="file.cpp")
+
+    assert (rc, result) == (0, "miss")
+    assert str(tmp_path / "first") not in target.read_text()
+    assert _launch(tmp_path, compiler, "second", source="file.cpp")[1] == "hit"
+
+
+def test_launcher__key_covers_flags_and_sources(tmp_path, compiler):
+    _write_source(tmp_path, "device", "int main() {}\n")
+    _launch(tmp_path, compiler, "device", "-DA=1")
+
+    assert _launch(tmp_path, compiler, "device", "-DA=2")[1] == "miss"
+    _write_source(tmp_path, "device", "int main() { return 1; }\n")
+    assert _launch(tmp_path, compiler, "device", "-DA=2")[1] == "miss"
+    assert _launch(tmp_path, compiler, "device", "-DA=2")[1] == "hit"
+    assert _compiles(compiler) == 3
+
+
+def test_launcher__failed_compile(tmp_path, compiler, capfd):
+    _write_source(tmp_path, "device", "error\n")
+
+    rc, result, _ = _launch(tmp_path, compiler, "device")
+
+    assert (rc, result) == (1, "miss")
+    assert "error: failed" in capfd.readouterr().err
+    assert not list((tmp_path / "cache").glob("*/*"))
+    # Not a compile of one object
+    assert object_cache_launcher.compile_target(["gcc", "-E", "main.cpp"]) is None
+
+
+@pytest.fixture
+def device(tmp_path):
+    CORE.config_path = str(tmp_path / "device.yaml")
+    CORE.name = "device"
+    CORE.build_path = str(tmp_path / ".esphome" / "build" / "device")
+    os.makedirs(CORE.build_path)
+    yield
+    CORE.reset()
+
+
+def test_write_project_script(device, monkeypatch):
+    object_cache.write_project_script()
+
+    assert CORE.platformio_options["extra_scripts"] == ["pre:object_cache.py"]
+    script = Path(CORE.relative_build_path("object_cache.py")).read_text()
+    assert object_cache_launcher.__file__ in script
+    assert f'"{CORE.build_path}" --' in script
+
+    # Keeps a script of the user given as a string
+    CORE.platformio_options["extra_scripts"] = "pre:my.py"
+    object_cache.write_project_script()
+    assert CORE.platformio_options["extra_scripts"] == [
+        "pre:my.py",
+        "pre:object_cache.py",
+    ]
+
+    CORE.platformio_options.clear()
+    monkeypatch.setenv(ENV_NO_OBJECT_CACHE, "1")
+    object_cache.write_project_script()
+    assert CORE.platformio_options == {}
+
+
+def _add_object(directory: Path, key: str, size: int, last_use: int) -> Path:
+    path = directory / key[:2] / f"{key}.o"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"o" * size)
+    os.utime(path, ns=(last_use, last_use))
+    return path
+
+
+def test_finish_compile__reports_and_trims(device, monkeypatch, caplog):
+    directory = object_cache.cache_dir()
+    old = _add_object(directory, "aa01", 600, 1)
+    recent = _add_object(directory, "bb02", 600, 2)
+    monkeypatch.setenv(ENV_OBJECT_CACHE_SIZE, "1K")
+    Path(CORE.relative_build_path("object_cache.log")).write_text(
+        "hit\nhit\nhit\nmiss\n"
+    )
+
+    with caplog.at_level("INFO"):
+        object_cache.finish_compile()
+
+    assert "Object cache: 3 hits, 1 misses (75% hit rate)" in caplog.text
+    assert not old.exists()
+    assert recent.exists()
+    object_cache.finish_compile()
+    totals = json.loads((directory / "stats.json").read_text())
+    assert totals == {"hit": 6, "miss": 2}
+
+    object_cache.start_compile()
+    assert object_cache.finish_compile() == {}
+
+
+def test_cache_command(device, tmp_path, capsys):
+    directory = object_cache.cache_dir()
+    _add_object(directory, "aa01", 2048, 1)
+    _add_object(directory, "bb02", 1024, 2)
+    (directory / "stats.json").write_text('{"hit": 3, "miss": 1}')
+
+    assert esphome_main.run_esphome(["esphome", "cache", "stats", str(tmp_path)]) == 0
+    out = capsys.readouterr().out
+    assert "Objects: 2\n" in out
+    assert "Size:    3.0 KiB of 2.0 GiB\n" in out
+    assert "Hits:    3 (75%)\n" in out
+
+    args = ["esphome", "cache", "prune", "--max-size", "1K", CORE.config_path]
+    assert esphome_main.run_esphome(args) == 0
+    assert "Removed 1 objects (2.0 KiB)" in capsys.readouterr().out
+    assert object_cache.stats(directory).objects == 1
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1024", 1024), ("2K", 2048), ("1.5M", 1572864), ("2 GiB", 2 * 1024**3)],
+)
+def test_parse_size(value, expected):
+    assert object_cache.parse_size(value) == expected
+
+
+def test_parse_size__invalid():
+    with pytest.raises(ValueError, match="Invalid size"):
+        object_cache.parse_size("big")
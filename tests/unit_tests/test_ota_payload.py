@@ -0,0 +1,75 @@
+import gzip
+from pathlib import Path
+
+import pytest
+
+from esphome import espota2, ota_payload
+from esphome.core import CORE
+from esphome.storage_json import StorageJSON, storage_path
+
+
+@pytest.fixture
+def firmware(tmp_path):
+    CORE.config_path = str(tmp_path / "device.yaml")
+    path = tmp_path / "build" / ".pioenvs" / "device" / "firmware.bin"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"firmware" * 1000)
+    yield path
+    CORE.reset()
+
+
+def _save_storage(firmware, platform="ESP8266"):
+    storage = StorageJSON.from_wizard("device", "device.local", platform)
+    storage.firmware_bin_path = str(firmware)
+    storage.save(storage_path())
+
+
+def _load():
+    return StorageJSON.load(storage_path())
+
+
+def test_write_payload(firmware, monkeypatch):
+    _save_storage(firmware)
+
+    ota_payload.write_payload()
+
+    payload, md5 = ota_payload.load_payload(_load(), str(firmware))
+    assert gzip.decompress(payload) == firmware.read_bytes()
+    assert Path(f"{firmware}.gz").read_bytes() == payload
+    assert _load().ota_payload_md5 == md5
+
+    # Up to date, it isn't compressed again
+    def prepare_payload(*args):
+        raise AssertionError("Compressed again")
+
+    monkeypatch.setattr(espota2, "prepare_payload", prepare_payload)
+    ota_payload.write_payload()
+
+
+def test_write_payload__only_for_compressing_devices(firmware):
+    _save_storage(firmware, platform="ESP32")
+
+    ota_payload.write_payload()
+
+    assert not Path(f"{firmware}.gz").exists()
+    assert _load().ota_payload_md5 is None
+    assert ota_payload.load_payload(_load(), str(firmware)) is None
+
+
+def test_load_payload__changed_files(firmware):
+    _save_storage(firmware)
+    ota_payload.write_payload()
+    storage = _load()
+
+    Path(f"{firmware}.gz").write_bytes(b"corrupted")
+    assert ota_payload.load_payload(storage, str(firmware)) is None
+
+    # The same firmware always compresses to the same payload
+    ota_payload.write_payload()
+    assert ota_payload.load_payload(storage, str(firmware)) is not None
+
+    firmware.write_bytes(b"other firmware")
+    assert ota_payload.load_payload(storage, str(firmware)) is None
+    ota_payload.write_payload()
+    payload, _ = ota_payload.load_payload(_load(), str(firmware))
+    assert gzip.decompress(payload) == b"other firmware"
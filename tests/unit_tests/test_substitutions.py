@@ -0,0 +1,89 @@
+import logging
+
+from esphome import yaml_util
+from esphome.components import substitutions
+from esphome.core import Lambda
+
+
+def _load(tmp_path, content):
+    path = tmp_path / "test.yaml"
+    path.write_text(content)
+    return yaml_util.load_yaml(path)
+
+
+def test_nested_substitutions(tmp_path):
+    config = _load(
+        tmp_path,
+        """\
+substitutions:
+  greeting: ${name}!
+  name: ${first} $last
+  first: Hello
+  last: World
+esphome:
+  name: ${greeting}
+  lambda: !lambda return "$first";
+  $last: value
+""",
+    )
+
+    substitutions.do_substitution_pass(config, {"last": "Everyone"})
+
+    assert config["substitutions"] == {
+        "greeting": "Hello Everyone!",
+        "name": "Hello Everyone",
+        "first": "Hello",
+        "last": "Everyone",
+    }
+    assert config["esphome"]["name"] == "Hello Everyone!"
+    assert isinstance(config["esphome"]["lambda"], Lambda)
+    assert config["esphome"]["lambda"].value == 'return "Hello";'
+    assert config["esphome"]["Everyone"] == "value"
+    # Substituted values still point to the original document
+    name = config["esphome"]["name"]
+    assert isinstance(name, yaml_util.ESPHomeDataBase)
+    assert name.esp_range.start_mark.line == 6
+
+
+def test_undeclared_substitution(tmp_path, caplog):
+    config = _load(
+        tmp_path,
+        """\
+substitutions:
+  name: $missing
+sensor:
+  - name: ${other} $name
+""",
+    )
+
+    with caplog.at_level(logging.WARNING):
+        substitutions.do_substitution_pass(config, None)
+
+    assert config["sensor"][0]["name"] == "${other} $missing"
+    assert [record.getMessage() for record in caplog.records] == [
+        "Found '$missing' (see substitutions->name) which looks like a substitution, "
+        "but 'missing' was not declared",
+        "Found '${other} $name' (see sensor->0->name) which looks like a "
+        "substitution, but 'other' was not declared",
+    ]
+
+
+def test_recursive_substitution(tmp_path, caplog):
+    config = _load(
+        tmp_path,
+        """\
+substitutions:
+  a: x${b}
+  b: y${a}
+esphome:
+  name: $a
+""",
+    )
+
+    with caplog.at_level(logging.WARNING):
+        substitutions.do_substitution_pass(config, None)
+
+    assert config["esphome"]["name"] == "xy${a}"
+    assert [record.getMessage() for record in caplog.records] == [
+        "Substitution 'a' refers to itself (see substitutions->b)"
+    ]
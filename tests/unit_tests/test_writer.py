@@ -0,0 +1,282 @@
+import json
+import os
+
+import pytest
+
+from esphome import writer
+from esphome.const import KEY_CORE, KEY_TARGET_PLATFORM
+from esphome.core import CORE, ID
+from esphome.cpp_generator import (
+    MockObj,
+    Pvariable,
+    RawStatement,
+    progmem_array,
+    variable,
+)
+from esphome.cpp_types import uint8
+
+
+@pytest.fixture
+def build(tmp_path):
+    CORE.config_path = str(tmp_path / "test.yaml")
+    CORE.build_path = str(tmp_path / "build")
+    yield tmp_path / "build" / "src" / "setup"
+    CORE.reset()
+
+
+def _add(domain, *code):
+    """Add statements as if generated by the given component domain."""
+    CORE.event_loop.current_domain = domain
+    for line in code:
+        CORE.add(RawStatement(line))
+    CORE.event_loop.current_domain = None
+
+
+def test_write_setup_shards(build):
+    CORE.add_global(RawStatement("using namespace esphome;"))
+    Pvariable(ID("main_only", is_declaration=True, type=uint8), 0)
+    _add(None, "App.pre_setup();")
+    CORE.event_loop.current_domain = "sensor"
+    temp = Pvariable(ID("temp", is_declaration=True, type=uint8), 1)
+    CORE.event_loop.current_domain = "api"
+    Pvariable(ID("status", is_declaration=True, type=uint8), 2)
+    _add("light", "light_on();")
+    _add("sensor", f"update({temp});")
+    _add(None, "App.setup();")
+
+    declarations, calls = writer.write_setup_shards()
+
+    assert declarations == (
+        "void setup_sensor_0();\nvoid setup_api_0();\n"
+        "void setup_light_0();\nvoid setup_sensor_1();\n"
+    )
+    # Runs of the same domain are called in the order they were added
+    assert calls.split() == [
+        "main_only",
+        "=",
+        "0;",
+        "App.pre_setup();",
+        "setup_sensor_0();",
+        "setup_api_0();",
+        "setup_light_0();",
+        "setup_sensor_1();",
+        "App.setup();",
+    ]
+    assert sorted(path.name for path in build.iterdir()) == [
+        "api.cpp",
+        "light.cpp",
+        "sensor.cpp",
+        "setup_globals.h",
+    ]
+    header = (build / "setup_globals.h").read_text()
+    assert "using namespace esphome;" in header
+    assert "extern" not in header
+    sensor = (build / "sensor.cpp").read_text()
+    assert '#include "setup_globals.h"' in sensor
+    # Only the variables the file uses are declared
+    assert "extern uint8_t *temp;\n\nvoid setup_sensor_0()" in sensor
+    assert "void setup_sensor_0() {\n  temp = 1;\n}" in sensor
+    assert "void setup_sensor_1() {\n  update(temp);\n}" in sensor
+    assert "extern uint8_t *status;\n" in (build / "api.cpp").read_text()
+    light = (build / "light.cpp").read_text()
+    assert "temp" not in light
+    assert "extern" not in light
+    assert "main_only" not in sensor
+
+
+def test_write_setup_shards__new_variable_keeps_other_files(build):
+    CORE.add_global(RawStatement("using namespace esphome;"))
+    _add("light", "light_setup();")
+    writer.write_setup_shards()
+    files = {path.name: path.stat().st_mtime_ns for path in build.iterdir()}
+
+    CORE.event_loop.current_domain = "sensor"
+    uptime = Pvariable(ID("uptime", is_declaration=True, type=uint8), 1)
+    _add("sensor", f"update({uptime});")
+    writer.write_setup_shards()
+
+    assert {
+        path.name: path.stat().st_mtime_ns
+        for path in build.iterdir()
+        if path.name in files
+    } == files
+    assert "extern uint8_t *uptime;" in (build / "sensor.cpp").read_text()
+
+
+def test_write_setup_shards__statics_at_file_scope(build):
+    _add("image", "image_setup();")
+    CORE.event_loop.current_domain = "image"
+    data = progmem_array(ID("data", is_declaration=True, type=uint8), [1, 2])
+    _add("image", f"use({data});")
+
+    writer.write_setup_shards()
+
+    image = (build / "image.cpp").read_text()
+    assert "void setup_image_0() {\n  image_setup();\n  use(data);\n}" in image
+    assert image.index("static const uint8_t data[] PROGMEM = {1, 2};") < image.index(
+        "void setup_image_0()"
+    )
+
+
+def test_write_setup_shards__removes_stale_files(build):
+    _add("sensor", "sensor_setup();")
+    _add("light", "light_setup();")
+    writer.write_setup_shards()
+    CORE.main_statements = CORE.main_statements[:1]
+    CORE.main_statement_domains = CORE.main_statement_domains[:1]
+
+    writer.write_setup_shards()
+    assert sorted(path.name for path in build.iterdir()) == [
+        "sensor.cpp",
+        "setup_globals.h",
+    ]
+
+    writer.remove_setup_shards()
+    assert not list(build.iterdir())
+
+
+def test_write_setup_shards__keeps_shared_locals_inline(build):
+    CORE.event_loop.current_domain = "custom"
+    custom = variable(ID("custom", is_declaration=True, type=uint8), 1)
+    _add("sensor", "sensor_setup();")
+    _add("custom", f"register({custom});")
+    CORE.event_loop.current_domain = "image"
+    data = progmem_array(ID("data", is_declaration=True, type=uint8), [1])
+    _add("display", f"show({data});")
+
+    _, calls = writer.write_setup_shards()
+
+    # Only visible in setup(), or used by two domains
+    assert calls.splitlines() == [
+        "uint8_t custom = 1;",
+        "setup_sensor_0();",
+        "register(custom);",
+        "static const uint8_t data[] PROGMEM = {1};",
+        "show(data);",
+        "",
+    ]
+    assert sorted(path.name for path in build.iterdir()) == [
+        "sensor.cpp",
+        "setup_globals.h",
+    ]
+
+
+def test_write_setup_shards__global_code_only_in_main(build):
+    build.parent.mkdir(parents=True)
+    (build.parent / "custom.h").write_text(
+        "int counter = 0;\nclass MySensor : public Component {};\n"
+    )
+    CORE.add_global(RawStatement("using namespace esphome;"))
+    CORE.add_global(RawStatement('#include "custom.h"'))
+    CORE.add_global(RawStatement("int raw_global = 1;"))
+    CORE.event_loop.current_domain = "globals"
+    value = Pvariable(ID("value", is_declaration=True, type=MockObj("MySensor")), 1)
+    _add("globals", f"{value}->setup();")
+    _add("custom", "App.register_component([=]() { return counter; }());")
+    _add("sensor", "sensor_setup();")
+
+    _, calls = writer.write_setup_shards()
+
+    # Needs the declarations of custom.h, only included by main.cpp
+    assert calls.splitlines() == [
+        "value = 1;",
+        "value->setup();",
+        "App.register_component([=]() { return counter; }());",
+        "setup_sensor_0();",
+        "",
+    ]
+    header = (build / "setup_globals.h").read_text()
+    assert "using namespace esphome;" in header
+    assert "custom.h" not in header
+    assert "raw_global" not in header
+    assert "raw_global" not in (build / "sensor.cpp").read_text()
+
+
+@pytest.fixture
+def src_tree(build):
+    CORE.config = {"esphome": {}, "logger": {}}
+    CORE.data[KEY_CORE] = {KEY_TARGET_PLATFORM: "host"}
+    writer.copy_src_tree()
+    return build.parent / "esphome"
+
+
+def _manifest():
+    with open(CORE.relative_build_path(writer.SRC_MANIFEST)) as f_handle:
+        return json.load(f_handle)
+
+
+def test_copy_src_tree__copies_sources(src_tree):
+    files = _manifest()["files"]
+
+    assert "esphome/core/application.cpp" in files
+    assert "esphome/components/logger/logger.h" in files
+    # Generated, not copied
+    assert "esphome/core/defines.h" not in files
+    for target, entry in files.items():
+        path = src_tree.parent / target
+        assert path.read_bytes() == open(entry["source"][0], "rb").read()
+
+
+def test_copy_src_tree__unchanged_files_not_read(src_tree, mocker):
+    file_hash = mocker.spy(writer, "file_hash")
+    file_compare = mocker.spy(writer, "file_compare")
+    link = mocker.spy(writer, "reflink_or_copy_file")
+    resources = mocker.spy(writer.loader.ComponentManifest, "resources")
+    manifest = os.stat(CORE.relative_build_path(writer.SRC_MANIFEST)).st_mtime_ns
+
+    writer.copy_src_tree()
+
+    # Only the metadata of the files is compared with the manifest
+    assert file_hash.call_count == 0
+    assert file_compare.call_count == 0
+    assert link.call_count == 0
+    assert resources.call_count == 0
+    assert os.stat(CORE.relative_build_path(writer.SRC_MANIFEST)).st_mtime_ns == (
+        manifest
+    )
+
+
+def test_copy_src_tree__changed_targets_copied_again(src_tree, mocker):
+    changed = src_tree / "core" / "application.cpp"
+    contents = changed.read_bytes()
+    changed.write_text("edited")
+    removed = src_tree / "components" / "logger" / "logger.h"
+    removed.unlink()
+    link = mocker.spy(writer, "reflink_or_copy_file")
+
+    writer.copy_src_tree()
+
+    assert changed.read_bytes() == contents
+    assert removed.is_file()
+    assert link.call_count == 2
+
+
+def test_copy_src_tree__touched_source_not_copied(src_tree, mocker):
+    target = "esphome/core/application.cpp"
+    manifest = _manifest()
+    entry = manifest["files"][target]
+    # Like a reinstall of esphome, new modification times with the same contents
+    entry["source"][2] -= 1
+    with open(CORE.relative_build_path(writer.SRC_MANIFEST), "w") as f_handle:
+        json.dump(manifest, f_handle)
+    link = mocker.spy(writer, "reflink_or_copy_file")
+    file_hash = mocker.spy(writer, "file_hash")
+
+    writer.copy_src_tree()
+
+    assert link.call_count == 0
+    assert file_hash.call_count == 1
+    assert _manifest()["files"][target]["source"][2] == entry["source"][2] + 1
+
+
+@pytest.mark.parametrize("manifest", (True, False))
+def test_copy_src_tree__removes_stale_files(src_tree, manifest):
+    if not manifest:
+        os.unlink(CORE.relative_build_path(writer.SRC_MANIFEST))
+    CORE.config = {"esphome": {}}
+
+    writer.copy_src_tree()
+
+    assert not list((src_tree / "components" / "logger").glob("*.*"))
+    assert (src_tree / "core" / "application.cpp").is_file()
+    assert "esphome/components/logger/logger.h" not in _manifest()["files"]
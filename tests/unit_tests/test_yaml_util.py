@@ -1,5 +1,19 @@
-from esphome import yaml_util
+import pytest
+
+from esphome import writer, yaml_util
 from esphome.components import substitutions
+from esphome.const import ENV_NO_YAML_CACHE
+from esphome.core import CORE, EsphomeError, Lambda
+
+
+@pytest.fixture(autouse=True, params=["fastest", "pure_python"])
+def loader_type(request, monkeypatch):
+    """Run every test with both the libyaml based and the pure python loader."""
+    if request.param == "pure_python":
+        monkeypatch.setattr(
+            yaml_util, "ESPHomeLoader", yaml_util.ESPHomePurePythonLoader
+        )
+    return yaml_util.ESPHomeLoader
 
 
 def test_include_with_vars(fixture_path):
@@ -11,3 +25,132 @@ def test_include_with_vars(fixture_path):
     assert actual["esphome"]["libraries"][0] == "Wire"
     assert actual["esphome"]["board"] == "nodemcu"
     assert actual["wifi"]["ssid"] == "my_custom_ssid"
+
+
+def _dump_with_marks(value):
+    """Flatten a loaded tree including all the metadata added by the loader."""
+    ret = {
+        "type": type(value).__name__,
+        "bases": [c.__name__ for c in type(value).__mro__],
+    }
+    if isinstance(value, yaml_util.ESPHomeDataBase):
+        ret["range"] = str(value.esp_range)
+        ret["content_offset"] = value.content_offset
+    if isinstance(value, dict):
+        ret["items"] = [
+            (_dump_with_marks(k), _dump_with_marks(v)) for k, v in value.items()
+        ]
+    elif isinstance(value, list):
+        ret["items"] = [_dump_with_marks(v) for v in value]
+    elif isinstance(value, Lambda):
+        ret["value"] = value.value
+    else:
+        ret["value"] = value
+    return ret
+
+
+@pytest.fixture
+def cache_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(CORE, "config_path", str(tmp_path / "test.yaml"))
+    monkeypatch.delenv(ENV_NO_YAML_CACHE, raising=False)
+    monkeypatch.setenv("YAML_CACHE_TEST_VAR", "from_env")
+    (tmp_path / "secrets.yaml").write_text("wifi_password: supersecret\n")
+    (tmp_path / "included.yaml").write_text("ssid: ${name}\nnumber: 42\n")
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "a.yaml").write_text("- platform: template\n")
+    (tmp_path / "test.yaml").write_text(
+        """\
+esphome:
+  name: !env_var YAML_CACHE_TEST_VAR
+  comment: !force REPLACEME
+wifi: !include
+  file: included.yaml
+  vars:
+    name: my_ssid
+password: !secret wifi_password
+sensor: !include_dir_merge_list dir
+value: &anchor
+  text: |
+    multi line
+  float: 1.5
+copy: *anchor
+on_boot:
+  - lambda: !lambda |-
+      return id(my_sensor).state;
+"""
+    )
+    return tmp_path
+
+
+def test_parse_cache_hit_is_identical(cache_config):
+    fresh = yaml_util.load_yaml(CORE.config_path)
+    assert list((cache_config / ".esphome" / "yaml_cache").iterdir())
+
+    cached = yaml_util.load_yaml(CORE.config_path)
+
+    assert _dump_with_marks(cached) == _dump_with_marks(fresh)
+    assert isinstance(cached["esphome"]["comment"], yaml_util.ESPForceValue)
+    assert isinstance(cached["on_boot"][0]["lambda"], Lambda)
+    assert cached["on_boot"][0]["lambda"].requires_ids[0].id == "my_sensor"
+    assert cached["value"] is cached["copy"]
+    assert yaml_util.is_secret(cached["password"]) == "wifi_password"
+
+
+def test_parse_cache_tracks_dependencies(cache_config, monkeypatch):
+    yaml_util.load_yaml(CORE.config_path)
+
+    (cache_config / "included.yaml").write_text("ssid: changed\n")
+    assert yaml_util.load_yaml(CORE.config_path)["wifi"]["ssid"] == "changed"
+
+    (cache_config / "dir" / "b.yaml").write_text("- platform: gpio\n")
+    assert len(yaml_util.load_yaml(CORE.config_path)["sensor"]) == 2
+
+    monkeypatch.setenv("YAML_CACHE_TEST_VAR", "other")
+    assert yaml_util.load_yaml(CORE.config_path)["esphome"]["name"] == "other"
+
+
+def test_parse_cache_one_entry_per_file(cache_config, monkeypatch):
+    cache_dir = cache_config / ".esphome" / yaml_util.YAML_CACHE_DIR
+    yaml_util.load_yaml(CORE.config_path)
+    entries = sorted(cache_dir.iterdir())
+
+    for number in range(3):
+        (cache_config / "included.yaml").write_text(f"number: {number}\n")
+        yaml_util.load_yaml(CORE.config_path)
+
+    # Changed files replace their entries
+    assert sorted(cache_dir.iterdir()) == entries
+
+    monkeypatch.setattr(CORE, "build_path", str(cache_config / "build"))
+    writer.clean_build()
+    assert not cache_dir.exists()
+
+
+def test_parse_cache_disabled(cache_config, monkeypatch):
+    monkeypatch.setenv(ENV_NO_YAML_CACHE, "1")
+
+    yaml_util.load_yaml(CORE.config_path)
+
+    assert not (cache_config / ".esphome").exists()
+
+
+def test_loaders_produce_same_marks(fixture_path):
+    yaml_file = fixture_path / "yaml_util" / "includetest.yaml"
+    content = yaml_file.read_text()
+
+    fast = yaml_util.ESPHomeLoader(content, yaml_file).get_single_data()
+    pure = yaml_util.ESPHomePurePythonLoader(content, yaml_file).get_single_data()
+
+    assert _dump_with_marks(fast) == _dump_with_marks(pure)
+    assert fast["esphome"].esp_range.start_mark.document == yaml_file
+
+
+def test_duplicate_key(tmp_path):
+    yaml_file = tmp_path / "duplicate.yaml"
+    yaml_file.write_text("esphome:\n  name: a\n  name: b\n")
+
+    with pytest.raises(EsphomeError, match='Duplicate key "name"') as exc:
+        yaml_util.load_yaml(yaml_file)
+
+    # Errors are reported by the pure python loader, which shows the source
+    assert "name: b" in str(exc.value)